@@ -17,4 +17,6 @@ __plugin_meta__ = PluginMetadata(
 
 
 
-from .functions import sekaiju_adapters
\ No newline at end of file
+from .functions import sekaiju_adapters
+from .params import UniUser
+from .universal.identity import identity_index
\ No newline at end of file
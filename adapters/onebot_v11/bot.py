@@ -8,17 +8,92 @@ from nonebot.adapters.onebot.v11 import (
     MessageSegment as OneBotv11MessageSegment
 )
 
-from ...universal.uni_bot import UniBot, FakeBot, add_bot_method
-from ...universal.uni_event import UniEvent
+from ...universal.models import PlatformUserData, Group
+from ...universal.store import entity_store
+from ...universal.uni_bot import UniBot, FakeBot, ApiItem, add_bot_method
+from ...universal.uni_event import Item, UniEvent
 from ...universal.uni_message import UniMessage, convert_message
+from ...utils import ascii_encode, ascii_decode
+from ...config import config
 
 from .utils import adapter_name, adapter
 
 
+def _decode_id(s: str) -> int:
+    '''将编码后的 id 解码为 OneBot v11 的整数 id'''
+    return int(ascii_decode(s))
+
+def _user_info_result(r: dict[str, Any], _) -> dict[str, Any]:
+    avatar = f"https://q1.qlogo.cn/g?b=qq&nk={r['user_id']}&s=640"
+    if config.sekaiju_entity_store:
+        entity_store.put(adapter_name, PlatformUserData(id=r["user_id"], name=r["nickname"], avatar=avatar))
+    return {
+        "user_id": ascii_encode(r["user_id"]),
+        "nickname": r["nickname"],
+        "avatar": avatar
+    }
+
+def _group_info_result(r: dict[str, Any], _) -> dict[str, Any]:
+    if config.sekaiju_entity_store:
+        entity_store.put(adapter_name, Group(
+            id=str(r["group_id"]),
+            name=r["group_name"],
+            platform=adapter_name,
+            is_available=True
+        ))
+    return {
+        "group_id": ascii_encode(r["group_id"]),
+        "group_name": r["group_name"],
+        "member_count": r.get("member_count")
+    }
+
+
 class OneBotv11UniBot(UniBot):
 
     origin_bot: OneBotv11Bot
 
+    api_mapping = {
+        "get_user_info": ApiItem(
+            "get_stranger_info",
+            {"user_id": Item("user_id", call=_decode_id)},
+            _user_info_result,
+            cache_ttl=300
+        ),
+        "get_group_info": ApiItem(
+            "get_group_info",
+            {"group_id": Item("group_id", call=_decode_id)},
+            _group_info_result,
+            cache_ttl=300
+        ),
+        "get_group_member_info": ApiItem(
+            "get_group_member_info",
+            {
+                "group_id": Item("group_id", call=_decode_id),
+                "user_id": Item("user_id", call=_decode_id)
+            },
+            lambda r, _: {
+                "group_id": ascii_encode(r["group_id"]),
+                "user_id": ascii_encode(r["user_id"]),
+                "nickname": r["nickname"],
+                "card": r.get("card") or r["nickname"],
+                "role": r.get("role", "member")
+            },
+            cache_ttl=60
+        ),
+        "delete_msg": ApiItem(
+            "delete_msg",
+            {"message_id": Item("message_id", call=_decode_id)}
+        ),
+        "ban": ApiItem(
+            "set_group_ban",
+            {
+                "group_id": Item("group_id", call=_decode_id),
+                "user_id": Item("user_id", call=_decode_id),
+                "duration": Item("duration")
+            }
+        )
+    }
+
     @override
     async def send(
         self,
@@ -38,23 +113,66 @@ class OneBotv11UniBot(UniBot):
             cast(OneBotv11Message, _message),
             **kwargs
         )
-    
-    @override
-    async def call_api(
-        self,
-        api: str,
-        **data: Any
-    ) -> Any:
-        ...
 
 
 class OneBotv11FakeBot(FakeBot, OneBotv11Bot):
 
+    api_mapping = {
+        "get_stranger_info": ApiItem(
+            "get_user_info",
+            {"user_id": Item("user_id", call=str)},
+            lambda r, _: {
+                "user_id": int(r["user_id"]),
+                "nickname": r["nickname"],
+                "sex": "unknown",
+                "age": 0
+            }
+        ),
+        "get_group_info": ApiItem(
+            "get_group_info",
+            {"group_id": Item("group_id", call=str)},
+            lambda r, _: {
+                "group_id": int(r["group_id"]),
+                "group_name": r["group_name"],
+                "member_count": r["member_count"] or 0,
+                "max_member_count": 0
+            }
+        ),
+        "get_group_member_info": ApiItem(
+            "get_group_member_info",
+            {
+                "group_id": Item("group_id", call=str),
+                "user_id": Item("user_id", call=str)
+            },
+            lambda r, _: {
+                "group_id": int(r["group_id"]),
+                "user_id": int(r["user_id"]),
+                "nickname": r["nickname"],
+                "card": r["card"],
+                "role": r["role"]
+            }
+        ),
+        "delete_msg": ApiItem(
+            "delete_msg",
+            {"message_id": Item("message_id", call=str)}
+        ),
+        "set_group_ban": ApiItem(
+            "ban",
+            {
+                "group_id": Item("group_id", call=str),
+                "user_id": Item("user_id", call=str),
+                "duration": Item("duration", default=30*60)
+            }
+        )
+    }
+
     @override
     def __init__(self, uni_bot: UniBot):
         # TODO 未通过父类 Bot.__init__ 方法构造
         super().__init__(uni_bot)
         self.adapter = adapter
+        # 虚假事件中的 id 均为编码后的 id，@ 机器人时与之一致
+        self.self_id = ascii_encode(uni_bot.origin_bot.self_id)
     
     @override
     async def send(
@@ -81,5 +199,6 @@ class OneBotv11FakeBot(FakeBot, OneBotv11Bot):
 add_bot_method(
     OneBotv11Bot,
     OneBotv11UniBot,
-    OneBotv11FakeBot
+    OneBotv11FakeBot,
+    OneBotv11Event
 )
\ No newline at end of file
@@ -23,6 +23,9 @@ from nonebot.adapters.onebot.v11 import (
     HeartbeatMetaEvent
 )
 
+from ...universal.models import PlatformUserData
+from ...universal.store import add_entity_collector
+from ...dedup import add_dedup_key
 from ...universal.uni_event import (
     Item,
     add_uni_event_items,
@@ -47,6 +50,8 @@ from ...universal.uni_event import (
     UniHeartbeatMetaEvent
 )
 
+from .utils import adapter_name
+
 
 add_uni_event_items(
     Event,
@@ -56,6 +61,7 @@ add_uni_event_items(
         "event_id": lambda e: e.get_session_id(),
         "time": Item("time"),
         "self_id": Item("self_id", encode=True),
+        "platform": adapter_name
     },
     event_export_mapping:={
         "time": Item("time"),
@@ -375,4 +381,28 @@ add_uni_event_items(
         "status": {"online": True, "good": True},
         "interval": Item("interval")
     }
-)
\ No newline at end of file
+)
+
+
+def _collect_message_event(e: MessageEvent):
+    if e.sender.nickname is not None:
+        yield adapter_name, PlatformUserData(
+            id=e.user_id,
+            name=e.sender.nickname,
+            avatar=f"https://q1.qlogo.cn/g?b=qq&nk={e.user_id}&s=640"
+        )
+
+add_entity_collector(MessageEvent, _collect_message_event)
+
+
+def _message_dedup_key(e: MessageEvent):
+    return adapter_name, e.self_id, e.message_id, e.time
+
+def _request_dedup_key(e: RequestEvent):
+    # 请求事件以 flag 标识，重放时不变
+    if (flag := getattr(e, "flag", None)) is None:
+        return None
+    return adapter_name, e.self_id, e.request_type, flag
+
+add_dedup_key(MessageEvent, _message_dedup_key)
+add_dedup_key(RequestEvent, _request_dedup_key)
@@ -5,11 +5,135 @@ from nonebot.adapters.onebot.v11 import (
     MessageSegment as OneBotv11MessageSegment
 )
 
-from typing import cast, Optional
+from typing import cast, Optional, Union, Any
+from pathlib import Path
 
 from ...universal.uni_message import *
+from ...universal.codec import SegmentCodec
 from ...utils import ascii_encode, ascii_decode
-from .utils import s2b, s2f
+from ...transcode import MediaProfile, set_media_profile, transcode_media
+from .utils import s2b, as2f
+
+
+codec = SegmentCodec(
+    OneBotv11Adapter,
+    OneBotv11Message,
+    default_generator=lambda ms, bot, encode, **kwargs: UniMessageSegment.other(ms)
+)
+'''OneBot V11 消息段编解码表'''
+
+set_media_profile(
+    OneBotv11Adapter,
+    MediaProfile(max_bytes=30 * 1024 * 1024, formats=("jpeg", "png", "gif", "bmp", "webp"))
+)
+
+
+@codec.generator("text")
+def _(ms: OneBotv11MessageSegment, bot: Optional[OneBotv11Bot], encode: bool, **kwargs):
+    return UniMessageSegment.text(ms, ms.data["text"])
+
+@codec.generator("reply")
+def _(ms: OneBotv11MessageSegment, bot: Optional[OneBotv11Bot], encode: bool, **kwargs):
+    if encode:
+        return UniMessageSegment.reply(ms, ascii_encode(ms.data["id"]))
+    return UniMessageSegment.reply(ms, ms.data["id"])
+
+@codec.generator("at")
+def _(ms: OneBotv11MessageSegment, bot: Optional[OneBotv11Bot], encode: bool, **kwargs):
+    if ms.data["qq"] == "all":
+        return UniMessageSegment.at_all(ms)
+    if bot is not None and str(bot.self_id) == str(ms.data["qq"]):
+        return UniMessageSegment.at_me(ms)
+    if encode:
+        return UniMessageSegment.at_user(ms, ascii_encode(ms.data["qq"]))
+    return UniMessageSegment.at_user(ms, ms.data["qq"])
+
+async def _media_kwargs(ms: OneBotv11MessageSegment) -> dict[str, Any]:
+    kwargs = await as2f(ms.data["file"])
+    # 收到的媒体消息段 file 字段多为文件名，链接位于 url 字段
+    if not kwargs and ms.data.get("url"):
+        kwargs["url"] = ms.data["url"]
+    kwargs.update(
+        cache=s2b(ms.data.get("cache") or "true"),
+        proxy=s2b(ms.data.get("proxy") or "true"),
+        timeout=ms.data.get("timeout")
+    )
+    return kwargs
+
+@codec.generator("image")
+async def _(ms: OneBotv11MessageSegment, bot: Optional[OneBotv11Bot], encode: bool, **kwargs):
+    return UniMessageSegment.image(ms, **(await _media_kwargs(ms)))
+
+@codec.generator("record")
+async def _(ms: OneBotv11MessageSegment, bot: Optional[OneBotv11Bot], encode: bool, **kwargs):
+    return UniMessageSegment.voice(ms, **(await _media_kwargs(ms)))
+
+@codec.generator("video")
+async def _(ms: OneBotv11MessageSegment, bot: Optional[OneBotv11Bot], encode: bool, **kwargs):
+    return UniMessageSegment.video(ms, **(await _media_kwargs(ms)))
+
+
+@codec.exporter(UniText)
+def _(uni_ms: UniText, bot: Optional[OneBotv11Bot], decode: bool, **kwargs):
+    return OneBotv11MessageSegment.text(uni_ms.text)
+
+@codec.exporter(UniReply)
+def _(uni_ms: UniReply, bot: Optional[OneBotv11Bot], decode: bool, **kwargs):
+    if decode:
+        return OneBotv11MessageSegment.reply(int(ascii_decode(cast(int, uni_ms.msg_id))))
+    return OneBotv11MessageSegment.reply(cast(int, uni_ms.msg_id))
+
+@codec.exporter(UniAtAll)
+def _(uni_ms: UniAtAll, bot: Optional[OneBotv11Bot], decode: bool, **kwargs):
+    return OneBotv11MessageSegment.at("all")
+
+@codec.exporter(UniAtMe, bot_dependent=True)
+def _(uni_ms: UniAtMe, bot: Optional[OneBotv11Bot], decode: bool, **kwargs):
+    if bot is not None:
+        return OneBotv11MessageSegment.at(bot.self_id)
+
+@codec.exporter(UniAtUser)
+def _(uni_ms: UniAtUser, bot: Optional[OneBotv11Bot], decode: bool, **kwargs):
+    if decode:
+        return OneBotv11MessageSegment.at(ascii_decode(uni_ms.target_user))
+    return OneBotv11MessageSegment.at(uni_ms.target_user)
+
+async def _media_file(uni_ms: UniMedia) -> Union[str, bytes, Path]:
+    kind, value = await uni_ms.resolve(codec.accepts(type(uni_ms)))
+    if kind == "path":
+        return Path(cast(str, value))
+    return value
+
+@codec.exporter(UniImage, accepts=("url", "path", "bytes"))
+async def _(uni_ms: UniImage, bot: Optional[OneBotv11Bot], decode: bool, **kwargs):
+    # 仅有 url 时不为检查限制而额外读取内容
+    if uni_ms._path is not None or uni_ms._bytes is not None:
+        uni_ms = cast(UniImage, await transcode_media(uni_ms, OneBotv11Adapter))
+    return OneBotv11MessageSegment.image(
+        await _media_file(uni_ms),
+        cache=uni_ms.cache,
+        proxy=uni_ms.proxy,
+        timeout=uni_ms.timeout
+    )
+
+@codec.exporter(UniVoice, accepts=("url", "path", "bytes"))
+async def _(uni_ms: UniVoice, bot: Optional[OneBotv11Bot], decode: bool, **kwargs):
+    return OneBotv11MessageSegment.record(
+        await _media_file(uni_ms),
+        cache=uni_ms.cache,
+        proxy=uni_ms.proxy,
+        timeout=uni_ms.timeout
+    )
+
+@codec.exporter(UniVideo, accepts=("url", "path", "bytes"))
+async def _(uni_ms: UniVideo, bot: Optional[OneBotv11Bot], decode: bool, **kwargs):
+    return OneBotv11MessageSegment.video(
+        await _media_file(uni_ms),
+        cache=uni_ms.cache,
+        proxy=uni_ms.proxy,
+        timeout=uni_ms.timeout
+    )
+
 
 async def generate_func(
         ori_msg: OneBotv11Message,
@@ -17,54 +141,8 @@ async def generate_func(
         encode: bool = True,
         **kwargs
     ) -> UniMessage:
-    '''通过 ExampleMessage 类构造 UniMessage'''
-    res = UniMessage(ori_msg)
-    for ms in ori_msg:
-        if ms.type == "text":
-            res.append(UniMessageSegment.text(ms, ms.data["text"]))
-        elif ms.type == "reply":
-            if encode:
-                res.append(UniMessageSegment.reply(ms, ascii_encode(ms.data["id"])))
-            else:
-                res.append(UniMessageSegment.reply(ms, ms.data["id"]))
-        elif ms.type == "at":
-            if ms.data["qq"] == "all":
-                res.append(UniMessageSegment.at_all(ms))
-            else:
-                if bot is not None and str(bot.self_id) == str(ms.data["qq"]):
-                    res.append(UniMessageSegment.at_me(ms))
-                else:
-                    if encode:
-                        res.append(UniMessageSegment.at_user(ms, ascii_encode(ms.data["qq"])))
-                    else:
-                        res.append(UniMessageSegment.at_user(ms, ms.data["qq"]))
-        elif ms.type == "image":
-            res.append(UniMessageSegment.image(
-                ms,
-                **s2f(ms.data["file"]),
-                cache=s2b(ms.data["cache"]),
-                proxy=s2b(ms.data["proxy"]),
-                timeout=ms.data["timeout"]
-            ))
-        elif ms.type == "record":
-            res.append(UniMessageSegment.voice(
-                ms,
-                **s2f(ms.data["file"]),
-                cache=s2b(ms.data["cache"]),
-                proxy=s2b(ms.data["proxy"]),
-                timeout=ms.data["timeout"]
-            ))
-        elif ms.type == "video":
-            res.append(UniMessageSegment.video(
-                ms,
-                **s2f(ms.data["file"]),
-                cache=s2b(ms.data["cache"]),
-                proxy=s2b(ms.data["proxy"]),
-                timeout=ms.data["timeout"]
-            ))
-        else:
-            res.append(UniMessageSegment.other(ms))
-    return res
+    '''通过 OneBotv11Message 类构造 UniMessage'''
+    return await codec.generate(ori_msg, bot, encode, **kwargs)
 
 
 async def export_func(
@@ -73,53 +151,8 @@ async def export_func(
             decode: bool = True,
             **kwargs
         ) -> OneBotv11Message:
-    '''通过 UniMessage 构造 ExampleMessage'''
-    res = OneBotv11Message()
-    for uni_ms in uni_msg:
-        if isinstance(uni_ms, UniText):
-            res.append(OneBotv11MessageSegment.text(uni_ms.text))
-        elif isinstance(uni_ms, UniReply):
-            if decode:
-                res.append(OneBotv11MessageSegment.reply(int(ascii_decode(cast(int, uni_ms.msg_id)))))
-            else:
-                res.append(OneBotv11MessageSegment.reply(cast(int, uni_ms.msg_id)))
-        elif isinstance(uni_ms, UniAtAll):
-            res.append(OneBotv11MessageSegment.at("all"))
-        elif isinstance(uni_ms, UniAtMe):
-            if bot is not None:
-                res.append(OneBotv11MessageSegment.at(bot.self_id))
-            else:
-                ...
-        elif isinstance(uni_ms, UniAtUser):
-            if decode:
-                res.append(OneBotv11MessageSegment.at(ascii_decode(uni_ms.target_user)))
-            else:
-                res.append(OneBotv11MessageSegment.at(uni_ms.target_user))
-        elif isinstance(uni_ms, UniImage):
-            res.append(OneBotv11MessageSegment.image(
-                uni_ms.path,
-                cache=uni_ms.cache,
-                proxy=uni_ms.proxy,
-                timeout=uni_ms.timeout
-            ))
-        elif isinstance(uni_ms, UniVoice):
-            res.append(OneBotv11MessageSegment.record(
-                uni_ms.path,
-                cache=uni_ms.cache,
-                proxy=uni_ms.proxy,
-                timeout=uni_ms.timeout
-            ))
-        elif isinstance(uni_ms, UniVideo):
-            res.append(OneBotv11MessageSegment.video(
-                uni_ms.path,
-                cache=uni_ms.cache,
-                proxy=uni_ms.proxy,
-                timeout=uni_ms.timeout
-            ))
-        else:
-            continue
-    return res
-        
+    '''通过 UniMessage 构造 OneBotv11Message'''
+    return cast(OneBotv11Message, await codec.export(uni_msg, bot, decode, **kwargs))
 
 
 add_message_change(
@@ -127,4 +160,4 @@ add_message_change(
     generate_func,
     export_func,
     OneBotv11Message
-)
\ No newline at end of file
+)
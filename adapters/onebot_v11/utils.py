@@ -5,6 +5,8 @@ from typing import Optional, Any
 from base64 import b64decode
 from pathlib import Path
 
+from ...media_worker import b64decode as async_b64decode
+
 
 adapter_name = Adapter.get_name()
 '''适配器名称'''
@@ -29,4 +31,12 @@ def s2f(s:str) -> dict[str, Any]:
     if s.startswith("base64://"):
         b64 = s.removeprefix("base64://")
         res["bytes"] = b64decode(b64)
-    return res
\ No newline at end of file
+    if s.startswith(("http://", "https://")):
+        res["url"] = s
+    return res
+
+async def as2f(s:str) -> dict[str, Any]:
+    '''s2f 的异步版本，较大的 base64 内容交由媒体工作进程池解码'''
+    if s.startswith("base64://"):
+        return {"bytes": await async_b64decode(s.removeprefix("base64://"))}
+    return s2f(s)
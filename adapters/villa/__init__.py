@@ -1,3 +1,5 @@
 from .bot import *
 from .event import *
-from .message import *
\ No newline at end of file
+from .message import *
+from .context import *
+from .upload import *
\ No newline at end of file
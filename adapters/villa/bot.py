@@ -1,27 +1,143 @@
 from typing_extensions import override
 from typing import TYPE_CHECKING, Union, Any, cast
 
+from pydantic import parse_obj_as
+
 from nonebot.adapters.villa import (
     Bot as VillaBot,
     Adapter as VillaAdapter
 )
-from nonebot.adapters.villa.config import BotInfo
+from nonebot.adapters import Bot as BaseBot
 from nonebot.adapters.villa.event import Event
 from nonebot.adapters.villa.message import Message, MessageSegment
+from nonebot.adapters.villa.models import Member, Villa, RoleType, Room
+
+from ...universal.models import PlatformUserData, Room as RoomModel
+from ...universal.store import entity_store
 
-from ...universal.uni_bot import UniBot, FakeBot, add_bot_method
+from ...universal.uni_bot import UniBot, FakeBot, ApiItem, add_bot_method
+from ...universal.uni_event import Item
 from ...universal.uni_message import UniMessage
+from ...utils import ascii_encode, ascii_decode
+from ...config import config
+
+from .utils import adapter_name, villa_room_id_convert, room_ids
+from .context import get_context
 
 if TYPE_CHECKING:
     from ...universal.uni_event import UniEvent
-    
+
+
+def _decode_id(s: str) -> int:
+    '''将编码后的 id 解码为大别野的整数 id'''
+    return int(ascii_decode(s))
+
+def _decode_group_id(group_id: str) -> tuple[int, int]:
+    '''将编码后的群聊 id 解码为 (villa_id, room_id)'''
+    return room_ids.decode(group_id)
+
+def _villa_id(data: dict[str, Any]) -> int:
+    if (group_id := data.get("group_id")) is None:
+        raise ValueError("调用大别野 API 时，需要提供 group_id 参数。")
+    return _decode_group_id(group_id)[0]
+
+def _room_id(data: dict[str, Any]) -> int:
+    if (group_id := data.get("group_id")) is None:
+        raise ValueError("调用大别野 API 时，需要提供 group_id 参数。")
+    return _decode_group_id(group_id)[1]
+
+def _user_info_result(r: Member, _) -> dict[str, Any]:
+    if config.sekaiju_entity_store:
+        entity_store.put(adapter_name, PlatformUserData(
+            id=r.basic.uid,
+            name=r.basic.nickname,
+            avatar=r.basic.avatar_url or None
+        ))
+    return {
+        "user_id": ascii_encode(r.basic.uid),
+        "nickname": r.basic.nickname,
+        "avatar": r.basic.avatar_url
+    }
+
+def _group_info_result(r: Room, data: dict[str, Any]) -> dict[str, Any]:
+    if config.sekaiju_entity_store:
+        villa_id, room_id = _decode_group_id(data["group_id"])
+        entity_store.put(adapter_name, RoomModel(
+            id=cast(str, villa_room_id_convert("encode", villa_id, room_id)),
+            name=r.room_name,
+            platform=adapter_name,
+            is_available=True,
+            channel_id=str(villa_id)
+        ))
+    return {
+        "group_id": data["group_id"],
+        "group_name": r.room_name,
+        "member_count": None
+    }
+
+def _member_role(member: Member) -> str:
+    '''由大别野成员身份组得到统一角色'''
+    role_types = {role.role_type for role in member.role_list}
+    if RoleType.OWNER in role_types:
+        return "owner"
+    if RoleType.ADMIN in role_types:
+        return "admin"
+    return "member"
+
 
 
 class VillaUniBot(UniBot):
 
+    origin_bot: VillaBot
+
+    api_mapping = {
+        "get_user_info": ApiItem(
+            "get_member",
+            {
+                "villa_id": _villa_id,
+                "uid": Item("user_id", call=_decode_id)
+            },
+            _user_info_result,
+            cache_ttl=300
+        ),
+        "get_group_info": ApiItem(
+            "get_room",
+            {
+                "villa_id": _villa_id,
+                "room_id": _room_id
+            },
+            _group_info_result,
+            cache_ttl=300
+        ),
+        "get_group_member_info": ApiItem(
+            "get_member",
+            {
+                "villa_id": _villa_id,
+                "uid": Item("user_id", call=_decode_id)
+            },
+            lambda r, d: {
+                "group_id": d["group_id"],
+                "user_id": ascii_encode(r.basic.uid),
+                "nickname": r.basic.nickname,
+                "card": r.basic.nickname,
+                "role": _member_role(r)
+            },
+            cache_ttl=60
+        ),
+        "delete_msg": ApiItem(
+            "recall_message",
+            {
+                "villa_id": _villa_id,
+                "room_id": _room_id,
+                "msg_uid": Item("message_id", call=ascii_decode),
+                "msg_time": Item("time", default=0)
+            }
+        )
+    }
+
     @override
     def __init__(self, bot: VillaBot):
-        self.origin_bot = bot
+        super().__init__(bot)
 
     @override
     async def send(
@@ -39,35 +155,75 @@ class VillaUniBot(UniBot):
         else:
             _message = message
         return await self.origin_bot.send(event.origin_event, _message, **kwargs)
-    
+
     @override
     async def call_api(
         self,
         api: str,
         **data: Any
     ) -> Any:
-        ...
-        # TODO call_api 方法未实现
+        # 大别野只能在某个大别野内查询用户，未提供 group_id 时使用最近见到该用户的大别野
+        if api == "get_user_info" and data.get("group_id") is None and data.get("user_id") is not None:
+            villa_id = get_context(self.origin_bot).find_villa(_decode_id(data["user_id"]))
+            if villa_id is None:
+                raise ValueError("未提供 group_id，且近期未在任何大别野中见到该用户。")
+            data["group_id"] = room_ids.encode(villa_id, 0)
+        return await super().call_api(api, **data)
 
 class VillaFakeBot(FakeBot, VillaBot):
 
+    # 虚假事件中其他平台的群聊以其原 id 作为 villa_id，调用统一 API 时重新编码为群聊 id
+    api_mapping = {
+        "get_member": ApiItem(
+            "get_group_member_info",
+            {
+                "group_id": Item("villa_id", call=ascii_encode),
+                "user_id": Item("uid", call=str)
+            },
+            lambda r, _: parse_obj_as(Member, {
+                "basic": {
+                    "uid": int(r["user_id"]),
+                    "nickname": r["card"],
+                    "introduce": "",
+                    "avatar_url": ""
+                },
+                "role_id_list": [],
+                "joined_at": 0,
+                "role_list": []
+            })
+        ),
+        "get_villa": ApiItem(
+            "get_group_info",
+            {"group_id": Item("villa_id", call=ascii_encode)},
+            lambda r, _: parse_obj_as(Villa, {
+                "villa_id": int(ascii_decode(r["group_id"])),
+                "name": r["group_name"],
+                "villa_avatar_url": "",
+                "onwer_uid": 0,
+                "is_official": False,
+                "introduce": "",
+                "category_id": 0,
+                "tags": []
+            })
+        ),
+        "recall_message": ApiItem(
+            "delete_msg",
+            {
+                "group_id": Item("villa_id", call=ascii_encode),
+                "message_id": Item("msg_uid"),
+                "time": Item("msg_time")
+            }
+        )
+    }
+
     @override
     def __init__(self, uni_bot: UniBot):
         fake_adapter = cast(VillaAdapter, ...)
         fake_self_id = "VillaFakeBot"
-        fake_bot_info = BotInfo(
-            bot_id="",
-            bot_secret="",
-            pub_key="",
-
-        )
         FakeBot.__init__(self, uni_bot)
-        VillaBot.__init__(
-            self,
-            fake_adapter,
-            fake_self_id,
-            fake_bot_info
-        )
+        # 虚假 Bot 不接收回调，无需 VillaBot.__init__ 中的密钥与公钥，后者无法由空字符串解析
+        BaseBot.__init__(self, fake_adapter, fake_self_id)
+        self._bot_info = None
     
     @override
     async def send(
@@ -87,22 +243,14 @@ class VillaFakeBot(FakeBot, VillaBot):
         else:
             _message = message
         return await self.uni_bot.send(
-            cast(UniEvent, getattr(event, "uni_event")),
+            cast("UniEvent", getattr(event, "uni_event")),
             _message,
             **kwargs
-        )    
-    
-    @override
-    async def call_api(
-        self,
-        api: str,
-        **data: Any
-    ) -> Any:
-        ...
-        # TODO Villa Bot 其他方法未实现
+        )
 
 add_bot_method(
     VillaBot,
     VillaUniBot,
-    VillaFakeBot
+    VillaFakeBot,
+    Event
 )
\ No newline at end of file
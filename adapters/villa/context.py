@@ -0,0 +1,109 @@
+'''
+大别野 Bot 上下文缓存。
+
+由收到的 SendMessageEvent 与 JoinVillaEvent 填充，记录各大别野的房间、成员昵称、
+近期消息发送时间与机器人模板，供导出消息与事件时补全信息，减少 API 调用。
+'''
+
+from typing import Optional
+from dataclasses import dataclass, field
+
+from nonebot.message import event_preprocessor
+from nonebot.typing import T_State
+from nonebot.internal.adapter import Bot as BaseBot, Event as BaseEvent
+from nonebot.adapters.villa import Bot as VillaBot
+from nonebot.adapters.villa.event import Event, SendMessageEvent, JoinVillaEvent
+from nonebot.adapters.villa.models import Template
+
+from ...cache import TTLCache
+from ...config import config
+from ...dedup import deduplicator
+
+
+@dataclass
+class VillaInfo:
+    '''大别野信息'''
+
+    villa_id: int
+    room_ids: set[int] = field(default_factory=set)
+    '''已知的房间 id'''
+
+
+class VillaContext:
+    '''单个大别野 Bot 的上下文缓存'''
+
+    robot: Optional[Template]
+    '''机器人模板'''
+
+    def __init__(self, maxsize: int, ttl: Optional[float]):
+        self.robot = None
+        self.villas: TTLCache[int, VillaInfo] = TTLCache(maxsize, ttl)
+        self.nicknames: TTLCache[tuple[int, int], str] = TTLCache(maxsize, ttl)
+        self.user_villas: TTLCache[int, int] = TTLCache(maxsize, ttl)
+        '''各用户最近所在的大别野 id，与 nicknames 同时写入'''
+        self.message_times: TTLCache[str, int] = TTLCache(maxsize, ttl)
+
+    def get_villa(self, villa_id: int) -> VillaInfo:
+        if (villa := self.villas.get(villa_id)) is None:
+            villa = VillaInfo(villa_id)
+        # 重新写入以刷新过期时间
+        self.villas.set(villa_id, villa)
+        return villa
+
+    def get_nickname(self, villa_id: int, user_id: int) -> Optional[str]:
+        '''获取用户在大别野中的昵称'''
+        return self.nicknames.get((villa_id, user_id))
+
+    def find_villa(self, user_id: int) -> Optional[int]:
+        '''获取最近见到该用户的大别野 id'''
+        return self.user_villas.get(user_id)
+
+    def set_nickname(self, villa_id: int, user_id: int, nickname: str):
+        '''记录用户在大别野中的昵称'''
+        self.nicknames.set((villa_id, user_id), nickname)
+        self.user_villas.set(user_id, villa_id)
+
+    def get_message_time(self, msg_uid: str) -> Optional[int]:
+        '''获取近期消息的发送时间'''
+        return self.message_times.get(msg_uid)
+
+    def observe(self, event: Event):
+        '''从事件中收集上下文信息'''
+        self.robot = event.robot.template
+        if isinstance(event, SendMessageEvent):
+            self.get_villa(event.villa_id).room_ids.add(event.room_id)
+            self.set_nickname(event.villa_id, event.from_user_id, event.nickname)
+            self.message_times.set(event.msg_uid, event.send_at)
+        elif isinstance(event, JoinVillaEvent):
+            self.get_villa(event.villa_id)
+            self.set_nickname(event.villa_id, event.join_uid, event.join_user_nickname)
+
+
+villa_contexts: dict[str, VillaContext] = {}
+'''各大别野 Bot 的上下文缓存，以 Bot self_id 为键'''
+
+def get_context(bot: VillaBot) -> VillaContext:
+    '''获取大别野 Bot 对应的上下文缓存'''
+    if (context := villa_contexts.get(bot.self_id)) is None:
+        context = VillaContext(config.sekaiju_villa_context_size, config.sekaiju_villa_context_ttl)
+        villa_contexts[bot.self_id] = context
+    return context
+
+
+# 参数类型不直接标注为大别野类型，避免其他平台事件经世界树转换后进入此处
+@event_preprocessor
+async def _(bot: BaseBot, event: BaseEvent, state: T_State):
+    if not (isinstance(bot, VillaBot) and isinstance(event, Event)):
+        return
+    # 与去重预处理并发运行，需自行跳过重复投递的事件
+    if config.sekaiju_event_dedup and deduplicator.check(event, state):
+        return
+    get_context(bot).observe(event)
+
+
+__all__ = [
+    "VillaInfo",
+    "VillaContext",
+    "villa_contexts",
+    "get_context"
+]
@@ -3,7 +3,10 @@ from nonebot.adapters.villa.event import (
     Event,
     NoticeEvent,
     JoinVillaEvent,
-    SendMessageEvent
+    SendMessageEvent,
+    AddQuickEmoticonEvent,
+    AuditCallbackEvent,
+    ClickMsgComponentEvent
 )
 
 from nonebot.adapters.villa.models import (
@@ -11,11 +14,13 @@ from nonebot.adapters.villa.models import (
     Robot,
     Template,
     MessageContentInfoGet,
-    TextMessageContent
+    TextMessageContent,
+    VillaRoomLink
 )
 
 from ...universal.uni_event import (
     Item,
+    BotItem,
     add_uni_event_items,
     UniEvent,
     UniNoticeEvent,
@@ -23,10 +28,21 @@ from ...universal.uni_event import (
     UniGroupIncreaseNoticeEvent
 )
 
-from typing import cast
+from ...universal.uni_message import UniMessage, UniText
+from ...universal.models import PlatformUserData, Room as RoomModel
+from ...universal.store import entity_store, add_entity_collector
+from ...universal.uni_bot import FakeBot
+from ...dedup import add_dedup_key
+from ...config import config
+
+from typing import Optional, Any, cast
+
+from nonebot.adapters import Bot
+from nonebot.adapters.villa import Bot as VillaBot
 
-from .utils import adapter_name, villa_room_id_convert
-from ...utils import ascii_encode, ascii_decode
+from .utils import adapter_name, room_ids, villa_room_id_convert
+from .context import VillaContext, villa_contexts, get_context
+from ...utils import ascii_encode, ascii_decode, Encoded
 
 
 
@@ -36,6 +52,83 @@ event_type_mapping = {
 }
 
 
+def _stored_user(platform: Optional[str], user_id: Optional[Encoded]) -> Optional[PlatformUserData]:
+    '''从本地信息存储的内存缓存中获取 UniEvent 来源平台的用户信息，导出时不读取数据库'''
+    if not config.sekaiju_entity_store or platform is None or user_id is None:
+        return None
+    try:
+        return entity_store.peek_user(platform, ascii_decode(user_id))
+    except ValueError:
+        return None
+
+def _user_name(platform: Optional[str], user_id: Optional[Encoded], default: str) -> str:
+    if (user := _stored_user(platform, user_id)) is not None:
+        return user.name
+    return default
+
+def _group_ids(e: UniEvent) -> tuple[int, int]:
+    """
+    由导出事件的群聊 id 得到 (villa_id, room_id)，无群聊 id 或无法解析时为 (0, 0)。
+
+    其他平台的群聊视作一个大别野，villa_id 为其原 id，room_id 为 0，与 VillaFakeBot 的 API 转换一致。
+    """
+    if (group_id := getattr(e, "group_id", None)) is None:
+        return 0, 0
+    try:
+        if e.platform == adapter_name:
+            return room_ids.decode(group_id)
+        return int(ascii_decode(group_id)), 0
+    except ValueError:
+        return 0, 0
+
+def _plain_text(message: UniMessage) -> str:
+    '''UniMessage 中的纯文本，用于导出事件的消息内容信息'''
+    return "".join(seg.text for seg in message if isinstance(seg, UniText))
+
+def _user_avatar(platform: Optional[str], user_id: Optional[Encoded]) -> str:
+    if (user := _stored_user(platform, user_id)) is not None and user.avatar is not None:
+        return user.avatar
+    return ""
+
+def _robot_context(e: UniEvent, bot: Optional[Bot]) -> Optional[VillaContext]:
+    '''导出事件中机器人所对应的大别野 Bot 上下文缓存，导出所用 Bot 为虚假 Bot 且事件不来自大别野时为 None'''
+    if isinstance(bot, VillaBot) and not isinstance(bot, FakeBot):
+        return get_context(bot)
+    if e.platform == adapter_name and e.self_id is not None:
+        try:
+            return villa_contexts.get(ascii_decode(e.self_id))
+        except ValueError:
+            return None
+    return None
+
+def _robot(e: UniEvent, bot: Optional[Bot]) -> dict[str, Any]:
+    """
+    导出事件的机器人信息。
+
+    优先使用大别野 Bot 上下文缓存中的机器人模板；否则以导出所用 Bot（虚假 Bot 时为事件来源平台的 Bot）
+    的 id 构建，名称与头像取自本地信息存储，未知时名称为其 id.
+    """
+    villa_id = _group_ids(e)[0]
+    if (context := _robot_context(e, bot)) is not None and context.robot is not None:
+        return {"villa_id": villa_id, "template": context.robot}
+    if isinstance(bot, VillaBot) and not isinstance(bot, FakeBot):
+        platform, self_id, bot_id = adapter_name, ascii_encode(bot.self_id), bot.self_id
+    else:
+        platform, self_id = e.platform, e.self_id
+        try:
+            bot_id = ascii_decode(self_id) if self_id is not None else ""
+        except ValueError:
+            bot_id = str(self_id)
+    return {
+        "villa_id": villa_id,
+        "template": {
+            "id": self_id,
+            "name": _user_name(platform, self_id, bot_id),
+            "icon": _user_avatar(platform, self_id)
+        }
+    }
+
+
 
 add_uni_event_items(
     Event,
@@ -44,22 +137,17 @@ add_uni_event_items(
         "post_type": lambda e: event_type_mapping.get(e.type, "other"),
         "event_id": Item("id", encode=True),
         "time": Item("send_at"),
-        "self_id": Item("bot_id", encode=True)
+        "self_id": Item("bot_id", encode=True),
+        "platform": adapter_name
     },
     event_export_mapping:={
-        "robot": lambda e: {
-            "villa_id": 0, # 未保存 villa
-            "template": {
-                "id": e.self_id,
-                "name": "机器人", # 未保存机器人名称,
-                "icon": "" # 未保存机器人图标
-            }
-        },
+        "robot": BotItem(_robot),
         "type": EventType.SendMessage, # 未能一一对应事件类型
         "id": Item("event_id"),
         "created_at": Item("time"),
         "send_at": Item("time")
-    }
+    },
+    export_by_fields=True
 )
 
 add_uni_event_items(
@@ -72,7 +160,8 @@ add_uni_event_items(
     },
     {
         **event_export_mapping,
-    }
+    },
+    export_by_fields=True
 )
 
 add_uni_event_items(
@@ -87,36 +176,33 @@ add_uni_event_items(
         "message": Item("message", is_msg=True, origin_adapter=adapter_name),
         "to_me": Item("to_me"),
         "sub_type": "normal",
-        "group_id": lambda e: ascii_encode(
-            cast(str, villa_room_id_convert(
-                "encode",
-                e.villa_id,
-                e.room_id
-            )))
+        "group_id": lambda e: room_ids.encode(e.villa_id, e.room_id)
     },
     {
         **event_export_mapping,
         "content": lambda e: {
-            "user": { # 未设定默认用户信息
-                "portrait_uri": "",
+            "content": {"text": _plain_text(e.message), "entities": []},
+            "user": {
+                "portraitUri": _user_avatar(e.platform, e.user_id),
                 "extra": {},
-                "name": "用户",
+                "name": _user_name(e.platform, e.user_id, "用户"),
                 "alias": "",
                 "id": e.user_id,
-                "portrait": ""
+                "portrait": _user_avatar(e.platform, e.user_id)
             },
             "trace": None
         },
         "from_user_id": Item("user_id"),
         "send_at": 0,
-        "room_id": Item("group_id"),
+        "room_id": lambda e: _group_ids(e)[1],
         "object_name": 0,
-        "nickname": "",
+        "nickname": lambda e: _user_name(e.platform, e.user_id, ""),
         "msg_uid": Item("message_id"),
-        "villa_id": Item("group_id"),
+        "villa_id": lambda e: _group_ids(e)[0],
         "message": Item("message", is_msg=True, target_adapter=adapter_name),
         "original_message": Item("message", is_msg=True, target_adapter=adapter_name)
-    }
+    },
+    export_by_fields=True
 )
 
 add_uni_event_items(
@@ -126,14 +212,70 @@ add_uni_event_items(
         **event_parse_mapping,
         "notice_type": "group_increase",
         "sub_type": "approve",
-        "group_id": Item("villa_id"),
+        # 加入大别野不属于具体房间，room_id 记为 0
+        "group_id": lambda e: room_ids.encode(e.villa_id, 0),
         "user_id": Item("join_uid", encode=True)
     },
     {
         **event_export_mapping,
         "join_uid": Item("user_id"),
-        "join_user_nickname": "用户",
+        "join_user_nickname": lambda e: _user_name(e.platform, e.user_id, "用户"),
         "join_at": 0,
-        "villa_id": Item("group_id")
-    }
-)
\ No newline at end of file
+        "villa_id": lambda e: _group_ids(e)[0]
+    },
+    export_by_fields=True
+)
+
+
+def _collect_event(e: Event):
+    template = e.robot.template
+    yield adapter_name, PlatformUserData(id=template.id, name=template.name, avatar=template.icon)
+
+def _collect_send_message_event(e: SendMessageEvent):
+    yield adapter_name, PlatformUserData(
+        id=e.from_user_id,
+        name=e.nickname,
+        avatar=e.content.user.portrait or None
+    )
+
+def _collect_join_villa_event(e: JoinVillaEvent):
+    yield adapter_name, PlatformUserData(id=e.join_uid, name=e.join_user_nickname)
+
+def _room(villa_id: int, room_id: int, name: str) -> RoomModel:
+    return RoomModel(
+        id=cast(str, villa_room_id_convert("encode", villa_id, room_id)),
+        name=name,
+        platform=adapter_name,
+        is_available=True,
+        channel_id=str(villa_id)
+    )
+
+def _collect_room(e: Event):
+    # 事件仅携带房间 id，名称留空，不覆盖已存储的信息
+    yield adapter_name, _room(getattr(e, "villa_id"), getattr(e, "room_id"), "")
+
+def _collect_room_links(e: SendMessageEvent):
+    # 房间链接的名称仅保留在消息内容的实体中
+    if not isinstance(content := e.content.content, TextMessageContent):
+        return
+    for text_entity in content.entities:
+        if isinstance(link := text_entity.entity, VillaRoomLink) and link.room_name:
+            yield adapter_name, _room(int(link.villa_id), int(link.room_id), link.room_name)
+
+add_entity_collector(Event, _collect_event)
+add_entity_collector(SendMessageEvent, _collect_send_message_event)
+add_entity_collector(JoinVillaEvent, _collect_join_villa_event)
+add_entity_collector(SendMessageEvent, _collect_room_links)
+for event_cls in (SendMessageEvent, AddQuickEmoticonEvent, AuditCallbackEvent, ClickMsgComponentEvent):
+    add_entity_collector(event_cls, _collect_room, replace=False)
+
+
+def _dedup_key(e: Event):
+    # 重新投递的回调事件 id 不变
+    return adapter_name, e.bot_id, e.id, e.send_at
+
+def _send_message_dedup_key(e: SendMessageEvent):
+    return adapter_name, e.bot_id, e.id, e.send_at, e.msg_uid
+
+add_dedup_key(Event, _dedup_key)
+add_dedup_key(SendMessageEvent, _send_message_dedup_key)
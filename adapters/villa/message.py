@@ -6,11 +6,128 @@ from nonebot.adapters.villa import (
 )
 
 from typing import cast, Optional
+from pathlib import Path
 
 from ...universal.uni_message import *
+from ...universal.codec import SegmentCodec
+from ...universal.uni_bot import FakeBot
 from ...utils import ascii_encode, ascii_decode
+from ...metrics import instrument
+from ...transcode import MediaProfile, set_media_profile, transcode_media
 
 from .utils import TIMEOUT
+from .context import get_context
+from .upload import get_upload_cache
+
+
+codec = SegmentCodec(
+    VillaAdapter,
+    VillaMessage,
+    default_generator=lambda ms, bot, encode, **kwargs: UniMessageSegment.other(ms)
+)
+'''大别野消息段编解码表'''
+
+set_media_profile(
+    VillaAdapter,
+    MediaProfile(max_bytes=10 * 1024 * 1024, formats=("jpeg", "png", "gif", "bmp"))
+)
+
+
+@codec.generator("text")
+def _(ms: VillaMessageSegment, bot: Optional[VillaBot], encode: bool, **kwargs):
+    return UniMessageSegment.text(ms, ms.data["text"])
+
+@codec.generator("mention_robot")
+def _(ms: VillaMessageSegment, bot: Optional[VillaBot], encode: bool, **kwargs):
+    return UniMessageSegment.at_me(ms)
+
+@codec.generator("mention_user")
+def _(ms: VillaMessageSegment, bot: Optional[VillaBot], encode: bool, **kwargs):
+    if encode:
+        return UniMessageSegment.at_user(ms, ascii_encode(ms.data["mention_user"].user_id))
+    return UniMessageSegment.at_user(ms, ms.data["mention_user"].user_id)
+
+@codec.generator("mention_all")
+def _(ms: VillaMessageSegment, bot: Optional[VillaBot], encode: bool, **kwargs):
+    return UniMessageSegment.at_all(ms)
+
+@codec.generator("quote")
+def _(ms: VillaMessageSegment, bot: Optional[VillaBot], encode: bool, **kwargs):
+    if encode:
+        return UniMessageSegment.reply(ms, ascii_encode(ms.data["quote"].quoted_message_id))
+    return UniMessageSegment.reply(ms, ms.data["quote"].quoted_message_id)
+
+@codec.generator("image")
+def _(ms: VillaMessageSegment, bot: Optional[VillaBot], encode: bool, **kwargs):
+    return UniMessageSegment.image(
+        ms,
+        url=ms.data["image"].url
+    )
+
+
+@instrument("villa_upload_image")
+async def _upload_image(bot: VillaBot, data: bytes) -> str:
+    return (await bot.upload_image(data)).url
+
+
+@codec.exporter(UniText)
+def _(uni_ms: UniText, bot: VillaBot, decode: bool, **kwargs):
+    return VillaMessageSegment.text(uni_ms.text)
+
+@codec.exporter(UniReply)
+def _(uni_ms: UniReply, bot: VillaBot, decode: bool, **kwargs):
+    msg_id = ascii_decode(uni_ms.msg_id) if decode else str(uni_ms.msg_id)
+    return VillaMessageSegment.quote(msg_id, get_context(bot).get_message_time(msg_id) or 0)
+
+@codec.exporter(UniAtAll)
+def _(uni_ms: UniAtAll, bot: VillaBot, decode: bool, **kwargs):
+    return VillaMessageSegment.mention_all()
+
+@codec.exporter(UniAtUser)
+def _(uni_ms: UniAtUser, bot: VillaBot, decode: bool, **kwargs):
+    villa_id: Optional[int] = kwargs.get("villa_id")
+    user_id = int(ascii_decode(uni_ms.target_user) if decode else uni_ms.target_user)
+    # 优先使用已知昵称，避免适配器再通过 villa_id 调用 API 查询
+    user_name = kwargs.get("user_name")
+    if user_name is None and villa_id is not None:
+        user_name = get_context(bot).get_nickname(villa_id, user_id)
+    if user_name is None and villa_id is None:
+        user_name = "用户"
+    return VillaMessageSegment.mention_user(
+        user_id,
+        user_name=user_name,
+        villa_id=villa_id
+    )
+
+@codec.exporter(UniAtMe, bot_dependent=True)
+def _(uni_ms: UniAtMe, bot: VillaBot, decode: bool, **kwargs):
+    context = get_context(bot)
+    if context.robot is not None:
+        bot_name = context.robot.name
+    else:
+        # 尚未收到事件的 Bot 无法取得昵称
+        try:
+            bot_name = bot.nickname
+        except ValueError:
+            bot_name = bot.self_id
+    return VillaMessageSegment.mention_robot(bot_id=bot.self_id, bot_name=bot_name)
+
+# 大别野仅接受经上传接口上传后的图片链接
+@codec.exporter(UniImage, accepts=("bytes",))
+async def _(uni_ms: UniImage, bot: VillaBot, decode: bool, **kwargs):
+    if isinstance(bot, FakeBot):
+        # 虚假事件仅在本地交由处理函数，不经上传接口，使用已有链接或本地文件链接
+        kind, value = await uni_ms.resolve(("url", "path"))
+        return VillaMessageSegment.image(url=value if kind == "url" else Path(value).as_uri())
+    uploaded = await get_upload_cache(bot).upload(
+        cast(UniImage, await transcode_media(uni_ms, VillaAdapter)),
+        lambda data: _upload_image(bot, data)
+    )
+    return VillaMessageSegment.image(
+        url = uploaded.url,
+        width = uploaded.width,
+        height= uploaded.height
+    )
 
 
 async def generate_func(
@@ -20,32 +137,7 @@ async def generate_func(
         **kwargs
     ) -> UniMessage:
     '''通过 VillaMessage 类构造 UniMessage'''
-    res = UniMessage(ori_msg)
-    for ms in ori_msg:
-        if ms.type == "text":
-            res.append(UniMessageSegment.text(ms, ms.data["text"]))
-        elif ms.type == "mention_robot":
-            res.append(UniMessageSegment.at_me(ms))
-        elif ms.type == "mention_user":
-            if encode:
-                res.append(UniMessageSegment.at_user(ms, ascii_encode(ms.data["mention_user"].user_id)))
-            else:
-                res.append(UniMessageSegment.at_user(ms, ms.data["mention_user"].user_id))
-        elif ms.type == "mention_all":
-            res.append(UniMessageSegment.at_all(ms))
-        elif ms.type == "quote":
-            if encode:
-                res.append(UniMessageSegment.reply(ms, ascii_encode(ms.data["quote"].quoted_message_id)))
-            else:
-                res.append(UniMessageSegment.reply(ms, ms.data["quote"].quoted_message_id))
-        elif ms.type == "image":
-            res.append(UniMessageSegment.image(
-                ms,
-                url=ms.data["image"].url
-            ))
-        else:
-            res.append(UniMessageSegment.other(ms))
-    return res
+    return await codec.generate(ori_msg, bot, encode, **kwargs)
 
 async def export_func(
         uni_msg: UniMessage,
@@ -56,46 +148,7 @@ async def export_func(
     '''通过 UniMessage 构造 VillaMessage'''
     if bot is None:
         raise ValueError("将 UniMessage 转出为大别野 Message 时，必须要有 Bot 参数。")
-    res = VillaMessage()
-    for uni_ms in uni_msg:
-        if isinstance(uni_ms, UniText):
-            res.append(VillaMessageSegment.text(uni_ms.text))
-        elif isinstance(uni_ms, UniReply):
-            if decode:
-                res.append(VillaMessageSegment.quote(ascii_decode(uni_ms.msg_id), 0))
-            else:
-                res.append(VillaMessageSegment.quote(uni_ms.msg_id, 0))
-        elif isinstance(uni_ms, UniAtAll):
-            res.append(VillaMessageSegment.mention_all())
-        elif isinstance(uni_ms, UniAtUser):
-            temp_kwargs = {}
-            if (villa_id := kwargs.get("villa_id")) is None:
-                temp_kwargs["villa_id"] = villa_id
-            if (user_name := kwargs.get("user_name")) is None:
-                temp_kwargs["user_name"] = user_name
-            elif villa_id is None:
-                temp_kwargs["user_name"] = "用户"
-            if decode:
-                res.append(VillaMessageSegment.mention_user(
-                    cast(int, ascii_decode(uni_ms.target_user)),
-                    **temp_kwargs
-                ))
-            else:
-                res.append(VillaMessageSegment.mention_user(
-                    cast(int, uni_ms.target_user),
-                    **temp_kwargs
-                ))
-        elif isinstance(uni_ms, UniAtMe):
-            res.append(VillaMessageSegment.mention_robot(bot_id=bot.self_id, bot_name=bot.nickname))
-        elif isinstance(uni_ms, UniImage):
-            res.append(VillaMessageSegment.image(
-                url = (await bot.upload_image(uni_ms.bytes)).url,
-                width = uni_ms.width,
-                height= uni_ms.height
-            ))
-        else:
-            continue
-    return res
+    return cast(VillaMessage, await codec.export(uni_msg, bot, decode, **kwargs))
 
 
 add_message_change(
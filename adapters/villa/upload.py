@@ -0,0 +1,190 @@
+'''
+大别野图片上传缓存。
+
+以图片内容标识（见 UniMedia.get_content_key）为键，记录上传后的链接与图片尺寸，
+相同图片在有效期内再次发送时将跳过上传与尺寸读取。
+缓存按 Bot 分别存放，并持久化于临时文件目录，
+Bot 连接时（或首次上传前）经文件读写线程池读取，
+新的上传结果在 sekaiju_villa_upload_save_interval 秒内合并为一次写入，经文件读写线程池完成。
+'''
+
+from typing import Callable, Optional, Awaitable
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from hashlib import md5
+import asyncio
+import json
+import time
+
+from nonebot import get_driver
+from nonebot.adapters import Bot
+from nonebot.adapters.villa import Bot as VillaBot
+
+from ...cache import TTLCache, SingleFlight
+from ...config import config
+from ...file_io import file_io_pool, write_atomic
+from ...utils import logger, temp_data_path
+from ...universal.uni_message import UniImage
+
+
+@dataclass
+class UploadedImage:
+    '''已上传的图片信息'''
+
+    url: str
+    width: int
+    height: int
+
+
+class UploadCache:
+    """
+    图片上传缓存。
+
+    :param path: 持久化文件路径。
+    :param maxsize: 缓存条目上限。
+    :param ttl: 缓存有效期，单位秒。
+    :param save_interval: 新的上传结果写入文件的最长延迟，单位秒。
+    """
+
+    def __init__(self, path: Path, maxsize: int, ttl: float, save_interval: float = 5):
+        self.path = path
+        self.ttl = ttl
+        self.save_interval = save_interval
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self._save_task: Optional[asyncio.Task] = None
+        self._cache: TTLCache[str, UploadedImage] = TTLCache(maxsize, ttl)
+        self._expire: dict[str, float] = {}
+        self._flight: SingleFlight[str, UploadedImage] = SingleFlight()
+        self._loaded = False
+        self._load_flight: SingleFlight[None, None] = SingleFlight()
+
+    async def load(self):
+        '''读取已持久化的上传结果，仅首次调用生效，upload 前将自动调用'''
+        if not self._loaded:
+            await self._load_flight.do(None, self._load)
+
+    async def _load(self):
+        try:
+            data = json.loads(await file_io_pool.read(self.path))
+        except FileNotFoundError:
+            data = {}
+        except (OSError, ValueError) as e:
+            logger("WARNING", f"读取图片上传缓存 {self.path.name} 失败：{e}")
+            data = {}
+        self._loaded = True
+        now = time.time()
+        for key, item in data.items():
+            if (remain := item.pop("expire") - now) > 0:
+                self._cache.set(key, UploadedImage(**item), remain)
+                self._expire[key] = now + remain
+
+    def _dump(self) -> bytes:
+        self._expire = {key: self._expire[key] for key, _ in self._cache.items()}
+        data = {
+            key: {**asdict(image), "expire": self._expire[key]}
+            for key, image in self._cache.items()
+        }
+        return json.dumps(data).encode("utf-8")
+
+    def _schedule_save(self):
+        if self._save_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._save_handle = loop.call_later(self.save_interval, self._start_save)
+
+    def _start_save(self):
+        self._save_handle = None
+        self._save_task = asyncio.create_task(self._save(self._dump()))
+
+    async def _save(self, data: bytes):
+        try:
+            await file_io_pool.write(self.path, data)
+        except OSError as e:
+            logger("WARNING", f"写入图片上传缓存 {self.path.name} 失败：{e}")
+
+    def flush(self):
+        '''立即写入尚未保存的上传结果，用于关闭时'''
+        if self._save_handle is None:
+            return
+        self._save_handle.cancel()
+        self._save_handle = None
+        try:
+            write_atomic(self.path, self._dump())
+        except OSError as e:
+            logger("WARNING", f"写入图片上传缓存 {self.path.name} 失败：{e}")
+
+    def get(self, data: bytes) -> Optional[UploadedImage]:
+        """
+        获取图片内容对应的已上传信息，尚未 load 时仅含本次运行的上传结果。
+
+        转码所得的图片以其内容标识记录，无法由内容查到。
+        """
+        return self._cache.get(md5(data).hexdigest())
+
+    async def upload(
+        self,
+        image: UniImage,
+        uploader: Callable[[bytes], Awaitable[str]]
+    ) -> UploadedImage:
+        """
+        获取图片的上传结果，未缓存时通过 uploader 上传。
+
+        :param image: 需要上传的图片。
+        :param uploader: 以图片内容为唯一参数，返回上传后链接的异步函数。
+        """
+        await self.load()
+        # 命中缓存时仅需内容标识，无需读取图片内容
+        key = await image.get_content_key()
+        if (uploaded := self._cache.get(key)) is not None:
+            return uploaded
+        async def do_upload() -> UploadedImage:
+            view = await image.get_view()
+            data = view.obj if isinstance(view.obj, bytes) else view.tobytes()
+            url = await uploader(data)
+            width, height = await image.get_size()
+            uploaded = UploadedImage(url, width, height)
+            self._cache.set(key, uploaded)
+            self._expire[key] = time.time() + self.ttl
+            self._schedule_save()
+            return uploaded
+        return await self._flight.do(key, do_upload)
+
+
+upload_caches: dict[str, UploadCache] = {}
+'''各大别野 Bot 的图片上传缓存，以 Bot self_id 为键'''
+
+def get_upload_cache(bot: VillaBot) -> UploadCache:
+    '''获取大别野 Bot 对应的图片上传缓存'''
+    if (cache := upload_caches.get(bot.self_id)) is None:
+        cache = UploadCache(
+            temp_data_path / f"villa_upload_{bot.self_id}.json",
+            config.sekaiju_villa_upload_cache_size,
+            config.sekaiju_villa_upload_cache_ttl,
+            config.sekaiju_villa_upload_save_interval
+        )
+        upload_caches[bot.self_id] = cache
+    return cache
+
+
+driver = get_driver()
+
+@driver.on_bot_connect
+async def _(bot: Bot):
+    if isinstance(bot, VillaBot):
+        await get_upload_cache(bot).load()
+
+@driver.on_shutdown
+async def _():
+    for cache in upload_caches.values():
+        cache.flush()
+
+
+__all__ = [
+    "UploadedImage",
+    "UploadCache",
+    "upload_caches",
+    "get_upload_cache"
+]
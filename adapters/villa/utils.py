@@ -1,6 +1,10 @@
 import nonebot
 from nonebot.adapters.villa.adapter import Adapter
-from typing import Union, Literal, Optional
+from typing import Union, Literal, Optional, cast
+
+from ...cache import TTLCache
+from ...config import config
+from ...utils import ascii_encode, ascii_decode, Encoded
 
 
 adapter_name = Adapter.get_name()
@@ -11,20 +15,73 @@ adapter = nonebot.get_adapter(Adapter)
 
 TIMEOUT = 10
 
+ROOM_ID_BITS = 32
+'''组合 id 中 room_id 所占位数'''
+
+def pack_room_id(villa_id: int, room_id: int) -> int:
+    '''将 (villa_id, room_id) 组合为一个整数，room_id 为 0 表示整个大别野'''
+    if villa_id < 0 or not 0 <= room_id < 1 << ROOM_ID_BITS:
+        raise ValueError(f"villa_id 或 room_id 超出范围：{villa_id}, {room_id}")
+    return villa_id << ROOM_ID_BITS | room_id
+
+def unpack_room_id(combine_id: int) -> tuple[int, int]:
+    '''将组合后的整数还原为 (villa_id, room_id)'''
+    return combine_id >> ROOM_ID_BITS, combine_id & ((1 << ROOM_ID_BITS) - 1)
+
 def villa_room_id_convert(
         type: Literal["encode", "decode"],
         villa_id: Optional[int] = None,
         room_id: Optional[int] = None,
         combine_id: Optional[str] = None
     ) -> Union[str, tuple[int, int]]:
+    """
+    在 (villa_id, room_id) 与组合 id 字符串之间转换。
+
+    组合 id 为 pack_room_id 所得整数的十进制字符串，decode 时亦接受旧版的 "villa_id+room_id" 格式。
+    """
     if type == "encode":
         if villa_id is None or room_id is None:
             raise ValueError("encode 模式下，villa_id 与 room_id 均需要提供。")
-        return f"{villa_id}+{room_id}"
+        return str(pack_room_id(villa_id, room_id))
     if type == "decode":
         if combine_id is None:
             raise ValueError("decode 模式下，需要提供 combine_id.")
+        if combine_id.isdigit():
+            return unpack_room_id(int(combine_id))
         ids = combine_id.split("+")
         if len(ids) != 2 or not ids[0].isnumeric() or not ids[1].isnumeric():
             raise ValueError("所提供的 combine_id 格式有误。")
-        return (int(ids[0]), int(ids[1]))
\ No newline at end of file
+        return (int(ids[0]), int(ids[1]))
+
+
+class RoomIdIndex:
+    """
+    编码后群聊 id 与 (villa_id, room_id) 的双向索引。
+
+    事件转换时编码的 id 将被记录，之后调用 API 时解码可直接查表，无需解析字符串。
+
+    :param maxsize: 各方向的索引条目上限，超出时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, maxsize: int):
+        self._encoded: TTLCache[tuple[int, int], Encoded] = TTLCache(maxsize)
+        self._decoded: TTLCache[Encoded, tuple[int, int]] = TTLCache(maxsize)
+
+    def encode(self, villa_id: int, room_id: int) -> Encoded:
+        '''将 (villa_id, room_id) 编码为统一的群聊 id'''
+        if (group_id := self._encoded.get((villa_id, room_id))) is None:
+            group_id = ascii_encode(pack_room_id(villa_id, room_id))
+            self._encoded.set((villa_id, room_id), group_id)
+            self._decoded.set(group_id, (villa_id, room_id))
+        return group_id
+
+    def decode(self, group_id: Encoded) -> tuple[int, int]:
+        '''将统一的群聊 id 解码为 (villa_id, room_id)'''
+        if (ids := self._decoded.get(group_id)) is None:
+            ids = cast(tuple[int, int], villa_room_id_convert("decode", combine_id=ascii_decode(group_id)))
+            self._decoded.set(group_id, ids)
+        return ids
+
+
+room_ids = RoomIdIndex(config.sekaiju_villa_room_index_size)
+'''大别野群聊 id 索引'''
@@ -0,0 +1,81 @@
+'''
+测量导出结果缓存对广播同一消息的效果。
+
+以一条含文本、at 与图片的 OneBot V11 消息构造 UniMessage，
+分别以逐个目标调用 export 后发送（关闭导出缓存）与 UniMessage.broadcast（开启导出缓存），
+发送至 OneBot V11 与大别野各若干目标，比较总耗时与实际导出次数。
+发送函数不访问网络，仅记录调用。
+
+用法：python benchmarks/bench_broadcast.py [每个适配器的目标数] [重复次数] [输出 JSON 路径]
+'''
+
+from typing import Any
+from time import perf_counter
+import importlib
+import asyncio
+import random
+import sys
+
+import harness
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    output = sys.argv[3] if len(sys.argv) > 3 else None
+
+    plugin = harness.setup()
+    import fixtures
+    from nonebot.adapters.onebot.v11 import Message, MessageSegment
+    uni_message = importlib.import_module(f"{plugin.__name__}.universal.uni_message")
+    config = importlib.import_module(f"{plugin.__name__}.config").config
+    UniMessage = uni_message.UniMessage
+
+    rng = random.Random(0)
+    message = Message([
+        MessageSegment.text("公告："),
+        MessageSegment.at(fixtures.user_id(rng)),
+        MessageSegment.text(fixtures.text(rng, 200)),
+        *(MessageSegment.image(fixtures.png(320, 240, rng)) for _ in range(3))
+    ])
+    bots = [fixtures.onebot_bot(), fixtures.villa_bot()]
+    targets = [(bot, i) for bot in bots for i in range(count)]
+
+    exports = 0
+    for adapter_name, export_func in list(uni_message.EXPORT_MAPPING.items()):
+        async def counting(*args, _export_func=export_func, **kwargs):
+            nonlocal exports
+            exports += 1
+            return await _export_func(*args, **kwargs)
+        uni_message.EXPORT_MAPPING[adapter_name] = counting
+
+    sent: list[Any] = []
+    async def send(bot, exported, target):
+        sent.append((bot.self_id, target, exported))
+
+    results: dict[str, Any] = {"targets": len(targets)}
+    for mode in ("per_target", "broadcast"):
+        config.sekaiju_export_cache = mode == "broadcast"
+        exports = 0
+        sent.clear()
+        start = perf_counter()
+        for _ in range(repeat):
+            uni_msg = await UniMessage.generate("OneBot V11", message)
+            if mode == "per_target":
+                for bot, target in targets:
+                    await send(
+                        bot,
+                        await uni_msg.export(bot.adapter.get_name(), bot, villa_id=fixtures.VILLA_ID),
+                        target
+                    )
+            else:
+                await uni_msg.broadcast(targets, send, villa_id=fixtures.VILLA_ID)
+        total = (perf_counter() - start) / repeat
+        results[mode] = {"mean": total, "exports": exports // repeat, "sent": len(sent) // repeat}
+        print(f"{mode:<12} 平均耗时 {total*1000:>8.1f} ms 导出 {exports // repeat:>4} 次 发送 {len(sent) // repeat:>4} 次")
+
+    harness.write_results("broadcast", results, output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+'''
+测量消息段编解码表的分发开销。
+
+对各类合成消息分别测量 OneBot V11 与大别野编解码表的 generate 与 export，
+并在额外注册大量消息段类型、导出第三方 UniMessageSegment 子类两种情况下复测，
+以确认分发耗时不随已注册类型数量增长。
+
+用法：python benchmarks/bench_codec.py [每项计时次数] [输出 JSON 路径]
+'''
+
+from typing import Any
+from itertools import cycle
+import importlib
+import asyncio
+import random
+import sys
+
+import harness
+
+
+SAMPLES = 32
+'''每类消息预先生成的样本数'''
+
+EXTRA_TYPES = 200
+'''额外注册的消息段类型数量'''
+
+
+async def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    output = sys.argv[2] if len(sys.argv) > 2 else None
+
+    plugin = harness.setup()
+    import fixtures
+    uni_message = importlib.import_module(f"{plugin.__name__}.universal.uni_message")
+    codec_module = importlib.import_module(f"{plugin.__name__}.universal.codec")
+    onebot_codec = codec_module.get_codec("OneBot V11")
+    villa_codec = codec_module.get_codec("Villa")
+
+    rng = random.Random(20231019)
+    images = fixtures.ImagePool(rng)
+    onebot_bot = fixtures.onebot_bot()
+    villa_bot = fixtures.villa_bot()
+    kinds = [kind for kind in fixtures.MESSAGE_KINDS if kind != "image_heavy"]
+
+    results: dict[str, Any] = {}
+
+    async def run_all(label: str):
+        for kind in kinds:
+            onebot_messages = [fixtures.onebot_message(kind, rng, images) for _ in range(SAMPLES)]
+            villa_messages = [fixtures.villa_event(kind, rng).get_message() for _ in range(SAMPLES)]
+            uni_messages = [await onebot_codec.generate(m, onebot_bot) for m in onebot_messages]
+            cases = {
+                "onebot/generate": (onebot_codec.generate, onebot_messages, onebot_bot, {}),
+                "villa/generate": (villa_codec.generate, villa_messages, villa_bot, {}),
+                "onebot/export": (onebot_codec.export, uni_messages, onebot_bot, {}),
+                "villa/export": (villa_codec.export, uni_messages, villa_bot, {"villa_id": fixtures.VILLA_ID})
+            }
+            for case, (func, messages, bot, kwargs) in cases.items():
+                it = cycle(messages)
+                name = f"{label}/{case}/{kind}"
+                results[name] = await harness.measure(
+                    lambda: func(next(it), bot, **kwargs),
+                    iterations
+                )
+                harness.print_result(name, results[name])
+
+    await run_all("default")
+
+    # 注册大量无关类型与子类，分发耗时应保持不变
+    UniAtUser = uni_message.UniAtUser
+    extra_classes = []
+    for i in range(EXTRA_TYPES):
+        onebot_codec.generator(f"extra_{i}")(lambda ms, bot, encode, **kwargs: None)
+        villa_codec.generator(f"extra_{i}")(lambda ms, bot, encode, **kwargs: None)
+        cls = type(f"ExtraSegment{i}", (uni_message.UniMessageSegment,), {"__slots__": ()})
+        onebot_codec.exporter(cls)(lambda uni_ms, bot, decode, **kwargs: None)
+        villa_codec.exporter(cls)(lambda uni_ms, bot, decode, **kwargs: None)
+        extra_classes.append(cls)
+    await run_all(f"extra_{EXTRA_TYPES}_types")
+
+    # 第三方子类按 MRO 解析到 UniAtUser 的导出函数，解析结果被缓存
+    ThirdPartyAtUser = type("ThirdPartyAtUser", (UniAtUser,), {"__slots__": ()})
+    message = uni_message.UniMessage(None)
+    for _ in range(16):
+        message.append(ThirdPartyAtUser("at_user", None, "3132", False))
+    name = "subclass/onebot/export/at_user"
+    results[name] = await harness.measure(lambda: onebot_codec.export(message, onebot_bot), iterations)
+    harness.print_result(name, results[name])
+
+    harness.write_results("codec", results, output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,151 @@
+'''
+测量世界树转换与分发热点路径的吞吐量与延迟分位数。
+
+使用合成的 OneBot V11 与大别野事件、消息，不访问网络，测量以下内容：
+
+- convert_message: 各方向的消息转换。
+- get_uni_event: 原事件构建 UniEvent.
+- parse_fake_event: UniEvent 导出为其他平台事件。
+- param_check / param_solve: 经世界树修改的 BotParam 与 EventParam 依赖注入。
+- fake_bot_send: 以其他平台类型编写的处理函数，经虚假 Bot 回复消息的完整过程。
+
+用法：python benchmarks/bench_conversion.py [每项计时次数] [输出 JSON 路径]
+'''
+
+from typing import Any, Awaitable, Callable
+from itertools import cycle
+import importlib
+import asyncio
+import random
+import sys
+
+import harness
+
+
+SAMPLES = 32
+'''每类消息预先生成的样本数'''
+
+
+async def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    output = sys.argv[2] if len(sys.argv) > 2 else None
+
+    plugin = harness.setup()
+    import fixtures
+    from nonebot.dependencies import Dependent
+    from nonebot.internal.params import BotParam, EventParam
+    from nonebot.adapters.onebot.v11 import (
+        Bot as OneBotv11Bot,
+        GroupMessageEvent as OneBotv11GroupMessageEvent
+    )
+    from nonebot.adapters.villa import Bot as VillaBot
+    from nonebot.adapters.villa.event import SendMessageEvent
+    convert_message = importlib.import_module(f"{plugin.__name__}.universal.uni_message").convert_message
+
+    rng = random.Random(20231019)
+    images = fixtures.ImagePool(rng)
+    onebot_bot = fixtures.onebot_bot()
+    villa_bot = fixtures.villa_bot()
+    onebot = "OneBot V11"
+    villa = "Villa"
+
+    results: dict[str, Any] = {}
+
+    async def run(name: str, func: Callable[[], Awaitable[Any]]):
+        results[name] = await harness.measure(func, iterations)
+        harness.print_result(name, results[name])
+
+    for kind in fixtures.MESSAGE_KINDS:
+        onebot_events = [fixtures.onebot_event(kind, rng, images) for _ in range(SAMPLES)]
+        villa_events = [fixtures.villa_event(kind, rng) for _ in range(SAMPLES)]
+        onebot_messages = [e.get_message() for e in onebot_events]
+        villa_messages = [e.get_message() for e in villa_events]
+        # 处理函数见到的 id 均为编码后的 id，经虚假 Bot 回复的消息同样使用编码后的 id
+        onebot_replies = [
+            await convert_message(m, origin_adapter=onebot, target_adapter=onebot, to_target_decode=False)
+            for m in onebot_messages
+        ]
+        villa_replies = [
+            await convert_message(
+                m, origin_adapter=villa, target_adapter=villa, origin_bot=villa_bot, target_bot=villa_bot,
+                to_target_decode=False, to_target_kwargs={"villa_id": fixtures.VILLA_ID}
+            )
+            for m in villa_messages
+        ]
+        uni_messages = [
+            await convert_message(m, origin_adapter=onebot, origin_bot=onebot_bot)
+            for m in onebot_messages
+        ]
+
+        # convert_message
+        it = cycle(onebot_messages)
+        await run(f"convert_message/onebot->uni/{kind}", lambda: convert_message(
+            next(it), origin_adapter=onebot, origin_bot=onebot_bot
+        ))
+        it_villa = cycle(villa_messages)
+        await run(f"convert_message/villa->uni/{kind}", lambda: convert_message(
+            next(it_villa), origin_adapter=villa, origin_bot=villa_bot
+        ))
+        it_uni = cycle(uni_messages)
+        await run(f"convert_message/uni->onebot/{kind}", lambda: convert_message(
+            next(it_uni), target_adapter=onebot, target_bot=onebot_bot
+        ))
+        await run(f"convert_message/uni->villa/{kind}", lambda: convert_message(
+            next(it_uni), target_adapter=villa, target_bot=villa_bot,
+            to_target_kwargs={"villa_id": fixtures.VILLA_ID}
+        ))
+        await run(f"convert_message/onebot->villa/{kind}", lambda: convert_message(
+            next(it), origin_adapter=onebot, target_adapter=villa,
+            origin_bot=onebot_bot, target_bot=villa_bot,
+            to_target_kwargs={"villa_id": fixtures.VILLA_ID}
+        ))
+        await run(f"convert_message/villa->onebot/{kind}", lambda: convert_message(
+            next(it_villa), origin_adapter=villa, target_adapter=onebot,
+            origin_bot=villa_bot, target_bot=onebot_bot
+        ))
+
+        # get_uni_event
+        it_onebot_event = cycle(onebot_events)
+        await run(f"get_uni_event/onebot/{kind}", lambda: next(it_onebot_event).get_uni_event())
+        it_villa_event = cycle(villa_events)
+        await run(f"get_uni_event/villa/{kind}", lambda: next(it_villa_event).get_uni_event())
+
+        # parse_fake_event
+        it_onebot_uni = cycle([await e.get_uni_event() for e in onebot_events])
+        await run(f"parse_fake_event/onebot->villa/{kind}", lambda: getattr(
+            SendMessageEvent, "parse_fake_event"
+        )(next(it_onebot_uni), villa_bot))
+        it_villa_uni = cycle([await e.get_uni_event() for e in villa_events])
+        await run(f"parse_fake_event/villa->onebot/{kind}", lambda: getattr(
+            OneBotv11GroupMessageEvent, "parse_fake_event"
+        )(next(it_villa_uni), onebot_bot))
+
+        # 依赖注入与虚假 Bot 发送
+        for handler_platform, handler_bot, handler_event, bot, events, replies in (
+            ("onebot", OneBotv11Bot, OneBotv11GroupMessageEvent, villa_bot, villa_events, onebot_replies),
+            ("villa", VillaBot, SendMessageEvent, onebot_bot, onebot_events, villa_replies)
+        ):
+            async def handler(bot: handler_bot, event: handler_event): ... # type: ignore
+            dependent = Dependent.parse(call=handler, allow_types=[BotParam, EventParam])
+            source = "villa" if handler_platform == "onebot" else "onebot"
+            name = f"{source}_event->{handler_platform}_handler/{kind}"
+            it_event = cycle(events)
+            await run(f"param_check/{name}", lambda: dependent.check(bot=bot, event=next(it_event)))
+
+            async def check_and_solve(dependent=dependent, bot=bot, it_event=it_event):
+                event = next(it_event)
+                await dependent.check(bot=bot, event=event)
+                return await dependent.solve(bot=bot, event=event)
+            await run(f"param_solve/{name}", check_and_solve)
+
+            it_reply = cycle(replies)
+            async def send(dependent=dependent, bot=bot, it_event=it_event, it_reply=it_reply):
+                values = await check_and_solve(dependent, bot, it_event)
+                return await values["bot"].send(values["event"], next(it_reply))
+            await run(f"fake_bot_send/{name}", send)
+
+    harness.write_results("conversion", results, output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
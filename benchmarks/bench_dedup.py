@@ -0,0 +1,109 @@
+'''
+测量事件去重的开销、内存占用与误判率。
+
+生成一批 OneBot V11 与大别野消息事件，按比例混入重复投递的事件，分别以 set 与 bloom 实现判断，
+比较每个事件的判断耗时、内存占用与被丢弃的事件数，
+并以转换全部事件与仅转换非重复事件的耗时对比去重所节省的工作。
+另以大量不重复的键测量 bloom 实现的实际误判率。
+
+用法：python benchmarks/bench_dedup.py [事件数] [重复比例] [输出 JSON 路径]
+'''
+
+from typing import Any
+from time import perf_counter
+import tracemalloc
+import importlib
+import asyncio
+import random
+import sys
+
+import harness
+
+
+FP_KEYS = 200000
+'''测量误判率所用的不重复键数'''
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    ratio = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    output = sys.argv[3] if len(sys.argv) > 3 else None
+
+    plugin = harness.setup()
+    import fixtures
+    dedup = importlib.import_module(f"{plugin.__name__}.dedup")
+    config = importlib.import_module(f"{plugin.__name__}.config").config
+
+    rng = random.Random(0)
+    images = fixtures.ImagePool(rng)
+    originals = [
+        fixtures.onebot_event("text", rng, images) if i % 2 else fixtures.villa_event("text", rng)
+        for i in range(count)
+    ]
+    events = list(originals)
+    # 重复投递的事件为内容相同的新实例
+    for event in rng.sample(originals, int(count * ratio)):
+        events.insert(rng.randrange(len(events)), event.copy(deep=True))
+    # 生成的事件本身可能存在去重键相同者，以不重复的去重键数计算应丢弃的事件数
+    expected = len(events) - len({dedup.get_dedup_key(event) for event in events})
+
+    results: dict[str, Any] = {"events": len(events), "duplicates": expected}
+    for mode in ("set", "bloom"):
+        def make_seen():
+            if mode == "set":
+                return dedup.WindowedSet(config.sekaiju_event_dedup_window, config.sekaiju_event_dedup_capacity)
+            return dedup.WindowedBloomFilter(
+                config.sekaiju_event_dedup_window,
+                config.sekaiju_event_dedup_capacity,
+                config.sekaiju_event_dedup_error_rate
+            )
+        # 计时与内存分开测量，以免 tracemalloc 影响耗时
+        deduplicator = dedup.EventDeduplicator(make_seen())
+        start = perf_counter()
+        dropped = sum(deduplicator.is_duplicate(event) for event in events)
+        total = perf_counter() - start
+        tracemalloc.start()
+        deduplicator = dedup.EventDeduplicator(make_seen())
+        for event in events:
+            deduplicator.is_duplicate(event)
+        _, memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[mode] = {"per_event": total / len(events), "memory_bytes": memory, "dropped": dropped}
+        print(
+            f"{mode:<8} 每个事件 {total / len(events) * 1e6:>6.2f} us "
+            f"内存 {memory / 1024:>8.1f} KiB 丢弃 {dropped:>5} / {expected} 个"
+        )
+
+    # 两次转换各用一份新的事件实例，以免后一次命中前一次的转换结果
+    fresh = [event.copy(deep=True) for event in events]
+    start = perf_counter()
+    for event in fresh:
+        await event.get_uni_event()
+    without = perf_counter() - start
+    fresh = [event.copy(deep=True) for event in events]
+    deduplicator = dedup.EventDeduplicator(dedup.WindowedSet(config.sekaiju_event_dedup_window, len(events)))
+    start = perf_counter()
+    for event in fresh:
+        if not deduplicator.is_duplicate(event):
+            await event.get_uni_event()
+    with_dedup = perf_counter() - start
+    results["convert"] = {"without_dedup": without, "with_dedup": with_dedup}
+    print(f"转换全部事件 {without*1000:>8.1f} ms，去重后转换 {with_dedup*1000:>8.1f} ms")
+
+    for error_rate in (1e-3, 1e-6):
+        bloom = dedup.WindowedBloomFilter(3600, FP_KEYS, error_rate)
+        false_positives = sum(bloom.add(("bench", i)) for i in range(FP_KEYS))
+        results[f"bloom_{error_rate:g}"] = {
+            "memory_bytes": bloom.memory,
+            "false_positive_rate": false_positives / FP_KEYS
+        }
+        print(
+            f"bloom 误判率上限 {error_rate:g}：{FP_KEYS} 个键占用 {bloom.memory / 1024:.0f} KiB，"
+            f"实际误判 {false_positives} 个"
+        )
+
+    harness.write_results("dedup", results, output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+'''
+测量媒体获取失败防护对重复失败请求的缓解效果。
+
+在本地线程中启动 HTTP 服务，分别模拟返回 404、带延迟返回 503 以及以 200 返回 HTML 错误页的媒体来源，
+对每类来源反复获取同一批 url，比较直接使用媒体后端与经过 fetch_guard 时的总耗时与实际发出的请求数。
+
+用法：python benchmarks/bench_fetch_guard.py [每类请求次数] [503 延迟毫秒] [输出 JSON 路径]
+'''
+
+from typing import Any
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from time import perf_counter, sleep
+import importlib
+import threading
+import asyncio
+import sys
+
+import harness
+
+
+def serve(delay: float, hits: list[int]) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[0] += 1
+            if self.path.startswith("/missing"):
+                self.send_response(404)
+                self.end_headers()
+            elif self.path.startswith("/html"):
+                body = b"<html>error</html>"
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                sleep(delay)
+                self.send_response(503)
+                self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    delay = int(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+    output = sys.argv[3] if len(sys.argv) > 3 else None
+
+    plugin = harness.setup()
+    media = importlib.import_module(f"{plugin.__name__}.media")
+
+    results: dict[str, Any] = {}
+    for source in ("missing", "html", "unavailable"):
+        for mode in ("direct", "guarded"):
+            hits = [0]
+            server = serve(delay, hits)
+            base = f"http://127.0.0.1:{server.server_address[1]}"
+            guard = media.FetchGuard(600, 3, 60)
+            backend = media.get_media_backend()
+            start = perf_counter()
+            for i in range(count):
+                url = f"{base}/{source}{i % 5}.png"
+                try:
+                    if mode == "direct":
+                        backend.fetch(url, 5)
+                    else:
+                        guard.fetch(backend, url, 5)
+                except media.MediaFetchError:
+                    pass
+            total = perf_counter() - start
+            server.shutdown()
+
+            name = f"{source}_{mode}"
+            results[name] = {"total": total, "requests": hits[0]}
+            print(f"{name:<24} {count:>4} 次获取 总耗时 {total*1000:>8.1f} ms 实际请求 {hits[0]:>4} 次")
+
+    harness.write_results("fetch_guard", results, output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
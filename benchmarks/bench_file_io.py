@@ -0,0 +1,96 @@
+'''
+测量异步文件读写对事件循环阻塞的缓解效果。
+
+并发将一批媒体内容写入临时目录再读回，同时以一个每毫秒唤醒一次的协程测量事件循环的最大延迟，
+比较同步的 write_atomic / read_file 与经文件读写线程池时的总耗时与最大延迟。
+文件名预先计算，不计入 md5 计算的阻塞（见 bench_media_worker）。
+另以相同内容并发调用异步写入，确认合并为一次写入。
+
+本地磁盘的读写远快于网络存储，测得的延迟差距应视为下限。
+
+用法：python benchmarks/bench_file_io.py [文件数] [单个文件 KiB] [输出 JSON 路径]
+'''
+
+from typing import Any
+from time import perf_counter
+import importlib
+import asyncio
+import os
+import sys
+
+import harness
+
+
+async def ticker(stop: asyncio.Event, lags: list[float]):
+    '''每毫秒唤醒一次，记录实际唤醒时间与预期的差值'''
+    while not stop.is_set():
+        start = perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(perf_counter() - start - 0.001)
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    size_kib = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+    output = sys.argv[3] if len(sys.argv) > 3 else None
+
+    plugin = harness.setup()
+    utils = importlib.import_module(f"{plugin.__name__}.utils")
+    file_io = importlib.import_module(f"{plugin.__name__}.file_io")
+
+    results: dict[str, Any] = {"count": count, "size_kib": size_kib}
+    for mode in ("sync", "async"):
+        # 每轮使用不同的文件，测量后删除
+        payloads = [(utils.temp_data_path / f"bench_file_io_{mode}{i}", os.urandom(size_kib * 1024)) for i in range(count)]
+
+        async def handle(path, data: bytes):
+            if mode == "sync":
+                file_io.read_file(file_io.write_atomic(path, data))
+            else:
+                await file_io.file_io_pool.read(await file_io.file_io_pool.write(path, data))
+
+        stop = asyncio.Event()
+        lags: list[float] = []
+        tick = asyncio.create_task(ticker(stop, lags))
+        await asyncio.sleep(0.01)
+        start = perf_counter()
+        await asyncio.gather(*(handle(path, data) for path, data in payloads))
+        total = perf_counter() - start
+        stop.set()
+        await tick
+        for path, _ in payloads:
+            path.unlink()
+
+        lags.sort()
+        results[mode] = {
+            "total": total,
+            "max_lag": lags[-1],
+            "p99_lag": harness.percentile(lags, 0.99)
+        }
+        print(
+            f"{mode:<8} 总耗时 {total*1000:>8.1f} ms "
+            f"最大延迟 {lags[-1]*1000:>8.1f} ms p99 延迟 {results[mode]['p99_lag']*1000:>8.1f} ms"
+        )
+
+    writes = 0
+    write_atomic = file_io.write_atomic
+    def counting(*args):
+        nonlocal writes
+        writes += 1
+        return write_atomic(*args)
+    file_io.write_atomic = counting
+    pool = file_io.FileIOPool(4)
+    path = utils.temp_data_path / "bench_file_io_same"
+    data = os.urandom(size_kib * 1024)
+    await asyncio.gather(*(pool.write(path, data) for _ in range(count)))
+    file_io.write_atomic = write_atomic
+    pool.shutdown()
+    path.unlink()
+    results["same_path_writes"] = writes
+    print(f"同一路径并发写入 {count} 次，实际写入 {writes} 次")
+
+    harness.write_results("file_io", results, output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
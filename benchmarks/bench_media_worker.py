@@ -0,0 +1,92 @@
+'''
+测量媒体工作进程池对事件循环阻塞的缓解效果。
+
+模拟群内突发大量大图片：并发处理一批 base64 图片的解码、md5 计算与尺寸读取，
+同时以一个每毫秒唤醒一次的协程测量事件循环的最大延迟，
+分别在全部内联处理与交由不同数量工作进程处理时比较总耗时与最大延迟。
+
+用法：python benchmarks/bench_media_worker.py [突发图片数] [单张图片 KiB] [输出 JSON 路径]
+'''
+
+from typing import Any
+from time import perf_counter
+import importlib
+import asyncio
+import base64
+import random
+import os
+import sys
+
+import harness
+
+
+WORKER_COUNTS = (0, 2, 4)
+'''测量的工作进程数，0 为全部内联处理'''
+
+
+async def ticker(stop: asyncio.Event, lags: list[float]):
+    '''每毫秒唤醒一次，记录实际唤醒时间与预期的差值'''
+    while not stop.is_set():
+        start = perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(perf_counter() - start - 0.001)
+
+
+async def main():
+    burst = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    size_kib = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+    output = sys.argv[3] if len(sys.argv) > 3 else None
+
+    plugin = harness.setup()
+    import fixtures
+    media_worker = importlib.import_module(f"{plugin.__name__}.media_worker")
+
+    rng = random.Random(0)
+    image = fixtures.png(64, 64, rng)
+    # 以随机内容填充至指定大小，文件头仍为合法 PNG
+    payloads = [
+        base64.b64encode(image + os.urandom(size_kib * 1024 - len(image))).decode()
+        for _ in range(burst)
+    ]
+
+    results: dict[str, Any] = {"burst": burst, "size_kib": size_kib}
+    for workers in WORKER_COUNTS:
+        pool = media_worker.MediaWorkerPool(workers, 256 * 1024)
+        pool.start()
+
+        async def handle(payload: str):
+            data = await pool.run(media_worker._b64decode, payload)
+            await pool.run(media_worker._md5_hex, data)
+            await pool.run(media_worker._probe_size, data)
+
+        # 预先创建工作进程，不计入测量
+        await asyncio.gather(*(handle(p) for p in payloads[:max(workers, 1)]))
+
+        stop = asyncio.Event()
+        lags: list[float] = []
+        tick = asyncio.create_task(ticker(stop, lags))
+        await asyncio.sleep(0.01)
+        start = perf_counter()
+        await asyncio.gather(*(handle(p) for p in payloads))
+        total = perf_counter() - start
+        stop.set()
+        await tick
+        pool.shutdown()
+
+        lags.sort()
+        name = f"workers_{workers}"
+        results[name] = {
+            "total": total,
+            "max_lag": lags[-1],
+            "p99_lag": harness.percentile(lags, 0.99)
+        }
+        print(
+            f"{name:<16} 总耗时 {total*1000:>8.1f} ms "
+            f"最大延迟 {lags[-1]*1000:>8.1f} ms p99 延迟 {results[name]['p99_lag']*1000:>8.1f} ms"
+        )
+
+    harness.write_results("media_worker", results, output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
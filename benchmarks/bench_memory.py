@@ -0,0 +1,96 @@
+'''
+测量 UniMessage 长期保存时的内存占用。
+
+以合成的 OneBot V11 消息构造 UniMessage（图片消息数量取十分之一），释放原消息的其他引用后，
+统计保留全部 UniMessage 所需的内存，折算为每个消息段的字节数。
+分别测量保留原消息（默认）与调用 UniMessage.drop_origin 丢弃原消息两种情况，
+并给出各消息段类型单个实例的浅层大小。
+
+用法：python benchmarks/bench_memory.py [每类消息数] [输出 JSON 路径]
+'''
+
+from typing import Any
+import tracemalloc
+import importlib
+import asyncio
+import random
+import sys
+import gc
+
+import harness
+
+
+def shallow_size(obj: Any) -> int:
+    '''实例本身与其 __dict__ 的大小'''
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    output = sys.argv[2] if len(sys.argv) > 2 else None
+
+    plugin = harness.setup()
+    import fixtures
+    uni_message = importlib.import_module(f"{plugin.__name__}.universal.uni_message")
+    UniMessage = uni_message.UniMessage
+    UniMessageSegment = uni_message.UniMessageSegment
+
+    onebot_bot = fixtures.onebot_bot()
+    images = fixtures.ImagePool(random.Random(0))
+
+    async def build(kind: str, drop_origin: bool) -> list:
+        rng = random.Random(kind)
+        kind_count = max(1, count // 10) if kind == "image_heavy" else count
+        messages = [fixtures.onebot_message(kind, rng, images) for _ in range(kind_count)]
+        uni_messages = []
+        for message in messages:
+            uni_msg = await UniMessage.generate("OneBot V11", message, bot=onebot_bot)
+            uni_messages.append(uni_msg.drop_origin() if drop_origin else uni_msg)
+        return uni_messages
+
+    results: dict[str, Any] = {
+        "slots": not hasattr(UniMessageSegment.text(None, ""), "__dict__"),
+        "retained": {},
+        "instance_size": {}
+    }
+    for kind in fixtures.MESSAGE_KINDS:
+        for drop_origin in (False, True):
+            gc.collect()
+            tracemalloc.start()
+            base = tracemalloc.get_traced_memory()[0]
+            uni_messages = await build(kind, drop_origin)
+            gc.collect()
+            retained = tracemalloc.get_traced_memory()[0] - base
+            tracemalloc.stop()
+            segments = sum(len(m) for m in uni_messages)
+            name = f"{kind}/{'drop_origin' if drop_origin else 'keep_origin'}"
+            results["retained"][name] = {
+                "messages": len(uni_messages),
+                "segments": segments,
+                "bytes": retained,
+                "bytes_per_segment": retained / segments
+            }
+            print(f"{name:<32} {retained / segments:>10.1f} B/段 共 {retained / 1024:.0f} KiB")
+            del uni_messages
+
+    samples = [
+        UniMessageSegment.text(None, ""),
+        UniMessageSegment.reply(None, "0"),
+        UniMessageSegment.at_all(None),
+        UniMessageSegment.at_user(None, "0"),
+        UniMessageSegment.at_me(None),
+        UniMessageSegment.image(None, url="https://example.com/0.png"),
+        UniMessageSegment.other(None)
+    ]
+    for sample in samples:
+        results["instance_size"][type(sample).__name__] = shallow_size(sample)
+        print(f"{type(sample).__name__:<32} {shallow_size(sample):>10} B")
+
+    harness.write_results("memory", results, output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
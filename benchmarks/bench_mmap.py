@@ -0,0 +1,59 @@
+'''
+测量以内存映射访问由文件构造的媒体时的内存占用。
+
+在临时目录写入一张较大的图片文件（合法 PNG 文件头后以随机内容填充），以其路径构造 UniImage，
+分别以 get_bytes 读入内存与以 get_view 映射文件后计算 md5、读取尺寸，
+比较耗时与以 tracemalloc 统计的 Python 内存分配峰值。
+
+用法：python benchmarks/bench_mmap.py [文件 MiB] [重复次数] [输出 JSON 路径]
+'''
+
+from typing import Any
+from time import perf_counter
+import tracemalloc
+import importlib
+import asyncio
+import random
+import os
+import sys
+
+import harness
+
+
+async def main():
+    size_mib = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    output = sys.argv[3] if len(sys.argv) > 3 else None
+
+    plugin = harness.setup()
+    import fixtures
+    utils = importlib.import_module(f"{plugin.__name__}.utils")
+    uni_message = importlib.import_module(f"{plugin.__name__}.universal.uni_message")
+    media_worker = importlib.import_module(f"{plugin.__name__}.media_worker")
+
+    image = fixtures.png(64, 64, random.Random(0))
+    path = utils.bytes_to_path(image + os.urandom(size_mib * 1024 * 1024 - len(image)))
+    uni_ms = uni_message.UniImage("image", None, path)
+
+    results: dict[str, Any] = {"size_mib": size_mib}
+    for mode in ("bytes", "view"):
+        tracemalloc.start()
+        start = perf_counter()
+        for _ in range(repeat):
+            data = await uni_ms.get_bytes() if mode == "bytes" else await uni_ms.get_view()
+            await media_worker.md5_hex(data)
+            await media_worker.probe_size(data)
+            del data
+        total = perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[mode] = {"mean": total / repeat, "peak_bytes": peak}
+        print(f"{mode:<8} 平均耗时 {total / repeat * 1000:>8.1f} ms 内存分配峰值 {peak / 1024 / 1024:>8.1f} MiB")
+
+    path.unlink()
+    harness.write_results("mmap", results, output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+'''
+测量媒体预取对导出时等待下载的缓解效果。
+
+在本地线程中启动带固定延迟的 HTTP 服务提供图片，以收到的 OneBot V11 图片消息（仅有 url）构造 UniMessage，
+模拟处理函数耗时后读取其中全部媒体内容（如导出到需要上传的平台），比较未预取与预取时的读取耗时。
+预取时仅导出部分消息，以观察未使用字节数的统计。
+
+用法：python benchmarks/bench_prefetch.py [消息数] [服务延迟毫秒] [处理耗时毫秒] [输出 JSON 路径]
+'''
+
+from typing import Any
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from time import perf_counter, sleep
+import importlib
+import threading
+import asyncio
+import random
+import sys
+
+import harness
+
+
+EXPORT_RATIO = 0.75
+'''预取时实际导出的消息比例'''
+
+IMAGES_PER_MESSAGE = 3
+
+
+def serve(images: list[bytes], delay: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            sleep(delay)
+            data = images[int(self.path.strip("/").split(".")[0].lstrip("fno")) % len(images)]
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    delay = int(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+    handler_delay = int(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.2
+    output = sys.argv[4] if len(sys.argv) > 4 else None
+
+    plugin = harness.setup()
+    import fixtures
+    from nonebot.adapters.onebot.v11 import Message, MessageSegment
+    uni_message = importlib.import_module(f"{plugin.__name__}.universal.uni_message")
+    prefetch = importlib.import_module(f"{plugin.__name__}.prefetch")
+    UniMessage = uni_message.UniMessage
+
+    rng = random.Random(0)
+    images = [fixtures.png(240, 240, rng) for _ in range(8)]
+    server = serve(images, delay)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    results: dict[str, Any] = {}
+    for mode in ("off", "on"):
+        # 每轮使用不同的 url，避免命中上一轮的预取内容
+        messages = [
+            Message([
+                MessageSegment("image", {"file": f"{i}.image", "url": f"{base}/{mode}{i * IMAGES_PER_MESSAGE + j}.png"})
+                for j in range(IMAGES_PER_MESSAGE)
+            ])
+            for i in range(count)
+        ]
+        uni_messages = []
+        for message in messages:
+            uni_msg = await UniMessage.generate("OneBot V11", message)
+            if mode == "on":
+                uni_msg.prefetch()
+            uni_messages.append(uni_msg)
+        await asyncio.sleep(handler_delay)
+
+        exported = uni_messages if mode == "off" else uni_messages[:int(count * EXPORT_RATIO)]
+        waits = []
+        for uni_msg in exported:
+            start = perf_counter()
+            for uni_ms in uni_msg:
+                await uni_ms.get_bytes()
+            waits.append(perf_counter() - start)
+        waits.sort()
+        results[mode] = {
+            "messages": len(exported),
+            "mean_wait": sum(waits) / len(waits),
+            "p99_wait": harness.percentile(waits, 0.99)
+        }
+        print(
+            f"prefetch_{mode:<8} 导出 {len(exported):>4} 条 "
+            f"平均等待 {results[mode]['mean_wait']*1000:>8.1f} ms p99 {results[mode]['p99_wait']*1000:>8.1f} ms"
+        )
+
+    prefetch.prefetcher.close()
+    results["stats"] = stats = prefetch.prefetcher.stats()
+    print(
+        f"预取 {stats['fetched_bytes']/1024:.0f} KiB，使用 {stats['used_bytes']/1024:.0f} KiB，"
+        f"未使用 {stats['unused_bytes']/1024:.0f} KiB"
+    )
+    server.shutdown()
+    harness.write_results("prefetch", results, output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
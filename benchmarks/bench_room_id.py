@@ -0,0 +1,62 @@
+'''
+测量大别野群聊 id 编码与解码的耗时。
+
+比较旧版以 "villa_id+room_id" 字符串组合后编码、每次解码时拆分检查字符串，
+与整数组合并经 RoomIdIndex 双向索引查表的耗时。
+
+用法：python benchmarks/bench_room_id.py [迭代次数] [输出 JSON 路径]
+'''
+
+from typing import Any
+import importlib
+import asyncio
+import random
+import sys
+
+import harness
+
+
+ROOMS = 256
+'''参与测量的房间数，小于索引条目上限'''
+
+
+async def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    output = sys.argv[2] if len(sys.argv) > 2 else None
+
+    plugin = harness.setup()
+    import fixtures
+    villa_utils = importlib.import_module(f"{plugin.__name__}.adapters.villa.utils")
+    utils = importlib.import_module(f"{plugin.__name__}.utils")
+
+    rng = random.Random(0)
+    rooms = [(fixtures.VILLA_ID + rng.randrange(1000), rng.randrange(1, 10**6)) for _ in range(ROOMS)]
+    index = villa_utils.RoomIdIndex(ROOMS * 2)
+    legacy_ids = [utils.ascii_encode(f"{v}+{r}") for v, r in rooms]
+    packed_ids = [index.encode(v, r) for v, r in rooms]
+
+    def legacy_decode(group_id: str) -> tuple[int, int]:
+        ids = utils.ascii_decode(group_id).split("+")
+        if len(ids) != 2 or not ids[0].isnumeric() or not ids[1].isnumeric():
+            raise ValueError
+        return int(ids[0]), int(ids[1])
+
+    counter = iter(range(1 << 62))
+    cases = {
+        "legacy_encode": lambda i: utils.ascii_encode(f"{rooms[i][0]}+{rooms[i][1]}"),
+        "indexed_encode": lambda i: index.encode(*rooms[i]),
+        "legacy_decode": lambda i: legacy_decode(legacy_ids[i]),
+        "indexed_decode": lambda i: index.decode(packed_ids[i])
+    }
+    results: dict[str, Any] = {}
+    for name, func in cases.items():
+        async def run(func=func):
+            func(next(counter) % ROOMS)
+        results[name] = await harness.measure(run, iterations, 100)
+        harness.print_result(name, results[name])
+
+    harness.write_results("room_id", results, output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,267 @@
+'''
+测量 UniMessage 与 UniEvent 序列化的速度与体积。
+
+先进行往返校验，不通过时抛出 AssertionError：
+
+- 每个 UniEvent 类（含各基类）按字段类型构造实例，往返后除原事件外的内容与类型不变，
+  其中包含以 bytes 提供内容的媒体消息段与各类数字字符串（以 0 开头、非 ASCII 数字、超长数字等）。
+- 截断、篡改与随机改写字节的数据仅会引发 ValueError.
+
+再以合成的 OneBot V11 与大别野群消息事件构建 UniEvent，校验往返后内容不变，并与 pydantic 的 .json() 比较：
+
+- dumps / json: 序列化耗时与所得体积。pydantic 无法识别 UniMessage 中的消息段，
+  所得 message 字段为空列表，因此 json 一侧体积与耗时均偏小。
+- loads / json_loads: 反序列化耗时。json 一侧仅计 json.loads 与 construct，
+  不还原其中的消息段，为其下限。
+
+用法：python benchmarks/bench_serialize.py [每项计时次数] [输出 JSON 路径]
+'''
+
+from typing import Any, Literal, Union, get_args, get_origin
+from dataclasses import fields
+from io import BytesIO
+from pathlib import Path
+from itertools import cycle
+import importlib
+import asyncio
+import random
+import json
+import sys
+
+import harness
+
+
+SAMPLES = 32
+'''每类消息预先生成的样本数'''
+
+DIGIT_STRINGS = (
+    "0", "00", "007", "1", "10000", "9" * 30, "", "-1", "+1", "1.5", "1e5", " 1",
+    "١٢٣", "²", "１２３", "0x10"
+)
+'''需原样往返的字符串，包括会写为变长整数的纯数字字符串及与其相近的边界情况'''
+
+FUZZ_ROUNDS = 2000
+'''随机改写字节的轮数'''
+
+
+def segment_values(uni_ms) -> tuple:
+    '''除原消息段外的字段值，媒体内容统一以 bytes 比较'''
+    values = []
+    for f in fields(uni_ms):
+        if f.name == "origin_ms":
+            continue
+        if f.name in ("_path", "_bytes", "_fetched", "_content_key"):
+            continue
+        values.append(getattr(uni_ms, f.name))
+    if hasattr(uni_ms, "_url") and uni_ms._url is None:
+        values.append(uni_ms.bytes)
+    return tuple(values)
+
+def event_values(uni_event) -> dict[str, Any]:
+    values = {}
+    for name in type(uni_event).__fields__:
+        if name == "origin_event":
+            continue
+        value = getattr(uni_event, name)
+        if name == "message":
+            value = [segment_values(uni_ms) for uni_ms in value]
+        values[name] = value
+    return values
+
+
+def typed(value: Any) -> Any:
+    '''附带类型的值，用于区分 1 与 True、"1" 与 1 等相等但类型不同的值'''
+    if isinstance(value, (list, tuple)):
+        return type(value).__name__, [typed(v) for v in value]
+    if isinstance(value, dict):
+        return "dict", [(typed(k), typed(v)) for k, v in value.items()]
+    return type(value).__name__, value
+
+SAMPLE_PATH = "sample.png"
+'''以路径提供的媒体所用文件，位于基准测试的临时工作目录'''
+
+def sample_message(uni_message, png: bytes):
+    '''包含各类消息段的 UniMessage，媒体分别以 bytes、BytesIO、url 与路径提供'''
+    UniMessageSegment = uni_message.UniMessageSegment
+    uni_msg = uni_message.UniMessage(None)
+    uni_msg.extend([
+        UniMessageSegment.text(None, "0123"),
+        UniMessageSegment.text(None, "12345"),
+        UniMessageSegment.reply(None, "007"),
+        UniMessageSegment.at_all(None),
+        UniMessageSegment.at_user(None, "9" * 30),
+        UniMessageSegment.at_me(None),
+        UniMessageSegment.image(None, bytes=png, timeout=0),
+        UniMessageSegment.voice(None, bytes=BytesIO(png[::-1])),
+        UniMessageSegment.video(None, url="https://example.com/0.mp4", cache=False, proxy=False),
+        UniMessageSegment.image(None, path=SAMPLE_PATH),
+        UniMessageSegment.other(None)
+    ])
+    return uni_msg
+
+def sample_event(cls, uni_message, png: bytes, index: int):
+    '''按字段类型为 UniEvent 类构造实例'''
+    values: dict[str, Any] = {"origin_event": None}
+    for name, model_field in cls.__fields__.items():
+        if name == "origin_event":
+            continue
+        tp = model_field.outer_type_
+        if get_origin(tp) is Literal:
+            value = get_args(tp)[0]
+        elif tp is uni_message.UniMessage:
+            value = sample_message(uni_message, png)
+        elif tp is bool:
+            value = True
+        elif tp is int:
+            value = -(2 ** 40) - index
+        elif tp is str:
+            value = DIGIT_STRINGS[(index + len(values)) % len(DIGIT_STRINGS)]
+        elif get_origin(tp) is Union:
+            value = 2 ** 64 + index
+        elif get_origin(tp) is dict:
+            value = {s: [s, int(index), 0.5, None, False, b"\x00"] for s in DIGIT_STRINGS}
+        else:
+            raise AssertionError(f"{cls.__name__}.{name} 的类型 {tp} 未设定样本值")
+        values[name] = value
+    return cls.construct(**values)
+
+def event_classes(base) -> list:
+    classes, stack = [], [base]
+    while stack:
+        cls = stack.pop()
+        classes.append(cls)
+        stack.extend(cls.__subclasses__())
+    return classes
+
+def check_round_trip(serialize, uni_message, uni_event, png: bytes, rng: random.Random) -> int:
+    '''校验全部 UniEvent 类的往返结果，以及损坏数据仅引发 ValueError，返回校验的损坏数据数量'''
+    Path(SAMPLE_PATH).write_bytes(png)
+    raws = []
+    for index, cls in enumerate(event_classes(uni_event.UniEvent)):
+        event = sample_event(cls, uni_message, png, index)
+        raw = serialize.dumps(event)
+        restored = serialize.loads(raw)
+        if type(restored) is not cls:
+            raise AssertionError(f"{cls.__name__} 往返后类型为 {type(restored).__name__}")
+        if typed(event_values(restored)) != typed(event_values(event)):
+            raise AssertionError(f"{cls.__name__} 往返后内容不一致")
+        raws.append(raw)
+
+    uni_msg = sample_message(uni_message, png)
+    restored = serialize.loads(serialize.dumps(uni_msg))
+    if typed([segment_values(s) for s in restored]) != typed([segment_values(s) for s in uni_msg]):
+        raise AssertionError("UniMessage 往返后内容不一致")
+    for uni_ms in restored:
+        if uni_ms.type in ("image", "voice") and uni_ms._url is None and uni_ms._path != SAMPLE_PATH:
+            if uni_ms._bytes is not None or uni_ms._path is None:
+                raise AssertionError("以 bytes 提供的媒体应还原为临时文件路径")
+
+    def expect_error(data: bytes, case: str):
+        try:
+            serialize.loads(data)
+        except ValueError:
+            return
+        except Exception as e:
+            raise AssertionError(f"{case}: 引发了 {type(e).__name__}: {e}，应为 ValueError") from e
+        raise AssertionError(f"{case}: 未引发 ValueError")
+
+    checked = 0
+    raw = max(raws, key=len)
+    cases = {
+        "非序列化数据": b"{}",
+        "空数据": b"",
+        "未知版本": raw[:2] + bytes([serialize.FORMAT_VERSION + 1]) + raw[3:],
+        "未知内容类别": raw[:3] + b"\x09" + raw[4:],
+        "末尾多余内容": raw + b"\x00",
+        "未知 UniEvent 类": serialize.dumps(uni_msg)[:3] + b"\x02\x03Foo\x00",
+        "未知值标记": raw[:3] + b"\x01\x01\x00\x7f",
+        "未知消息段类型编号": raw[:3] + b"\x01\x01\x80",
+        "缺失的媒体缓存": raw[:3] + b"\x01\x01\x05" + b"\x0a" + bytes(16) + b"\x00" * 4
+    }
+    for prefix in range(len(raw)):
+        cases[f"截断至 {prefix} 字节"] = raw[:prefix]
+    for i in range(FUZZ_ROUNDS):
+        data = bytearray(rng.choice(raws))
+        for _ in range(rng.randint(1, 4)):
+            data[rng.randrange(4, len(data))] = rng.randrange(256)
+        try:
+            serialize.loads(bytes(data))
+        except ValueError:
+            pass
+        except Exception as e:
+            raise AssertionError(f"随机改写 {bytes(data)!r}: 引发了 {type(e).__name__}: {e}，应为 ValueError") from e
+        checked += 1
+    for case, data in cases.items():
+        expect_error(data, case)
+        checked += 1
+    return checked
+
+
+async def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    output = sys.argv[2] if len(sys.argv) > 2 else None
+
+    plugin = harness.setup()
+    import fixtures
+    serialize = importlib.import_module(f"{plugin.__name__}.universal.serialize")
+    uni_message = importlib.import_module(f"{plugin.__name__}.universal.uni_message")
+    uni_event = importlib.import_module(f"{plugin.__name__}.universal.uni_event")
+
+    rng = random.Random(20231019)
+    checked = check_round_trip(serialize, uni_message, uni_event, fixtures.png(64, 64, rng), rng)
+    print(f"往返校验通过：{len(event_classes(uni_event.UniEvent))} 个 UniEvent 类，{checked} 项损坏数据")
+    images = fixtures.ImagePool(rng)
+
+    results: dict[str, Any] = {}
+    for kind in fixtures.MESSAGE_KINDS:
+        sources = {
+            "onebot": [fixtures.onebot_event(kind, rng, images) for _ in range(SAMPLES)],
+            "villa": [fixtures.villa_event(kind, rng) for _ in range(SAMPLES)]
+        }
+        for platform, events in sources.items():
+            uni_events = [await event.get_uni_event() for event in events]
+
+            for uni_event in uni_events:
+                restored = serialize.loads(serialize.dumps(uni_event))
+                if event_values(restored) != event_values(uni_event):
+                    raise AssertionError(f"{platform}/{kind} 往返后内容不一致")
+
+            raws = [serialize.dumps(e) for e in uni_events]
+            try:
+                jsons = [e.json(exclude={"origin_event"}) for e in uni_events]
+            except Exception as e:
+                jsons = None
+                results[f"{platform}/json/{kind}"] = {"error": f"{type(e).__name__}: {e}"}
+            cls = type(uni_events[0])
+
+            events_it = cycle(uni_events)
+            raws_it = cycle(raws)
+            async def dumps():
+                serialize.dumps(next(events_it))
+            async def loads():
+                serialize.loads(next(raws_it))
+            cases = {"dumps": dumps, "loads": loads}
+            if jsons is not None:
+                jsons_it = cycle(jsons)
+                async def to_json():
+                    next(events_it).json(exclude={"origin_event"})
+                async def json_loads():
+                    cls.construct(**json.loads(next(jsons_it)))
+                cases.update({"json": to_json, "json_loads": json_loads})
+
+            for case, func in cases.items():
+                name = f"{platform}/{case}/{kind}"
+                results[name] = await harness.measure(func, iterations)
+                harness.print_result(name, results[name])
+
+            sizes = {"dumps": sum(map(len, raws)) / len(raws)}
+            if jsons is not None:
+                sizes["json"] = sum(len(j.encode()) for j in jsons) / len(jsons)
+            results[f"{platform}/size/{kind}"] = sizes
+            print(f"{platform}/size/{kind:<44} " + " ".join(f"{k} {v:.0f} B" for k, v in sizes.items()))
+
+    harness.write_results("serialize", results, output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+'''
+比较世界树在立即激活与延迟激活两种模式下的插件加载耗时。
+
+每轮在独立子进程中初始化 NoneBot2 并加载插件，以避免模块缓存影响结果。
+
+用法：python benchmarks/bench_startup.py [轮数] [输出 JSON 路径]
+'''
+
+from pathlib import Path
+import subprocess
+import statistics
+import json
+import sys
+
+
+PLUGIN_PATH = Path(__file__).resolve().parents[1]
+
+SNIPPET = """
+import sys, time, json
+import nonebot
+nonebot.init(driver="~none", log_level="WARNING", sekaiju_lazy_activation={lazy})
+sys.path.insert(0, {parent!r})
+start = time.perf_counter()
+__import__({name!r})
+print(json.dumps(time.perf_counter() - start))
+"""
+
+
+def run_once(lazy: bool) -> float:
+    code = SNIPPET.format(
+        lazy=lazy,
+        parent=str(PLUGIN_PATH.parent),
+        name=PLUGIN_PATH.name
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = {}
+    for mode, lazy in (("eager", False), ("lazy", True)):
+        times = [run_once(lazy) for _ in range(rounds)]
+        results[mode] = {
+            "rounds": rounds,
+            "min": min(times),
+            "median": statistics.median(times),
+            "max": max(times)
+        }
+        print(f"{mode:>5}: median {results[mode]['median']*1000:.1f} ms, min {results[mode]['min']*1000:.1f} ms")
+    if len(sys.argv) > 2:
+        Path(sys.argv[2]).write_text(json.dumps(results, indent=2), "utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+'''
+测量跨适配器发送消息模板时预编译模板的效果。
+
+以含图片的 OneBot V11 消息模板向大别野 Bot 发送，比较每次格式化后整体转换消息
+与由 Matcher.send 所用的预编译模板格式化、仅转换替换值的耗时。
+
+用法：python benchmarks/bench_template.py [迭代次数] [输出 JSON 路径]
+'''
+
+from typing import Any
+import importlib
+import asyncio
+import random
+import sys
+
+import harness
+
+
+async def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    output = sys.argv[2] if len(sys.argv) > 2 else None
+
+    plugin = harness.setup()
+    import fixtures
+    from nonebot.adapters import MessageTemplate
+    from nonebot.adapters.onebot.v11 import Message, MessageSegment
+    modifiers = importlib.import_module(f"{plugin.__name__}.modifiers")
+    uni_message = importlib.import_module(f"{plugin.__name__}.universal.uni_message")
+    utils = importlib.import_module(f"{plugin.__name__}.utils")
+
+    rng = random.Random(0)
+    template = MessageTemplate(Message([
+        MessageSegment.text("{name} 的今日运势："),
+        MessageSegment.image(fixtures.png(320, 240, rng)),
+        MessageSegment.text("幸运数字 {number}，"),
+        MessageSegment.text("{target}")
+    ]), Message)
+    bot = fixtures.villa_bot()
+    state = {"name": "张三", "number": 7, "target": MessageSegment.at(utils.ascii_encode(fixtures.user_id(rng)))}
+
+    async def full():
+        await uni_message.convert_message(
+            message=template.format(**state),
+            origin_adapter="OneBot V11",
+            target_adapter="Villa",
+            target_bot=bot,
+            from_origin_encode=False,
+            to_target_decode=True
+        )
+
+    async def compiled():
+        compiled = await modifiers._compile_template(template, "Villa", bot)
+        await modifiers._convert_segments(compiled.format(**state), "Villa", bot)
+
+    results: dict[str, Any] = {}
+    for name, func in (("full", full), ("compiled", compiled)):
+        results[name] = await harness.measure(func, iterations, 20)
+        harness.print_result(name, results[name])
+
+    harness.write_results("template", results, output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
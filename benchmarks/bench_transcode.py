@@ -0,0 +1,88 @@
+'''
+测量导出图片时按目标平台限制转码的开销与缓存效果。
+
+构造超出大别野限制的大尺寸 PNG 截图与动图 GIF，以及满足限制的小图片，测量：
+
+- check: 满足限制的图片经 transcode_media 的开销（仅解析文件头）。
+- first: 首次转码耗时与转码前后体积。
+- cached: 同一图片再次导出时命中转码结果缓存的开销。
+
+用法：python benchmarks/bench_transcode.py [每项计时次数] [输出 JSON 路径]
+'''
+
+from typing import Any
+from time import perf_counter
+from io import BytesIO
+import importlib
+import asyncio
+import random
+import sys
+
+import harness
+
+
+def screenshot(width: int, height: int, rng: random.Random) -> bytes:
+    '''带噪点的大尺寸 PNG，模拟难以压缩的截图'''
+    from PIL import Image
+    image = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    out = BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+def animation(width: int, height: int, frames: int, rng: random.Random) -> bytes:
+    from PIL import Image
+    images = [
+        Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3)).convert("P")
+        for _ in range(frames)
+    ]
+    out = BytesIO()
+    images[0].save(out, format="GIF", save_all=True, append_images=images[1:], duration=80, loop=0)
+    return out.getvalue()
+
+
+async def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    output = sys.argv[2] if len(sys.argv) > 2 else None
+
+    plugin = harness.setup()
+    import fixtures
+    transcode = importlib.import_module(f"{plugin.__name__}.transcode")
+    uni_message = importlib.import_module(f"{plugin.__name__}.universal.uni_message")
+    UniMessageSegment = uni_message.UniMessageSegment
+
+    rng = random.Random(0)
+    samples = {
+        "small_png": fixtures.png(240, 240, rng),
+        "screenshot_png": screenshot(2400, 1600, rng),
+        "animated_gif": animation(800, 600, 24, rng)
+    }
+
+    results: dict[str, Any] = {}
+    for name, data in samples.items():
+        segment = UniMessageSegment.image(None, bytes=data)
+        start = perf_counter()
+        variant = await transcode.transcode_media(segment, "Villa")
+        first = perf_counter() - start
+        changed = variant is not segment
+        results[f"{name}/first"] = {
+            "seconds": first,
+            "transcoded": changed,
+            "bytes_before": len(data),
+            "bytes_after": len(variant.bytes)
+        }
+        print(
+            f"{name + '/first':<40} {first*1000:>10.1f} ms "
+            f"{len(data)/1024:>8.0f} KiB -> {len(variant.bytes)/1024:>8.0f} KiB"
+        )
+        results[f"{name}/{'cached' if changed else 'check'}"] = result = await harness.measure(
+            lambda: transcode.transcode_media(segment, "Villa"),
+            iterations,
+            warmup=5
+        )
+        harness.print_result(f"{name}/{'cached' if changed else 'check'}", result)
+
+    harness.write_results("transcode", results, output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+'''
+测量大别野图片上传缓存的效果，并检查每种图片内容仅上传一次。
+
+以若干张不同的图片构造 OneBot V11 消息，逐条导出为大别野消息，每张图片重复发送多次，
+其中一轮为同一图片的并发发送。上传函数不访问网络，仅计数。
+比较首次发送（需上传）与重复发送（命中缓存）的耗时，
+并检查上传次数等于图片种数、缓存文件在合并写入后记录了全部图片。
+
+用法：python benchmarks/bench_upload_cache.py [图片数] [每张重复次数] [输出 JSON 路径]
+'''
+
+from typing import Any
+from time import perf_counter
+import importlib
+import asyncio
+import random
+import json
+import sys
+
+import harness
+
+
+SAVE_INTERVAL = 0.2
+'''基准测试所用的缓存写入延迟，单位秒'''
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    output = sys.argv[3] if len(sys.argv) > 3 else None
+
+    plugin = harness.setup(sekaiju_villa_upload_save_interval=SAVE_INTERVAL)
+    import fixtures
+    from nonebot.adapters.onebot.v11 import Message, MessageSegment
+    uni_message = importlib.import_module(f"{plugin.__name__}.universal.uni_message")
+    upload = importlib.import_module(f"{plugin.__name__}.adapters.villa.upload")
+
+    rng = random.Random(0)
+    images = [fixtures.png(320, 240, rng) for _ in range(count)]
+    bot = fixtures.villa_bot()
+
+    uploads = 0
+    upload_image = bot.upload_image
+    async def counting_upload(image: Any, *args: Any, **kwargs: Any) -> Any:
+        nonlocal uploads
+        uploads += 1
+        return await upload_image(image, *args, **kwargs)
+    setattr(bot, "upload_image", counting_upload)
+
+    writes = 0
+    write = upload.file_io_pool.write
+    async def counting_write(*args: Any, **kwargs: Any) -> Any:
+        nonlocal writes
+        writes += 1
+        return await write(*args, **kwargs)
+    setattr(upload.file_io_pool, "write", counting_write)
+
+    async def send(image: bytes) -> float:
+        # 每次发送构造新的 UniMessage，不经导出结果缓存
+        start = perf_counter()
+        uni_msg = await uni_message.UniMessage.generate("OneBot V11", Message(MessageSegment.image(image)))
+        await uni_msg.export("Villa", bot, villa_id=fixtures.VILLA_ID)
+        return perf_counter() - start
+
+    cold = [await send(image) for image in images]
+    warm = [await send(image) for _ in range(repeat - 1) for image in images]
+    await asyncio.gather(*(send(image) for image in images for _ in range(repeat)))
+    await asyncio.sleep(SAVE_INTERVAL * 3)
+
+    cache = upload.get_upload_cache(bot)
+    saved = json.loads(cache.path.read_text("utf-8"))
+    assert uploads == count, f"上传 {uploads} 次，应为 {count} 次"
+    assert len(saved) == count, f"缓存文件记录 {len(saved)} 张图片，应为 {count} 张"
+
+    results: dict[str, Any] = {
+        "images": count,
+        "sends": count * repeat * 2,
+        "uploads": uploads,
+        "file_writes": writes,
+        "cold_mean": sum(cold) / len(cold),
+        "warm_mean": sum(warm) / len(warm)
+    }
+    print(f"{count} 种图片共发送 {count * repeat * 2} 次，上传 {uploads} 次，缓存文件写入 {writes} 次")
+    print(f"首次发送平均 {results['cold_mean']*1000:>7.2f} ms，重复发送平均 {results['warm_mean']*1000:>7.2f} ms")
+
+    harness.write_results("upload_cache", results, output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,276 @@
+'''
+基准测试所用的合成数据。
+
+构造 OneBot V11 与大别野的合成事件、消息，以及不访问网络的测试 Bot。
+消息分为以下几类，长度与数量按常见聊天内容的分布随机生成：
+
+- text: 纯文本。
+- at_heavy: 大量 @ 用户穿插短文本。
+- image_heavy: 多张图片，图片内容为随机像素的 PNG。
+- long_reply: 回复消息并附带长文本。
+
+需在 harness.setup 之后导入。
+'''
+
+from typing import Any
+from types import SimpleNamespace
+from hashlib import md5
+import random
+import struct
+import json
+import zlib
+
+import nonebot
+from nonebot.adapters.onebot.v11 import (
+    Adapter as OneBotv11Adapter,
+    Bot as OneBotv11Bot,
+    Message as OneBotv11Message,
+    MessageSegment as OneBotv11MessageSegment,
+    GroupMessageEvent as OneBotv11GroupMessageEvent
+)
+from nonebot.adapters.villa import (
+    Adapter as VillaAdapter,
+    Bot as VillaBot
+)
+from nonebot.adapters.villa.config import BotInfo
+from nonebot.adapters.villa.event import SendMessageEvent
+from nonebot.adapters.villa.models import Member
+
+
+MESSAGE_KINDS = ("text", "at_heavy", "image_heavy", "long_reply")
+'''合成消息种类'''
+
+ONEBOT_SELF_ID = "10000"
+VILLA_SELF_ID = "bot_bench"
+VILLA_ID = 1001
+ROOM_ID = 2002
+
+# 仅用于构造大别野 Bot，不参与任何验证
+VILLA_PUB_KEY = """-----BEGIN PUBLIC KEY-----
+MIGfMA0GCSqGSIb3DQEBAQUAA4GNADCBiQKBgQDhpo0ZJiGrgsKOWbEgYN4ijKj5
+c/Cn9PwKki5zgmBum8oT5eYlqtNFQycCmythGM5uMYYey19LBQJBqqjJ35zb1WS9
+XCt6mzv0TqHv3Ind9Ta1FRbCTkkXRfKvk1fPmzYsP1akuAQvBKx8JUKuBkT1c6KG
+kWqrwESr64KSZW6jTwIDAQAB
+-----END PUBLIC KEY-----
+"""
+
+_CHARS = "世界树的枝叶伸向每一个平台消息在这里流转与汇合abcdefghijklmnopqrstuvwxyz0123456789 ，。！？"
+_IMAGE_SIZES = ((64, 64), (240, 240), (480, 360))
+
+
+def png(width: int, height: int, rng: random.Random) -> bytes:
+    '''生成随机像素的 RGB PNG 图片'''
+    raw = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw, 1))
+        + chunk(b"IEND", b"")
+    )
+
+
+class ImagePool:
+    '''预先生成的图片，按尺寸分布抽取'''
+
+    def __init__(self, rng: random.Random, per_size: int = 4):
+        self.images = [png(w, h, rng) for w, h in _IMAGE_SIZES for _ in range(per_size)]
+
+    def pick(self, rng: random.Random) -> bytes:
+        return rng.choice(self.images)
+
+
+def text(rng: random.Random, mean_length: float = 24) -> str:
+    '''按对数正态分布长度生成文本'''
+    length = max(1, min(2000, int(rng.lognormvariate(0, 0.8) * mean_length)))
+    return "".join(rng.choices(_CHARS, k=length))
+
+
+def user_id(rng: random.Random) -> int:
+    return rng.randint(10**5, 10**10)
+
+
+# OneBot V11
+
+def onebot_message(kind: str, rng: random.Random, images: ImagePool) -> OneBotv11Message:
+    '''生成指定种类的 OneBot V11 消息'''
+    msg = OneBotv11Message()
+    if kind == "text":
+        msg.append(OneBotv11MessageSegment.text(text(rng)))
+    elif kind == "at_heavy":
+        for _ in range(rng.randint(5, 20)):
+            msg.append(OneBotv11MessageSegment.at(user_id(rng)))
+            msg.append(OneBotv11MessageSegment.text(text(rng, 6)))
+    elif kind == "image_heavy":
+        msg.append(OneBotv11MessageSegment.text(text(rng, 8)))
+        for _ in range(rng.randint(3, 9)):
+            msg.append(OneBotv11MessageSegment.image(images.pick(rng)))
+    elif kind == "long_reply":
+        msg.append(OneBotv11MessageSegment.reply(rng.randint(1, 2**31)))
+        msg.append(OneBotv11MessageSegment.at(user_id(rng)))
+        msg.append(OneBotv11MessageSegment.text(text(rng, 1200)))
+    else:
+        raise ValueError(f"未知的消息种类 {kind}。")
+    return msg
+
+
+def onebot_event(kind: str, rng: random.Random, images: ImagePool) -> OneBotv11GroupMessageEvent:
+    '''生成指定种类的 OneBot V11 群消息事件'''
+    message = onebot_message(kind, rng, images)
+    uid = user_id(rng)
+    return OneBotv11GroupMessageEvent(
+        time=1700000000,
+        self_id=int(ONEBOT_SELF_ID),
+        post_type="message",
+        sub_type="normal",
+        user_id=uid,
+        message_type="group",
+        message_id=rng.randint(1, 2**31),
+        message=message,
+        original_message=message.copy(),
+        raw_message=str(message),
+        font=0,
+        sender={"user_id": uid, "nickname": text(rng, 6), "card": ""},
+        group_id=rng.randint(10**5, 10**9),
+        to_me=False
+    )
+
+
+class BenchOneBotv11Bot(OneBotv11Bot):
+    '''不访问网络的 OneBot V11 Bot'''
+
+    async def call_api(self, api: str, **data: Any) -> Any:
+        if api in ("send_msg", "send_group_msg", "send_private_msg"):
+            return {"message_id": 1}
+        return {}
+
+
+def onebot_bot() -> BenchOneBotv11Bot:
+    return BenchOneBotv11Bot(nonebot.get_adapter(OneBotv11Adapter), ONEBOT_SELF_ID)
+
+
+# 大别野
+
+def _villa_content(kind: str, rng: random.Random) -> dict[str, Any]:
+    pieces: list[tuple[str, dict[str, Any]]] = []
+    if kind == "text":
+        pieces.append((text(rng), {}))
+    elif kind == "at_heavy":
+        pieces.append(("@世界树 ", {"type": "mentioned_robot", "bot_id": VILLA_SELF_ID}))
+        for _ in range(rng.randint(5, 20)):
+            pieces.append((f"@{text(rng, 4)} ", {"type": "mentioned_user", "user_id": str(user_id(rng))}))
+            pieces.append((text(rng, 6), {}))
+    elif kind == "image_heavy":
+        pieces.append((text(rng, 8), {}))
+    elif kind == "long_reply":
+        pieces.append((f"@{text(rng, 4)} ", {"type": "mentioned_user", "user_id": str(user_id(rng))}))
+        pieces.append((text(rng, 1200), {}))
+    else:
+        raise ValueError(f"未知的消息种类 {kind}。")
+    content_text = ""
+    entities = []
+    for piece, entity in pieces:
+        offset = len(content_text.encode("utf-16-le")) // 2
+        content_text += piece
+        if entity:
+            entities.append({
+                "offset": offset,
+                "length": len(piece.encode("utf-16-le")) // 2,
+                "entity": entity
+            })
+    content: dict[str, Any] = {"text": content_text, "entities": entities}
+    if kind == "image_heavy":
+        content["images"] = [
+            {"url": f"https://example.com/{md5(str(i).encode()).hexdigest()}.png", "size": {"width": w, "height": h}}
+            for i, (w, h) in enumerate(rng.choices(_IMAGE_SIZES, k=rng.randint(3, 9)))
+        ]
+    return content
+
+
+def villa_event(kind: str, rng: random.Random) -> SendMessageEvent:
+    '''生成指定种类的大别野消息事件，数据格式与回调推送一致'''
+    uid = user_id(rng)
+    nickname = text(rng, 6)
+    send_at = 1700000000000 + rng.randint(0, 10**6)
+    event_data: dict[str, Any] = {
+        "content": json.dumps({
+            "content": _villa_content(kind, rng),
+            "user": {
+                "portraitUri": "",
+                "extra": {},
+                "name": nickname,
+                "alias": "",
+                "id": str(uid),
+                "portrait": ""
+            }
+        }, ensure_ascii=False),
+        "from_user_id": uid,
+        "send_at": send_at,
+        "object_name": 1,
+        "room_id": ROOM_ID,
+        "nickname": nickname,
+        "msg_uid": md5(str(send_at).encode()).hexdigest(),
+        "villa_id": VILLA_ID
+    }
+    if kind == "long_reply":
+        event_data["quote_msg"] = {
+            "content": text(rng, 40),
+            "msg_uid": md5(str(send_at - 1).encode()).hexdigest(),
+            "send_at": send_at - 1000,
+            "msg_type": "MHY:Text",
+            "from_user_id_str": str(user_id(rng))
+        }
+    return SendMessageEvent.parse_obj({
+        "robot": {
+            "villa_id": VILLA_ID,
+            "template": {"id": VILLA_SELF_ID, "name": "世界树", "icon": ""}
+        },
+        "type": 2,
+        "id": md5(f"event{send_at}".encode()).hexdigest(),
+        "created_at": send_at // 1000,
+        "send_at": send_at // 1000,
+        "extend_data": {"EventData": {"SendMessage": event_data}}
+    })
+
+
+class BenchVillaBot(VillaBot):
+    '''不访问网络的大别野 Bot'''
+
+    async def call_api(self, api: str, **data: Any) -> Any:
+        if api == "send_message":
+            return md5(repr(data).encode()).hexdigest()
+        if api == "get_member":
+            return Member.parse_obj({
+                "basic": {"uid": data["uid"], "nickname": "用户", "introduce": "", "avatar_url": ""},
+                "role_id_list": [],
+                "joined_at": 0,
+                "role_list": []
+            })
+        return None
+
+    async def upload_image(self, image: Any, *args: Any, **kwargs: Any) -> Any:
+        return SimpleNamespace(url=f"https://example.com/{md5(image).hexdigest()}.png")
+
+
+def villa_bot() -> BenchVillaBot:
+    return BenchVillaBot(
+        nonebot.get_adapter(VillaAdapter),
+        VILLA_SELF_ID,
+        BotInfo(bot_id=VILLA_SELF_ID, bot_secret="", pub_key=VILLA_PUB_KEY)
+    )
+
+
+__all__ = [
+    "MESSAGE_KINDS",
+    "png",
+    "ImagePool",
+    "text",
+    "onebot_message",
+    "onebot_event",
+    "onebot_bot",
+    "villa_event",
+    "villa_bot",
+    "BenchOneBotv11Bot",
+    "BenchVillaBot"
+]
@@ -0,0 +1,134 @@
+'''
+基准测试公用工具。
+
+负责初始化 NoneBot2 并加载世界树插件、计时统计与结果输出。
+各基准测试脚本需先调用 setup 再导入插件或 fixtures 中依赖插件的内容。
+'''
+
+from typing import Any, Awaitable, Callable, Optional
+from pathlib import Path
+from time import perf_counter
+import statistics
+import platform
+import tempfile
+import json
+import time
+import sys
+import os
+
+
+PLUGIN_PATH = Path(__file__).resolve().parents[1]
+
+
+def setup(**config: Any):
+    """
+    初始化 NoneBot2 并加载世界树插件，插件将注册 OneBot V11 与大别野适配器。
+
+    工作目录将切换到临时目录，以免插件数据写入仓库。
+
+    :param config: 额外的 NoneBot2 配置项。
+    :return: 世界树插件模块。
+    """
+    import nonebot
+
+    os.chdir(tempfile.mkdtemp(prefix="sekaiju_bench_"))
+    nonebot.init(
+        driver="~none",
+        log_level="WARNING",
+        **{
+            "sekaiju_adapters": ["nonebot-adapter-onebot", "nonebot-adapter-villa"],
+            **config
+        }
+    )
+    sys.path.insert(0, str(PLUGIN_PATH.parent))
+    return __import__(PLUGIN_PATH.name)
+
+
+def percentile(data: list[float], q: float) -> float:
+    '''最近秩法求分位数，data 需已排序'''
+    if not data:
+        return 0
+    return data[min(len(data) - 1, max(0, round(q * len(data)) - 1))]
+
+
+async def measure(
+    func: Callable[[], Awaitable[Any]],
+    iterations: int = 1000,
+    warmup: int = 50
+) -> dict[str, Any]:
+    """
+    多次调用异步函数，统计吞吐量与延迟分位数。
+
+    :param func: 被测的无参异步函数。
+    :param iterations: 计时调用次数。
+    :param warmup: 计时前的预热调用次数。
+    :return: 统计结果，时间单位为秒；调用出错时仅返回错误信息。
+    """
+    try:
+        for _ in range(warmup):
+            await func()
+        samples: list[float] = []
+        total_start = perf_counter()
+        for _ in range(iterations):
+            start = perf_counter()
+            await func()
+            samples.append(perf_counter() - start)
+        total = perf_counter() - total_start
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "ops_per_sec": iterations / total,
+        "mean": statistics.fmean(samples),
+        "p50": percentile(samples, 0.5),
+        "p90": percentile(samples, 0.9),
+        "p99": percentile(samples, 0.99),
+        "max": samples[-1]
+    }
+
+
+def print_result(name: str, result: dict[str, Any]):
+    if "error" in result:
+        print(f"{name:<56} 出错：{result['error']}")
+    else:
+        print(
+            f"{name:<56} {result['ops_per_sec']:>10.0f} ops/s "
+            f"p50 {result['p50']*1e6:>8.1f} us p99 {result['p99']*1e6:>8.1f} us"
+        )
+
+
+def write_results(
+    suite: str,
+    results: dict[str, Any],
+    path: Optional[str] = None
+) -> dict[str, Any]:
+    """
+    附加运行环境信息，并在给定路径时写入 JSON 文件。
+
+    :param suite: 基准测试名称。
+    :param results: 各项测试结果。
+    :param path: 输出 JSON 路径。
+    """
+    import nonebot
+    output = {
+        "suite": suite,
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "nonebot": getattr(nonebot, "__version__", None),
+        "results": results
+    }
+    if path:
+        Path(path).write_text(json.dumps(output, ensure_ascii=False, indent=2), "utf-8")
+    return output
+
+
+__all__ = [
+    "PLUGIN_PATH",
+    "setup",
+    "percentile",
+    "measure",
+    "print_result",
+    "write_results"
+]
@@ -0,0 +1,132 @@
+'''
+提供世界树各模块通用的缓存工具。
+'''
+
+from typing import (
+    Any,
+    Generic,
+    TypeVar,
+    Hashable,
+    Callable,
+    Optional,
+    Awaitable,
+    Iterator
+)
+from collections import OrderedDict
+from time import monotonic
+import asyncio
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING: Any = object()
+
+
+class TTLCache(Generic[K, V]):
+    """
+    带过期时间的 LRU 缓存。
+
+    :param maxsize: 最大缓存条目数，超出时淘汰最久未使用的条目。为 0 时不限制。
+    :param ttl: 默认过期时间，单位秒。为 None 时条目不会过期。
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[K, tuple[V, Optional[float]]] = OrderedDict()
+
+    def get(self, key: K, default: Any = None) -> Any:
+        '''获取缓存值，不存在或已过期时返回 default'''
+        if (item := self._data.get(key, _MISSING)) is _MISSING:
+            return default
+        value, expire = item
+        if expire is not None and expire <= monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None):
+        '''设置缓存值，ttl 留空则使用默认过期时间'''
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (value, None if ttl is None else monotonic() + ttl)
+        self._data.move_to_end(key)
+        if self.maxsize:
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: K, default: Any = None) -> Any:
+        '''移除并返回缓存值'''
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        del self._data[key]
+        return value
+
+    def clear(self):
+        self._data.clear()
+
+    def items(self) -> Iterator[tuple[K, V]]:
+        '''遍历所有未过期的缓存条目'''
+        now = monotonic()
+        for key, (value, expire) in list(self._data.items()):
+            if expire is None or expire > now:
+                yield key, value
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight(Generic[K, V]):
+    '''合并相同键的并发异步调用，同一时刻相同键仅实际执行一次'''
+
+    def __init__(self):
+        self._futures: dict[K, asyncio.Future] = {}
+
+    async def do(self, key: K, func: Callable[[], Awaitable[V]]) -> V:
+        '''执行 func，若相同 key 的调用正在进行，则等待其结果'''
+        if (future := self._futures.get(key)) is not None:
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._futures[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._futures.pop(key, None)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._futures
+
+
+def make_key(*args: Any, **kwargs: Any) -> Hashable:
+    '''将参数转化为可哈希的缓存键'''
+    def freeze(obj: Any) -> Hashable:
+        if isinstance(obj, dict):
+            return tuple(sorted((k, freeze(v)) for k, v in obj.items()))
+        if isinstance(obj, (list, tuple, set)):
+            return tuple(freeze(i) for i in obj)
+        if isinstance(obj, Hashable):
+            return obj
+        return repr(obj)
+    return (freeze(args), freeze(kwargs))
+
+
+__all__ = [
+    "TTLCache",
+    "SingleFlight",
+    "make_key"
+]
@@ -1,6 +1,7 @@
 from nonebot import get_driver
 
 from pydantic import BaseModel
+from typing import Optional, Literal
 
 
 
@@ -11,6 +12,95 @@ class Config(BaseModel):
         "nonebot-adapter-villa"
     ]
     '''需要适配的 adapter 列表'''
+    sekaiju_lazy_activation: bool = False
+    '''
+    是否延迟激活世界树代理适配器。
+
+    启用后适配器仍在启动时注册，但全部世界树转换表将在任一适配器的首个 Bot 连接时才构建。
+    启动耗时因此略有减少，代价是首个 Bot 连接时需完成构建；在此之前收到的事件不参与世界树转换。
+    '''
+    sekaiju_startup_profile: bool = False
+    '''是否记录并输出插件启动各阶段的耗时与内存分配'''
+    sekaiju_api_cache_size: int = 1024
+    '''每个 UniBot 的 API 结果缓存条目上限'''
+    sekaiju_entity_store: bool = True
+    '''是否在事件经过时本地存储用户、群聊、频道、房间信息'''
+    sekaiju_entity_cache_size: int = 4096
+    '''本地信息存储的内存缓存条目上限'''
+    sekaiju_entity_batch_size: int = 64
+    '''本地信息存储累计多少条写入后立即落盘'''
+    sekaiju_entity_flush_interval: float = 5
+    '''本地信息存储写入的最长延迟，单位秒'''
+    sekaiju_villa_context_size: int = 4096
+    '''每个大别野 Bot 上下文缓存的条目上限'''
+    sekaiju_villa_context_ttl: Optional[float] = 24 * 60 * 60
+    '''大别野 Bot 上下文缓存的过期时间，单位秒'''
+    sekaiju_villa_room_index_size: int = 4096
+    '''大别野群聊 id 与 (villa_id, room_id) 双向索引的条目上限'''
+    sekaiju_drop_origin: bool = False
+    '''UniMessage 导出完成或所在 UniEvent 构建完成后，是否丢弃其中的原消息与原消息段，以减少长期保存 UniMessage 时的内存占用'''
+    sekaiju_export_cache: bool = False
+    '''UniMessage 是否缓存各目标的导出结果，同一 UniMessage 多次导出时仅导出一次，命中时需复制导出结果，仅导出一次的消息启用后反而更慢'''
+    sekaiju_media_backend: str = "default"
+    '''媒体后端名称，可选 default、header，详见 media 模块文档'''
+    sekaiju_media_negative_ttl: float = 600
+    '''获取网络媒体返回 4xx 时，该 url 直接失败的时长，单位秒'''
+    sekaiju_media_breaker_threshold: int = 3
+    '''同一主机连续多少次获取网络媒体失败后暂停请求'''
+    sekaiju_media_breaker_cooldown: float = 60
+    '''暂停请求失败主机的时长，单位秒'''
+    sekaiju_media_placeholder: bool = True
+    '''导出时获取媒体失败是否以文本占位代替该消息段，否则抛出 MediaFetchError'''
+    sekaiju_media_workers: int = 0
+    '''媒体工作进程数，为 0 时图片尺寸读取、base64 解码与 md5 计算均在事件循环线程内进行'''
+    sekaiju_media_inline_threshold: int = 256 * 1024
+    '''交由媒体工作进程处理的最小字节数，更小的内容直接在事件循环线程内处理'''
+    sekaiju_file_io_workers: int = 4
+    '''异步读写临时文件所用的线程数'''
+    sekaiju_media_transcode: bool = True
+    '''导出的图片超出目标平台限制时是否缩放或重新编码'''
+    sekaiju_media_variant_cache_size: int = 1024
+    '''图片转码结果缓存的条目上限'''
+    sekaiju_prefetch: bool = False
+    '''是否在构造 UniMessage 时于后台预先下载仅有 url 的媒体'''
+    sekaiju_prefetch_concurrency: int = 4
+    '''同时进行的媒体预取下载数上限'''
+    sekaiju_prefetch_message_budget: int = 8 * 1024 * 1024
+    '''每条消息累计预取的字节数上限'''
+    sekaiju_prefetch_cache_bytes: int = 64 * 1024 * 1024
+    '''保存已预取内容的总字节数上限'''
+    sekaiju_prefetch_ttl: float = 300
+    '''已预取内容的保存时长，单位秒，超时未使用则丢弃'''
+    sekaiju_event_dedup: bool = True
+    '''是否在事件预处理时丢弃重复投递的事件，需在启动前设定'''
+    sekaiju_event_dedup_mode: Literal["set", "bloom"] = "set"
+    '''事件去重的实现，set 精确记录最近的事件，bloom 以固定内存的布隆过滤器记录，可能误判'''
+    sekaiju_event_dedup_window: float = 600
+    '''事件去重的时间窗口，单位秒，超出窗口后重复投递的事件不再被识别'''
+    sekaiju_event_dedup_capacity: int = 65536
+    '''时间窗口内记录的事件数上限，bloom 模式下据此与误判率确定内存占用'''
+    sekaiju_event_dedup_error_rate: float = 1e-6
+    '''bloom 模式下将新事件误判为重复事件的概率上限'''
+    sekaiju_villa_upload_cache_size: int = 1024
+    '''每个大别野 Bot 图片上传缓存的条目上限'''
+    sekaiju_villa_upload_cache_ttl: float = 24 * 60 * 60
+    '''大别野图片上传缓存的有效期，单位秒'''
+    sekaiju_villa_upload_save_interval: float = 5
+    '''大别野图片上传缓存写入文件的最长延迟，单位秒'''
+    sekaiju_metrics: bool = False
+    '''是否记录转换与分发热点路径的运行指标，需在启动前设定'''
+    sekaiju_metrics_host: str = "127.0.0.1"
+    '''运行指标导出端点监听地址'''
+    sekaiju_metrics_port: Optional[int] = None
+    '''运行指标导出端点监听端口，留空则不开启端点'''
+    sekaiju_metrics_summary_interval: Optional[float] = 300
+    '''运行指标摘要日志输出间隔，单位秒，留空则不输出'''
+    sekaiju_trace: bool = False
+    '''是否记录耗时过长的转换调用树，需在启动前设定'''
+    sekaiju_trace_threshold: float = 0.1
+    '''记录调用树的耗时阈值，单位秒'''
+    sekaiju_trace_buffer_size: int = 64
+    '''保存调用树的数量上限，超出时丢弃最早的记录'''
 
 config = Config.parse_obj(get_driver().config)
 '''当前插件配置'''
\ No newline at end of file
@@ -0,0 +1,208 @@
+'''
+世界树事件去重。
+
+大别野回调超时后会重新投递事件，OneBot V11 反向 WebSocket 重连后也可能重放事件。
+启用 sekaiju_event_dedup 后，各适配器通过 add_dedup_key 为 Event 类设定去重键，
+事件预处理时去重键已出现过的事件将以 IgnoredException 丢弃，不再进行转换与分发。
+
+NoneBot 并发运行各事件预处理函数，IgnoredException 无法阻止其他预处理函数处理重复事件。
+需要跳过重复事件的预处理函数应调用 EventDeduplicator.check，与去重预处理函数共用同一判断结果。
+
+去重键仅在 sekaiju_event_dedup_window 秒内记录，可通过 sekaiju_event_dedup_mode 选择实现：
+
+- set: 精确记录窗口内的去重键，至多 sekaiju_event_dedup_capacity 条，超出时淘汰最早的记录，不会误判。
+- bloom: 两代轮换的布隆过滤器，内存占用由容量与误判率 sekaiju_event_dedup_error_rate 确定且固定，
+  新事件可能以不超过误判率的概率被误判为重复事件。
+'''
+
+from typing import (
+    Callable,
+    Hashable,
+    Optional,
+    Protocol,
+    Type,
+    Union
+)
+from hashlib import blake2b
+from time import monotonic
+from math import ceil, log
+
+from nonebot.adapters import Event
+from nonebot.typing import T_State
+
+from .cache import TTLCache
+from .config import config
+from .metrics import registry
+
+
+DEDUP_STATE_KEY = "_sekaiju_duplicate"
+'''事件处理状态中记录去重结果的键'''
+
+DedupKey = Callable[[Event], Optional[Hashable]]
+'''去重键函数，以 Event 实例为唯一参数，返回可哈希的去重键，返回 None 表示不去重'''
+
+
+class SeenSet(Protocol):
+    def add(self, key: Hashable) -> bool:
+        '''记录去重键，返回其在时间窗口内是否已出现过'''
+        ...
+
+
+class WindowedSet:
+    """
+    精确记录时间窗口内去重键的集合。
+
+    :param window: 时间窗口，单位秒。
+    :param capacity: 记录条数上限，超出时淘汰最早的记录。
+    """
+
+    def __init__(self, window: float, capacity: int):
+        self._cache: TTLCache[Hashable, bool] = TTLCache(capacity, window)
+
+    def add(self, key: Hashable) -> bool:
+        if key in self._cache:
+            return True
+        self._cache.set(key, True)
+        return False
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+class WindowedBloomFilter:
+    """
+    两代轮换的布隆过滤器。
+
+    新键写入当前代，当前代记录满 capacity 个键或经过 window 秒后成为上一代，原上一代被丢弃，
+    因此去重键至少在 window 秒或 capacity 个新键内可被识别。
+    同时检查两代，每代按误判率的一半确定位数与哈希函数个数。
+
+    :param window: 时间窗口，单位秒。
+    :param capacity: 每代记录的键数上限。
+    :param error_rate: 误判率上限。
+    """
+
+    def __init__(self, window: float, capacity: int, error_rate: float):
+        if not 0 < error_rate < 1:
+            raise ValueError("布隆过滤器误判率应在 0 与 1 之间。")
+        self.window = window
+        self.capacity = capacity
+        self.bits = max(8, ceil(-capacity * log(error_rate / 2) / log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * log(2)))
+        self._current = bytearray((self.bits + 7) // 8)
+        self._previous = bytearray(len(self._current))
+        self._count = 0
+        self._started = monotonic()
+
+    @property
+    def memory(self) -> int:
+        '''两代过滤器占用的字节数'''
+        return len(self._current) * 2
+
+    def _positions(self, key: Hashable) -> list[int]:
+        # 双重哈希，由一次摘要得到全部位置
+        digest = blake2b(repr(key).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def _rotate(self):
+        if self._count < self.capacity and monotonic() - self._started < self.window:
+            return
+        self._previous = self._current
+        self._current = bytearray(len(self._previous))
+        self._count = 0
+        self._started = monotonic()
+
+    def add(self, key: Hashable) -> bool:
+        self._rotate()
+        positions = self._positions(key)
+        current, previous = self._current, self._previous
+        if all(current[i >> 3] & (1 << (i & 7)) for i in positions):
+            return True
+        if all(previous[i >> 3] & (1 << (i & 7)) for i in positions):
+            return True
+        for i in positions:
+            current[i >> 3] |= 1 << (i & 7)
+        self._count += 1
+        return False
+
+
+dedup_keys: dict[Type[Event], DedupKey] = {}
+'''各 Event 类所设定的去重键函数'''
+
+_resolved_keys: dict[Type[Event], Optional[DedupKey]] = {}
+
+
+def add_dedup_key(event_cls: Type[Event], key: DedupKey):
+    """
+    为 Event 类设定去重键函数，其子类同样生效，子类设定的函数优先。
+
+    去重键应包含平台名称与 Bot self_id，以免不同 Bot 收到的同一事件被误判为重复。
+
+    :param event_cls: 原 Event 类。
+    :param key: 以 Event 实例为唯一参数，返回去重键的函数。
+    """
+    dedup_keys[event_cls] = key
+    _resolved_keys.clear()
+
+
+def get_dedup_key(event: Event) -> Optional[Hashable]:
+    '''获取 Event 实例的去重键，未设定时返回 None'''
+    event_cls = type(event)
+    if (func := _resolved_keys.get(event_cls, False)) is False:
+        func = next((dedup_keys[cls] for cls in event_cls.__mro__ if cls in dedup_keys), None)
+        _resolved_keys[event_cls] = func
+    return None if func is None else func(event)
+
+
+class EventDeduplicator:
+    """
+    事件去重器。
+
+    :param seen: 记录去重键的集合。
+    """
+
+    def __init__(self, seen: SeenSet):
+        self.seen = seen
+        self._duplicates = registry.counter("sekaiju_event_duplicates_total", "被丢弃的重复事件数")
+
+    def is_duplicate(self, event: Event) -> bool:
+        '''记录事件，返回其是否为时间窗口内的重复事件'''
+        if (key := get_dedup_key(event)) is None:
+            return False
+        if not self.seen.add(key):
+            return False
+        self._duplicates.inc()
+        return True
+
+    def check(self, event: Event, state: T_State) -> bool:
+        '''同一次事件处理中各预处理函数共用的去重结果，首次调用时记录事件'''
+        if (duplicate := state.get(DEDUP_STATE_KEY)) is None:
+            duplicate = state[DEDUP_STATE_KEY] = self.is_duplicate(event)
+        return duplicate
+
+
+def _make_seen() -> Union[WindowedSet, WindowedBloomFilter]:
+    if config.sekaiju_event_dedup_mode == "bloom":
+        return WindowedBloomFilter(
+            config.sekaiju_event_dedup_window,
+            config.sekaiju_event_dedup_capacity,
+            config.sekaiju_event_dedup_error_rate
+        )
+    return WindowedSet(config.sekaiju_event_dedup_window, config.sekaiju_event_dedup_capacity)
+
+deduplicator = EventDeduplicator(_make_seen())
+'''世界树事件去重器'''
+
+
+__all__ = [
+    "DEDUP_STATE_KEY",
+    "DedupKey",
+    "WindowedSet",
+    "WindowedBloomFilter",
+    "add_dedup_key",
+    "get_dedup_key",
+    "EventDeduplicator",
+    "deduplicator"
+]
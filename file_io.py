@@ -0,0 +1,124 @@
+'''
+世界树文件读写线程池。
+
+数据目录位于网络存储时，单次读写临时文件可能阻塞事件循环数十毫秒。
+异步读写交由独立的有界线程池完成，线程数由 sekaiju_file_io_workers 指定，
+与下载所用的默认线程池互不占用。
+
+写入先写至同目录下的临时文件再改名，读取方不会见到写入一半的文件。
+同一路径的并发异步写入合并为一次。
+
+较大的文件可通过 map_file 以只读内存映射访问，计算摘要、读取文件头时无需将整个文件读入内存。
+写入以改名完成，已映射的旧文件内容不受影响。
+'''
+
+from typing import (
+    Any,
+    Callable,
+    Optional,
+    TypeVar,
+    Union
+)
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import threading
+import mmap
+import asyncio
+import os
+
+from .cache import SingleFlight
+from .config import config
+
+
+T = TypeVar("T")
+
+
+def write_atomic(path: Union[str, Path], data: bytes, overwrite: bool = True) -> Path:
+    """
+    写入文件，先写至同目录下的临时文件再改名，返回文件的绝对路径。
+
+    :param path: 文件路径，所在目录不存在时创建。
+    :param data: 文件内容。
+    :param overwrite: 文件已存在时是否覆盖，以内容命名的文件无需覆盖。
+    """
+    path = Path(path).absolute()
+    if not overwrite and path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp, "wb") as f:
+            f.write(data)
+        os.replace(temp, path)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+    return path
+
+def read_file(path: Union[str, Path]) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def map_file(path: Union[str, Path]) -> memoryview:
+    '''以只读内存映射打开文件，映射在返回的 memoryview 不再被引用后释放'''
+    with open(path, "rb") as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            # 空文件无法映射
+            return memoryview(b"")
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class FileIOPool:
+    """
+    文件读写线程池，线程在首次提交任务时创建。
+
+    :param workers: 线程数上限。
+    """
+
+    def __init__(self, workers: int):
+        if workers < 1:
+            raise ValueError("文件读写线程数至少为 1。")
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._writes: SingleFlight[Path, Path] = SingleFlight()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="sekaiju_file_io")
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        '''在线程池中调用 func'''
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def write(self, path: Union[str, Path], data: bytes, overwrite: bool = True) -> Path:
+        '''write_atomic 的异步版本，同一路径正在写入时等待其完成'''
+        path = Path(path).absolute()
+        return await self._writes.do(path, lambda: self.run(write_atomic, path, data, overwrite))
+
+    async def read(self, path: Union[str, Path]) -> bytes:
+        '''read_file 的异步版本'''
+        return await self.run(read_file, path)
+
+    async def map(self, path: Union[str, Path]) -> memoryview:
+        '''map_file 的异步版本'''
+        return await self.run(map_file, path)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+file_io_pool = FileIOPool(config.sekaiju_file_io_workers)
+'''世界树文件读写线程池'''
+
+
+__all__ = [
+    "write_atomic",
+    "read_file",
+    "map_file",
+    "FileIOPool",
+    "file_io_pool"
+]
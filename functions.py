@@ -1,8 +1,12 @@
 import nonebot
+from nonebot.adapters import Bot, Event
 
 from .config import config
+from .profiler import startup_profiler
+
+startup_profiler.begin("functions")
+
 from .utils import logger, SUPPORTED_ADAPTERS, support_adapters_info
-from .modifiers import MODIFIERS
 
 
 
@@ -11,6 +15,37 @@ registered_adapters: list[str] = []
 sekaiju_adapters: list[str] = []
 '''完成世界树代理适配器激活的适配器名称列表'''
 
+_modified = False
+
+
+def modify_nonebot():
+    '''对 NoneBot2 部分功能进行修改，仅在首次调用时生效'''
+    global _modified
+    if _modified:
+        return
+    _modified = True
+    with startup_profiler.phase("modifiers"):
+        from .modifiers import MODIFIERS
+        logger("INFO", "修改 NoneBot2 部分功能中...")
+        for param in MODIFIERS:
+            param.main()
+            logger("DEBUG", f"运行 {param.__name__} 完成。")
+        logger("INFO", "修改 NoneBot2 部分功能完成。")
+
+def activate_sekaiju_adapter(adapter_name: str) -> bool:
+    '''激活对应适配器的世界树代理适配器，返回是否激活成功'''
+    if adapter_name in sekaiju_adapters:
+        return True
+    try:
+        with startup_profiler.phase("import_sekaiju_adapter", adapter_name):
+            support_adapters_info[adapter_name].import_sekaiju_adapter()
+    except ModuleNotFoundError:
+        logger("ERROR", f"{adapter_name} 激活世界树代理适配器时失败，请检查对应 AdapterInfo 内容或对应世界树适配器模块是否有误。")
+        return False
+    sekaiju_adapters.append(adapter_name)
+    logger("DEBUG", f"{adapter_name} 适配器已完成代理适配器激活。")
+    return True
+
 
 logger("INFO", "开始注册所选适配器...")
 driver = nonebot.get_driver()
@@ -20,7 +55,8 @@ for adapter_name in config.sekaiju_adapters:
         continue
     
     try:
-        support_adapters_info[adapter_name].register_adapter()
+        with startup_profiler.phase("register_adapter", adapter_name):
+            support_adapters_info[adapter_name].register_adapter()
     except ModuleNotFoundError:
         logger("ERROR", f"{adapter_name} 适配器导入失败，请检查适配器是否正确安装。")
         continue
@@ -34,33 +70,117 @@ else:
     logger("INFO", f"当前不存在被世界树成功注册的适配器。")
 
 
-logger("INFO", "激活世界树代理适配器中...")
-for adapter_name in registered_adapters:
-    try:
-        support_adapters_info[adapter_name].import_sekaiju_adapter()
-    except ModuleNotFoundError:
-        logger("ERROR", f"{adapter_name} 激活世界树代理适配器时失败，请检查对应 AdapterInfo 内容或对应世界树适配器模块是否有误。")
-        continue
-    
-    sekaiju_adapters.append(adapter_name)
-    logger("DEBUG", f"{adapter_name} 适配器已完成代理适配器激活。")
+if config.sekaiju_event_dedup:
+    from nonebot.message import event_preprocessor
+    from nonebot.exception import IgnoredException
+    from nonebot.typing import T_State
+    from .dedup import deduplicator
+
+    # 各事件预处理函数并发运行，此处抛出 IgnoredException 只阻止重复事件的分发，
+    # 其他预处理函数需通过 deduplicator.check 自行跳过重复事件
+    @event_preprocessor
+    async def _(bot: Bot, event: Event, state: T_State):
+        if deduplicator.check(event, state):
+            raise IgnoredException("重复投递的事件")
+
+
+if config.sekaiju_lazy_activation:
+    logger("INFO", "已启用延迟激活，世界树代理适配器将在首个 Bot 连接时全部激活。")
+
+    registered_adapter_names = {
+        support_adapters_info[adapter_name].adapter_name
+        for adapter_name in registered_adapters
+    }
 
-if sekaiju_adapters:
-    logger("INFO", f"激活代理适配器完成，当前受世界树代理的适配器有 {', '.join(sekaiju_adapters)}")
+    @driver.on_bot_connect
+    async def _(bot: Bot):
+        # 事件需转换为其他适配器的类型，因此任一适配器的 Bot 连接时即激活全部已注册的适配器
+        if bot.adapter.get_name() not in registered_adapter_names:
+            return
+        if all(adapter_name in sekaiju_adapters for adapter_name in registered_adapters):
+            return
+        logger("INFO", "首个 Bot 已连接，激活世界树代理适配器中...")
+        for adapter_name in registered_adapters:
+            activate_sekaiju_adapter(adapter_name)
+        if sekaiju_adapters:
+            logger("INFO", f"激活代理适配器完成，当前受世界树代理的适配器有 {', '.join(sekaiju_adapters)}")
+            modify_nonebot()
+        startup_profiler.stop()
 else:
-    logger("INFO", f"当前没有受世界树代理的适配器。")
-
-if sekaiju_adapters:
-    logger("INFO", "修改 NoneBot2 部分功能中...")
-    for param in MODIFIERS:
-        param.main()
-        logger("DEBUG", f"运行 {param.__name__} 完成。")
-    logger("INFO", "修改 NoneBot2 部分功能完成。")
+    logger("INFO", "激活世界树代理适配器中...")
+    for adapter_name in registered_adapters:
+        activate_sekaiju_adapter(adapter_name)
+
+    if sekaiju_adapters:
+        logger("INFO", f"激活代理适配器完成，当前受世界树代理的适配器有 {', '.join(sekaiju_adapters)}")
+    else:
+        logger("INFO", f"当前没有受世界树代理的适配器。")
+
+    if sekaiju_adapters:
+        modify_nonebot()
+    else:
+        logger("INFO", "由于当前没有受世界树代理的适配器，已跳过对 NoneBot2 的功能修改。")
+
+
+if config.sekaiju_metrics:
+    @driver.on_startup
+    async def _():
+        from . import metrics
+        await metrics.start()
+
+
+if config.sekaiju_entity_store:
+    @driver.on_startup
+    async def _():
+        from .universal.identity import identity_index
+        await identity_index.load()
+
+
+if config.sekaiju_media_workers > 0:
+    @driver.on_startup
+    async def _():
+        from .media_worker import media_pool
+        media_pool.start()
+
+
+@driver.on_shutdown
+async def _():
+    # 启用延迟激活而始终没有 Bot 连接时，在此输出启动耗时报告
+    startup_profiler.stop()
+    from .universal.store import entity_store
+    await entity_store.close()
+    from .media_worker import media_pool
+    media_pool.shutdown()
+    from .file_io import file_io_pool
+    file_io_pool.shutdown()
+    if config.sekaiju_prefetch:
+        from .prefetch import prefetcher
+        prefetcher.close()
+        stats = prefetcher.stats()
+        logger(
+            "INFO",
+            f"媒体预取共下载 {stats['fetched_bytes']/1024:.0f} KiB，"
+            f"使用 {stats['used_bytes']/1024:.0f} KiB，未使用 {stats['unused_bytes']/1024:.0f} KiB。"
+        )
+    if config.sekaiju_metrics:
+        from . import metrics
+        await metrics.stop()
+    if config.sekaiju_trace:
+        from .tracing import tracer
+        from .utils import data_path
+        if tracer.traces:
+            tracer.dump_chrome(data_path / "traces.json")
+
+
+startup_profiler.end()
+if config.sekaiju_lazy_activation and registered_adapters:
+    # 代理适配器在首个 Bot 连接时激活，激活完成后再输出报告
+    startup_profiler.stop_tracing()
 else:
-    logger("INFO", "由于当前没有受世界树代理的适配器，已跳过对 NoneBot2 的功能修改。")
+    startup_profiler.stop()
 
 
 
 __all__ = [
     "sekaiju_adapters"
-]
\ No newline at end of file
+]
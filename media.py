@@ -0,0 +1,294 @@
+'''
+世界树媒体后端。
+
+负责获取网络媒体内容与读取图片尺寸。PIL、httpx 等依赖在首次使用媒体时才会导入，
+插件加载时不产生额外开销。
+
+可通过 sekaiju_media_backend 配置项选择后端，或通过 set_media_backend 设置自定义后端：
+
+- default: 使用 httpx 获取媒体，使用 PIL 读取图片尺寸。
+- header: 使用 httpx 获取媒体，仅解析图片文件头读取尺寸，无法识别的格式再交由 PIL 处理。
+
+获取网络媒体应通过 fetch_media 或 fetch_media_async，二者经 FetchGuard 处理失败：
+
+- 返回 4xx 状态码（408、429 除外）的 url 将在 sekaiju_media_negative_ttl 内直接失败。
+- 同一主机连续 sekaiju_media_breaker_threshold 次超时、连接失败或返回 5xx 后，
+  在 sekaiju_media_breaker_cooldown 内该主机的请求直接失败，之后放行一次请求试探。
+'''
+
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, BinaryIO, Optional, Type
+from urllib.parse import urlsplit
+from time import monotonic
+from io import BytesIO
+import threading
+import asyncio
+import struct
+import mmap
+
+from .config import config
+from .cache import TTLCache
+
+if TYPE_CHECKING:
+    import httpx
+
+
+class MediaFetchError(ValueError):
+    """
+    获取网络媒体失败。
+
+    :param message: 错误信息。
+    :param status: 响应状态码，未收到响应时为 None.
+    :param permanent: 是否为重试也无法成功的失败，留空则按状态码判断。
+    """
+
+    def __init__(self, message: str, status: Optional[int] = None, permanent: Optional[bool] = None):
+        super().__init__(message)
+        self.status = status
+        self._permanent = permanent
+
+    @property
+    def permanent(self) -> bool:
+        '''是否为重试也无法成功的失败'''
+        if self._permanent is not None:
+            return self._permanent
+        return self.status is not None and 400 <= self.status < 500 and self.status not in (408, 429)
+
+
+class MediaBackend(ABC):
+    '''媒体后端基类'''
+
+    @abstractmethod
+    def fetch(self, url: str, timeout: Optional[float] = None) -> bytes:
+        '''从 url 地址获取数据，响应不是媒体内容时应抛出 MediaFetchError'''
+
+    @abstractmethod
+    def probe_size(self, data: bytes) -> tuple[int, int]:
+        '''读取图片尺寸，返回 (宽, 高)'''
+
+
+class DefaultMediaBackend(MediaBackend):
+    '''使用 httpx 与 PIL 的媒体后端，二者均在首次使用时导入'''
+
+    def __init__(self):
+        self._client: Optional["httpx.Client"] = None
+
+    @property
+    def client(self) -> "httpx.Client":
+        if self._client is None:
+            import httpx
+            self._client = httpx.Client()
+        return self._client
+
+    def fetch(self, url: str, timeout: Optional[float] = None) -> bytes:
+        import httpx
+        try:
+            resp = self.client.get(url, timeout=timeout or 20, follow_redirects=True)
+        except httpx.HTTPError as e:
+            raise MediaFetchError(f"获取 {url} 失败：{type(e).__name__}") from e
+        if resp.status_code >= 400:
+            raise MediaFetchError(f"获取 {url} 失败，状态码 {resp.status_code}。", resp.status_code)
+        # 过期链接常返回 200 的错误页面
+        if resp.headers.get("content-type", "").startswith(("text/", "application/json")):
+            raise MediaFetchError(f"获取 {url} 所得内容不是媒体。", resp.status_code, True)
+        return resp.content
+
+    def probe_size(self, data: bytes) -> tuple[int, int]:
+        from PIL import Image
+        return Image.open(open_buffer(data)).size
+
+
+class HeaderProbeMediaBackend(DefaultMediaBackend):
+    '''仅解析文件头读取常见图片格式尺寸的媒体后端'''
+
+    def probe_size(self, data: bytes) -> tuple[int, int]:
+        if (size := probe_image_header(data)) is not None:
+            return size
+        return super().probe_size(data)
+
+
+def probe_image_header(data: bytes) -> Optional[tuple[int, int]]:
+    '''解析 PNG、GIF、BMP、WebP、JPEG 文件头得到图片尺寸，无法识别时返回 None'''
+    try:
+        if data[:8] == b"\x89PNG\r\n\x1a\n":
+            return struct.unpack(">II", data[16:24])
+        if data[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", data[6:10])
+        if data[:2] == b"BM":
+            width, height = struct.unpack("<ii", data[18:26])
+            return width, abs(height)
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            chunk = data[12:16]
+            if chunk == b"VP8 ":
+                width, height = struct.unpack("<HH", data[26:30])
+                return width & 0x3fff, height & 0x3fff
+            if chunk == b"VP8L":
+                bits = int.from_bytes(data[21:25], "little")
+                return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+            if chunk == b"VP8X":
+                return (
+                    int.from_bytes(data[24:27], "little") + 1,
+                    int.from_bytes(data[27:30], "little") + 1
+                )
+            return None
+        if data[:2] == b"\xff\xd8":
+            i = 2
+            while i + 9 < len(data):
+                if data[i] != 0xff:
+                    i += 1
+                    continue
+                marker = data[i + 1]
+                if marker in (0xd8, 0x01) or 0xd0 <= marker <= 0xd7 or marker == 0xff:
+                    i += 1 if marker == 0xff else 2
+                    continue
+                length = struct.unpack(">H", data[i + 2:i + 4])[0]
+                if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+                    height, width = struct.unpack(">HH", data[i + 5:i + 9])
+                    return width, height
+                i += 2 + length
+    except struct.error:
+        pass
+    return None
+
+
+def open_buffer(data: bytes) -> BinaryIO:
+    '''将媒体内容包装为文件对象，文件内存映射直接使用映射本身，不复制内容'''
+    if isinstance(data, memoryview) and isinstance(data.obj, mmap.mmap) and len(data) == len(data.obj):
+        # 每次 map_file 均创建新的映射，读取位置不与其他调用方共享
+        data.obj.seek(0)
+        return data.obj  # type: ignore
+    return BytesIO(data)
+
+def probe_image_format(data: bytes) -> Optional[str]:
+    '''由文件头识别 PNG、GIF、BMP、WebP、JPEG 格式，返回小写格式名，无法识别时返回 None'''
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if data[:2] == b"BM":
+        return "bmp"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[:2] == b"\xff\xd8":
+        return "jpeg"
+    return None
+
+
+class FetchGuard:
+    """
+    网络媒体获取的失败处理，包括 4xx 响应的失败缓存与按主机的熔断。
+
+    :param negative_ttl: 4xx 响应的失败缓存时长，单位秒。
+    :param threshold: 主机连续失败多少次后熔断。
+    :param cooldown: 熔断持续时长，单位秒。
+    """
+
+    def __init__(self, negative_ttl: float, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._negative: TTLCache[str, str] = TTLCache(4096, negative_ttl)
+        self._failures: dict[str, int] = {}
+        self._open_until: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def check(self, url: str):
+        '''url 处于失败缓存或其主机处于熔断时抛出 MediaFetchError'''
+        with self._lock:
+            if (reason := self._negative.get(url)) is not None:
+                raise MediaFetchError(f"{reason}（已缓存的失败）")
+            host = urlsplit(url).netloc
+            if (open_until := self._open_until.get(host)) is not None:
+                if monotonic() < open_until:
+                    raise MediaFetchError(f"主机 {host} 多次获取失败，已暂停请求。")
+                # 熔断到期后放行一次试探，失败则立即再次熔断
+                del self._open_until[host]
+                self._failures[host] = self.threshold - 1
+
+    def record(self, url: str, error: Optional[Exception] = None):
+        '''记录一次获取的结果，error 为 None 表示成功'''
+        host = urlsplit(url).netloc
+        with self._lock:
+            if error is None:
+                self._failures.pop(host, None)
+                return
+            if isinstance(error, MediaFetchError) and error.status is not None and error.status < 500:
+                if error.permanent:
+                    self._negative.set(url, str(error))
+                return
+            failures = self._failures[host] = self._failures.get(host, 0) + 1
+            if failures < self.threshold:
+                return
+            self._open_until[host] = monotonic() + self.cooldown
+            self._failures.pop(host, None)
+        from .utils import logger
+        logger("WARNING", f"主机 {host} 连续 {failures} 次获取媒体失败，{self.cooldown:g} 秒内不再请求。")
+
+    def fetch(self, backend: "MediaBackend", url: str, timeout: Optional[float] = None) -> bytes:
+        self.check(url)
+        try:
+            data = backend.fetch(url, timeout)
+        except Exception as e:
+            self.record(url, e)
+            if isinstance(e, MediaFetchError):
+                raise
+            raise MediaFetchError(f"获取 {url} 失败：{e}") from e
+        self.record(url)
+        return data
+
+
+fetch_guard = FetchGuard(
+    config.sekaiju_media_negative_ttl,
+    config.sekaiju_media_breaker_threshold,
+    config.sekaiju_media_breaker_cooldown
+)
+'''世界树网络媒体获取的失败处理'''
+
+def fetch_media(url: str, timeout: Optional[float] = None) -> bytes:
+    '''经失败处理从 url 地址获取数据，失败时抛出 MediaFetchError'''
+    return fetch_guard.fetch(get_media_backend(), url, timeout)
+
+async def fetch_media_async(url: str, timeout: Optional[float] = None) -> bytes:
+    '''fetch_media 的异步版本，在线程中请求，已知失败时不创建线程直接失败'''
+    fetch_guard.check(url)
+    return await asyncio.get_running_loop().run_in_executor(None, fetch_media, url, timeout)
+
+
+MEDIA_BACKENDS: dict[str, Type[MediaBackend]] = {
+    "default": DefaultMediaBackend,
+    "header": HeaderProbeMediaBackend
+}
+'''可通过配置项选择的媒体后端'''
+
+_media_backend: Optional[MediaBackend] = None
+
+def get_media_backend() -> MediaBackend:
+    '''获取当前媒体后端，首次调用时按配置构建'''
+    global _media_backend
+    if _media_backend is None:
+        if (backend_cls := MEDIA_BACKENDS.get(config.sekaiju_media_backend)) is None:
+            raise ValueError(f"未知的媒体后端 {config.sekaiju_media_backend}。")
+        _media_backend = backend_cls()
+    return _media_backend
+
+def set_media_backend(backend: MediaBackend):
+    '''设置自定义媒体后端'''
+    global _media_backend
+    _media_backend = backend
+
+
+__all__ = [
+    "MediaFetchError",
+    "MediaBackend",
+    "DefaultMediaBackend",
+    "HeaderProbeMediaBackend",
+    "probe_image_header",
+    "open_buffer",
+    "probe_image_format",
+    "FetchGuard",
+    "fetch_guard",
+    "fetch_media",
+    "fetch_media_async",
+    "MEDIA_BACKENDS",
+    "get_media_backend",
+    "set_media_backend"
+]
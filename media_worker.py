@@ -0,0 +1,167 @@
+'''
+世界树媒体工作进程池。
+
+图片尺寸读取、base64 解码与 md5 计算均为 CPU 密集操作，在事件循环线程内处理大图片时将阻塞所有 Bot。
+启用 sekaiju_media_workers 后，超过 sekaiju_media_inline_threshold 字节的内容将交由工作进程处理，
+较小的内容仍直接在事件循环线程内处理，以免进程间传输的开销超过处理本身。
+
+工作进程在 NoneBot 启动时以 fork 方式一次性创建，继承当前进程已导入的模块与媒体后端设置。
+插件需经 NoneBot 初始化方可导入，工作进程无法以 spawn 或 forkserver 方式重新导入处理函数，
+且运行中途在多线程进程内 fork 并不安全，因此不支持 fork 的平台、启动前即提交任务
+或工作进程异常退出后，均改用线程池，此时仅能避免阻塞事件循环，无法利用多核。
+
+未启用时以下异步函数直接在事件循环线程内完成处理，与同步版本行为一致。
+
+以下异步函数亦接受 memoryview，如由 UniMedia.get_view 所得的文件内存映射，
+此时较大的内容在线程中处理，以免为传入工作进程而复制整个文件。
+'''
+
+from typing import (
+    Any,
+    Callable,
+    Optional,
+    TypeVar,
+    Union
+)
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from hashlib import md5
+import multiprocessing
+import binascii
+import asyncio
+
+from .config import config
+from .media import get_media_backend
+
+
+T = TypeVar("T")
+
+
+def _md5_hex(data: bytes) -> str:
+    return md5(data).hexdigest()
+
+def _probe_size(data: bytes) -> tuple[int, int]:
+    return get_media_backend().probe_size(data)
+
+def _b64decode(data: Union[str, bytes]) -> bytes:
+    return binascii.a2b_base64(data)
+
+
+class MediaWorkerPool:
+    """
+    媒体工作进程池，进程在调用 start 时创建。
+
+    :param workers: 工作进程数，为 0 时全部在事件循环线程内处理。
+    :param threshold: 交由工作进程处理的最小字节数。
+    """
+
+    def __init__(self, workers: int, threshold: int):
+        self.workers = workers
+        self.threshold = threshold
+        self._executor: Optional[Executor] = None
+
+    def start(self):
+        '''创建工作进程，应在事件循环开始处理事件前（如 NoneBot 启动时）调用'''
+        if self.workers <= 0 or self._executor is not None:
+            return
+        if "fork" not in multiprocessing.get_all_start_methods():
+            return
+        executor = ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context("fork")
+        )
+        # fork 方式下首次提交任务时即创建全部工作进程，此后不再 fork
+        executor.submit(int)
+        self._executor = executor
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            # 未经 start 创建进程池时不在运行中途 fork，改用线程池
+            self._executor = ThreadPoolExecutor(
+                self.workers,
+                thread_name_prefix="sekaiju_media"
+            )
+        return self._executor
+
+    def should_offload(self, size: int) -> bool:
+        '''给定字节数的内容是否交由工作进程处理'''
+        return self.workers > 0 and size >= self.threshold
+
+    async def run(self, func: Callable[..., T], data: Any, *args) -> T:
+        """
+        处理媒体内容，内容较小或未启用工作进程时直接调用。
+
+        :param func: 处理函数，需为模块级函数以便传入工作进程。
+        :param data: 媒体内容，以其长度判断是否交由工作进程。
+        """
+        if not self.should_offload(len(data)):
+            return func(data, *args)
+        loop = asyncio.get_running_loop()
+        if isinstance(data, memoryview):
+            # 内存映射的内容无法传入工作进程，改在线程中处理，md5 计算与图片解码期间不持有 GIL
+            return await loop.run_in_executor(None, func, data, *args)
+        executor = self.executor
+        try:
+            return await loop.run_in_executor(executor, func, data, *args)
+        except BrokenProcessPool:
+            self._discard(executor)
+            return await loop.run_in_executor(self.executor, func, data, *args)
+
+    async def run_offloaded(self, func: Callable[..., T], data: Any, *args) -> T:
+        """
+        处理媒体内容，始终不在事件循环线程内进行，适用于图片转码等与内容大小关系不大的耗时操作。
+
+        启用工作进程时交由工作进程，未启用或内容为 memoryview 时在线程中处理。
+
+        :param func: 处理函数，需为模块级函数以便传入工作进程。
+        :param data: 媒体内容。
+        """
+        loop = asyncio.get_running_loop()
+        if self.workers <= 0 or isinstance(data, memoryview):
+            return await loop.run_in_executor(None, func, data, *args)
+        executor = self.executor
+        try:
+            return await loop.run_in_executor(executor, func, data, *args)
+        except BrokenProcessPool:
+            self._discard(executor)
+            return await loop.run_in_executor(self.executor, func, data, *args)
+
+    def _discard(self, executor: Executor):
+        '''工作进程异常退出后丢弃进程池，此后改用重新创建的线程池，同一进程池仅丢弃一次'''
+        if self._executor is not executor:
+            return
+        from .utils import logger
+        logger("WARNING", "媒体工作进程异常退出，已改用线程池。")
+        self.shutdown()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+media_pool = MediaWorkerPool(config.sekaiju_media_workers, config.sekaiju_media_inline_threshold)
+'''世界树媒体工作进程池'''
+
+
+async def md5_hex(data: bytes) -> str:
+    '''计算 md5 十六进制摘要'''
+    return await media_pool.run(_md5_hex, data)
+
+async def probe_size(data: bytes) -> tuple[int, int]:
+    '''通过当前媒体后端读取图片尺寸，返回 (宽, 高)'''
+    return await media_pool.run(_probe_size, data)
+
+async def b64decode(data: Union[str, bytes]) -> bytes:
+    '''解码 base64 内容'''
+    return await media_pool.run(_b64decode, data)
+
+
+__all__ = [
+    "MediaWorkerPool",
+    "media_pool",
+    "md5_hex",
+    "probe_size",
+    "b64decode"
+]
@@ -0,0 +1,261 @@
+'''
+世界树运行指标。
+
+通过 instrument 装饰器为转换与分发的热点路径记录调用次数、异常次数与耗时分布，
+启用 sekaiju_trace 时同时交由 tracing 模块记录调用树。
+未启用 sekaiju_metrics 与 sekaiju_trace 时 instrument 将原样返回被装饰函数，不产生任何额外开销。
+
+启用后可在 sekaiju_metrics_host:sekaiju_metrics_port 获取 Prometheus 文本格式的指标，
+并按 sekaiju_metrics_summary_interval 定期通过日志输出摘要。
+'''
+
+from typing import (
+    Any,
+    Callable,
+    Optional,
+    TypeVar
+)
+from inspect import iscoroutinefunction
+from functools import wraps
+from bisect import bisect_left
+from time import perf_counter
+import asyncio
+
+from .config import config
+from .utils import logger
+from .tracing import trace
+
+
+Labels = tuple[tuple[str, str], ...]
+'''指标标签，为 (标签名, 标签值) 的元组'''
+
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+'''默认耗时分布区间上界，单位秒'''
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    items = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        items.append(extra)
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+class Counter:
+    '''计数器指标'''
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.values: dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return lines
+
+
+class Histogram:
+    '''分布指标'''
+
+    def __init__(self, name: str, documentation: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.values: dict[Labels, list[float]] = {}
+        '''各标签对应的 [各区间计数..., 总和, 总数]'''
+
+    def observe(self, value: float, labels: Labels = ()):
+        if (data := self.values.get(labels)) is None:
+            data = self.values[labels] = [0] * (len(self.buckets) + 3)
+        data[bisect_left(self.buckets, value)] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    def quantile(self, q: float, labels: Labels = ()) -> float:
+        '''由区间计数估算分位数，取所在区间上界'''
+        if not (data := self.values.get(labels)) or not data[-1]:
+            return 0
+        target = q * data[-1]
+        count = 0
+        for i, bound in enumerate(self.buckets):
+            count += data[i]
+            if count >= target:
+                return bound
+        return float("inf")
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, data in self.values.items():
+            count = 0
+            for i, bound in enumerate((*self.buckets, "+Inf")):
+                count += data[i]
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(labels, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {data[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {data[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    '''指标注册表'''
+
+    def __init__(self):
+        self.counters: dict[str, Counter] = {}
+        self.histograms: dict[str, Histogram] = {}
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        if (counter := self.counters.get(name)) is None:
+            counter = self.counters[name] = Counter(name, documentation)
+        return counter
+
+    def histogram(self, name: str, documentation: str) -> Histogram:
+        if (histogram := self.histograms.get(name)) is None:
+            histogram = self.histograms[name] = Histogram(name, documentation)
+        return histogram
+
+    def render(self) -> str:
+        '''以 Prometheus 文本格式导出全部指标'''
+        lines: list[str] = []
+        for metric in (*self.counters.values(), *self.histograms.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> list[str]:
+        '''各耗时指标的摘要'''
+        lines = []
+        for histogram in self.histograms.values():
+            for labels, data in histogram.values.items():
+                if not data[-1]:
+                    continue
+                lines.append(
+                    f"{histogram.name}{_format_labels(labels)} 次数 {data[-1]} "
+                    f"平均 {data[-2]/data[-1]*1000:.2f} ms "
+                    f"p50 ≤{histogram.quantile(0.5, labels)*1000:g} ms "
+                    f"p99 ≤{histogram.quantile(0.99, labels)*1000:g} ms"
+                )
+        return lines
+
+
+registry = MetricsRegistry()
+'''世界树指标注册表'''
+
+
+F = TypeVar("F", bound=Callable)
+
+def _get_labels(labels: Optional[Callable[..., dict[str, Any]]], args, kwargs) -> Labels:
+    if labels is None:
+        return ()
+    try:
+        return tuple((k, str(v)) for k, v in labels(*args, **kwargs).items())
+    except Exception:
+        return ()
+
+def instrument(
+    name: str,
+    labels: Optional[Callable[..., dict[str, Any]]] = None
+) -> Callable[[F], F]:
+    """
+    为函数记录调用耗时与异常次数，并在启用追踪时记录为 span。未启用指标与追踪时原样返回被装饰函数。
+
+    :param name: 指标名，将生成 sekaiju_{name}_seconds 与 sekaiju_{name}_errors_total 两项指标，同时作为 span 名称。
+    :param labels: 以被装饰函数参数为参数，返回标签字典的函数，同时作为 span 附加信息。
+    """
+    def decorator(func: F) -> F:
+        func = trace(name, labels)(func)
+        if not config.sekaiju_metrics:
+            return func
+        histogram = registry.histogram(f"sekaiju_{name}_seconds", f"{name} 耗时")
+        errors = registry.counter(f"sekaiju_{name}_errors_total", f"{name} 异常次数")
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                _labels = _get_labels(labels, args, kwargs)
+                start = perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except BaseException:
+                    errors.inc(_labels)
+                    raise
+                finally:
+                    histogram.observe(perf_counter() - start, _labels)
+            return async_wrapper # type: ignore
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            _labels = _get_labels(labels, args, kwargs)
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                errors.inc(_labels)
+                raise
+            finally:
+                histogram.observe(perf_counter() - start, _labels)
+        return wrapper # type: ignore
+    return decorator
+
+
+_server: Optional[asyncio.AbstractServer] = None
+_summary_task: Optional[asyncio.Task] = None
+
+async def _handle_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        body = registry.render().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            + f"Content-Length: {len(body)}\r\n".encode()
+            + b"Connection: close\r\n\r\n"
+            + body
+        )
+        await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def _log_summary(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        if lines := registry.summary():
+            logger("INFO", "世界树运行指标摘要：\n" + "\n".join(lines))
+
+async def start():
+    '''启动指标导出端点与定期摘要'''
+    global _server, _summary_task
+    if config.sekaiju_metrics_port:
+        _server = await asyncio.start_server(
+            _handle_request,
+            config.sekaiju_metrics_host,
+            config.sekaiju_metrics_port
+        )
+        logger("INFO", f"世界树指标导出于 http://{config.sekaiju_metrics_host}:{config.sekaiju_metrics_port}/metrics")
+    if config.sekaiju_metrics_summary_interval:
+        _summary_task = asyncio.create_task(_log_summary(config.sekaiju_metrics_summary_interval))
+
+async def stop():
+    '''关闭指标导出端点与定期摘要'''
+    global _server, _summary_task
+    if _summary_task is not None:
+        _summary_task.cancel()
+        _summary_task = None
+    if _server is not None:
+        _server.close()
+        await _server.wait_closed()
+        _server = None
+
+
+__all__ = [
+    "Counter",
+    "Histogram",
+    "MetricsRegistry",
+    "registry",
+    "instrument"
+]
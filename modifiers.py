@@ -9,6 +9,8 @@ from typing import (
     )
 from typing_extensions import override
 from contextvars import ContextVar
+from weakref import WeakKeyDictionary
+from itertools import groupby
 
 from nonebot.dependencies import Param, Dependent
 from nonebot.internal.params import (
@@ -19,7 +21,8 @@ from nonebot.internal.params import (
 from nonebot.internal.matcher import (
     Matcher,
     current_bot,
-    current_event
+    current_event,
+    current_matcher
 )
 from nonebot.internal.adapter import (
     Bot,
@@ -31,6 +34,7 @@ from nonebot.internal.adapter import (
 
 from .universal.uni_bot import (
     UniBot,
+    get_event_bot_cls,
     check_uni_bot_support,
     check_fake_bot_support
 )
@@ -39,6 +43,7 @@ from .universal.uni_event import (
     check_uni_event_support
 )
 from .universal.uni_message import convert_message
+from .metrics import instrument
 
 
 
@@ -51,6 +56,13 @@ class Modifier(ABC):
         '''对框架代码进行修改'''
 
 
+def _get_checker(param: Param) -> Any:
+    '''获取 Param 的类型检查字段，较新的 NoneBot2 存放于 checker 属性，旧版存放于 extra 中'''
+    if (checker := getattr(param, "checker", None)) is not None:
+        return checker
+    return getattr(param, "extra", {}).get("checker")
+
+
 class ParamModifier(Modifier):
     '''用以包装对 NoneBot2 框架 Param 类进行修改的函数'''
 
@@ -75,7 +87,7 @@ class BotParamModifier(ParamModifier):
             **kwargs: Any
         ) -> None:
             setattr(self, "target_bot_cls", None)
-            if checker := self.extra.get("checker"):
+            if checker := _get_checker(self):
                 # TODO 目前只支持 handler 依赖注入 Bot 仅有单个类型的情况
                 try:
                     if all(
@@ -108,8 +120,23 @@ class BotParamModifier(ParamModifier):
     @classmethod
     @override
     def main(cls):
-        cls.param_cls._check = cls._check_decorator(cls.param_cls._check)
-        cls.param_cls._solve = cls._solve_decorator(cls.param_cls._solve)
+        cls.param_cls._check = instrument("param_check", lambda self, *args, **kwargs: {"param": "bot"})(
+            cls._check_decorator(cls.param_cls._check)
+        )
+        cls.param_cls._solve = instrument("param_solve", lambda self, *args, **kwargs: {"param": "bot"})(
+            cls._solve_decorator(cls.param_cls._solve)
+        )
+
+
+def _export_bot(event_cls: Type[Event], bot: Optional[Bot]) -> Optional[Bot]:
+    '''构造虚假事件时导出消息所用的 Bot，当前 Bot 不属于事件所在平台时构建对应 FakeBot'''
+    if bot is None or (bot_cls := get_event_bot_cls(event_cls)) is None:
+        return None
+    if isinstance(bot, bot_cls):
+        return bot
+    if check_uni_bot_support(bot) and check_fake_bot_support(bot_cls):
+        return getattr(bot_cls, "parse_fake_bot")(getattr(bot, "get_uni_bot")())
+    return None
 
 
 class EventParamModifier(ParamModifier):
@@ -125,7 +152,7 @@ class EventParamModifier(ParamModifier):
             **kwargs: Any
         ) -> None:
             setattr(self, "target_event_cls", None)
-            if checker := self.extra.get("checker"):
+            if checker := _get_checker(self):
                 # TODO 目前只支持 handler 依赖注入 Event 仅有单个类型的情况
                 try:
                     if all(
@@ -160,25 +187,88 @@ class EventParamModifier(ParamModifier):
             **kwargs: Any
         ) -> Any:
             if hasattr(self, "target_event_cls") and getattr(self, "target_event_cls") is not None:
-                return await getattr(cast(Type[Event], getattr(self, "target_event_cls")), "parse_fake_event")(await getattr(event, "get_uni_event")())
+                target_event_cls = cast(Type[Event], getattr(self, "target_event_cls"))
+                return await getattr(target_event_cls, "parse_fake_event")(
+                    await getattr(event, "get_uni_event")(),
+                    _export_bot(target_event_cls, kwargs.get("bot"))
+                )
             return await func(self, event, **kwargs)
         return inner
     
     @classmethod
     @override
     def main(cls):
-        cls.param_cls._check = cls._check_decorator(cls.param_cls._check)
-        cls.param_cls._solve = cls._solve_decorator(cls.param_cls._solve)
+        cls.param_cls._check = instrument("param_check", lambda self, *args, **kwargs: {"param": "event"})(
+            cls._check_decorator(cls.param_cls._check)
+        )
+        cls.param_cls._solve = instrument("param_solve", lambda self, *args, **kwargs: {"param": "event"})(
+            cls._solve_decorator(cls.param_cls._solve)
+        )
 
 # TODO ArgParam 等 Param 需要对消息进行预处理，需要更改
 
 
+_compiled_templates: "WeakKeyDictionary[MessageTemplate, dict[tuple[str, str], MessageTemplate]]" = WeakKeyDictionary()
+'''已编译的消息模板，以原模板与 (目标适配器名称, Bot self_id) 为键，原模板不再被引用时释放'''
+
+@instrument("template_compile")
+async def _compile_template(template: MessageTemplate, target_adapter: str, bot: Bot) -> MessageTemplate:
+    """
+    将其他适配器的消息模板转换为目标适配器的消息模板，模板中的非文本消息段对每个 Bot 仅转换一次。
+
+    转换结果可能与 Bot 相关（如大别野上传图片所得链接），因此按 Bot 分别缓存。
+    """
+    key = (target_adapter, bot.self_id)
+    if (compiled := _compiled_templates.get(template, {}).get(key)) is not None:
+        return compiled
+    factory = cast(Type[Message], template.factory)
+    # 文本消息段原样转换，其中的 {} 字段留待发送时替换；字符串模板仅借空消息得到目标 Message 类
+    converted = cast(Message, await convert_message(
+        message=template.template if isinstance(template.template, Message) else factory(),
+        origin_adapter=getattr(factory, "adapter_name"),
+        target_adapter=target_adapter,
+        target_bot=bot,
+        from_origin_encode=False,
+        to_target_decode=True
+    ))
+    target_template = converted if isinstance(template.template, Message) else template.template
+    compiled = MessageTemplate(target_template, type(converted), template.private_getattr)
+    compiled.format_specs.update(template.format_specs)
+    # 仅在转换成功后写入，转换失败时不留下空条目
+    _compiled_templates.setdefault(template, {})[key] = compiled
+    return compiled
+
+async def _convert_segments(message: Message, target_adapter: str, bot: Bot) -> Message:
+    '''将 Message 中来自其他适配器的消息段（如模板替换值）转换为目标适配器的消息段'''
+    segment_cls = message.get_segment_class()
+    if all(isinstance(seg, segment_cls) for seg in message):
+        return message
+    res = type(message)()
+    # 相邻的同一适配器消息段合并转换
+    for seg_message_cls, segs in groupby(message, lambda seg: seg.get_message_class()):
+        if issubclass(seg_message_cls.get_segment_class(), segment_cls):
+            res.extend(segs)
+            continue
+        if (seg_adapter := getattr(seg_message_cls, "adapter_name", None)) is None:
+            raise ValueError(f"消息类 {seg_message_cls.__name__} 所属适配器不支持转换。")
+        res.extend(cast(Message, await convert_message(
+            message=seg_message_cls(segs),
+            origin_adapter=seg_adapter,
+            target_adapter=target_adapter,
+            target_bot=bot,
+            from_origin_encode=False,
+            to_target_decode=True
+        )))
+    return res
+
+
 class MatcherModifier(Modifier):
     '''修改 NoneBot2 框架 Matcher 类'''
 
     @staticmethod
     def _matcher_send_decorator(func):
         @classmethod
+        @instrument("matcher_send")
         async def inner(
             cls,
             message: Union[str, Message, MessageSegment, MessageTemplate],
@@ -186,6 +276,15 @@ class MatcherModifier(Modifier):
         ) -> Any:
             if isinstance(message, MessageSegment):
                 message = message.get_message_class()(message)
+            if isinstance(message, MessageTemplate) and hasattr(message.factory, "adapter_name"):
+                bot = current_bot.get()
+                target_adapter = bot.adapter.get_name()
+                if getattr(message.factory, "adapter_name") != target_adapter:
+                    compiled = await _compile_template(message, target_adapter, bot)
+                    formatted = compiled.format(**current_matcher.get().state)
+                    # 模板已为目标适配器的消息，仅需转换替换值中其他适配器的消息段
+                    message = await _convert_segments(cast(Message, formatted), target_adapter, bot)
+                    return await func(message, **kwargs)
             if isinstance(message, Message) and hasattr(message, "adapter_name"):
                 msg_adapter = cast(str, getattr(message, "adapter_name"))
                 target_adapter = current_bot.get().adapter.get_name()
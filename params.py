@@ -0,0 +1,38 @@
+'''
+提供可供 handler 依赖注入的世界树参数。
+'''
+
+from typing import Optional
+
+from nonebot.params import Depends
+from nonebot.internal.adapter import Bot, Event
+
+from .universal.models import User
+from .universal.identity import identity_index
+from .utils import ascii_encode
+
+
+async def _uni_user(bot: Bot, event: Event) -> Optional[User]:
+    # 由 UniEvent 导出的 Event 实例带有 uni_event 实例字段（类上的同名字段为 UniEvent 类），此时以来源平台为准
+    uni_event = getattr(event, "uni_event", None)
+    if uni_event is not None and not isinstance(uni_event, type):
+        platform = uni_event.platform
+        user_id = getattr(uni_event, "user_id", None)
+    else:
+        platform = bot.adapter.get_name()
+        try:
+            user_id = ascii_encode(event.get_user_id())
+        except ValueError:
+            user_id = None
+    if platform is None or user_id is None:
+        return None
+    return identity_index.resolve(platform, user_id)
+
+def UniUser() -> Optional[User]:
+    '''事件发送者所绑定的内置 User，未绑定时为 None'''
+    return Depends(_uni_user)
+
+
+__all__ = [
+    "UniUser"
+]
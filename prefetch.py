@@ -0,0 +1,170 @@
+'''
+世界树媒体预取。
+
+启用 sekaiju_prefetch 后，UniMessage.generate 构造出仅有 url 的媒体消息段时，
+将在后台下载其内容，之后导出时 url_to_bytes 可直接取得已下载的内容，
+url_to_bytes_async 遇到仍在预取的 url 时等待其完成，不重复下载。
+
+- 同时进行的下载数受 sekaiju_prefetch_concurrency 限制。
+- 每条消息累计下载字节数受 sekaiju_prefetch_message_budget 限制，超出后不再预取该消息的其余媒体。
+- 已下载内容总量受 sekaiju_prefetch_cache_bytes 限制，超出或超过 sekaiju_prefetch_ttl 未被使用时丢弃。
+
+被丢弃而未使用的字节数将被统计，可据此调整上述配置。
+'''
+
+from typing import Optional
+from collections import OrderedDict
+from time import monotonic
+import asyncio
+
+from .config import config
+from .media import fetch_media_async
+from .metrics import registry
+from .tracing import detach
+
+
+class MediaPrefetcher:
+    """
+    媒体预取器。
+
+    :param concurrency: 同时进行的下载数上限。
+    :param message_budget: 每条消息累计下载的字节数上限。
+    :param max_bytes: 保存已下载内容的总字节数上限。
+    :param ttl: 已下载内容的保存时长，单位秒。
+    """
+
+    def __init__(self, concurrency: int, message_budget: int, max_bytes: int, ttl: float):
+        self.concurrency = concurrency
+        self.message_budget = message_budget
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._data: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+        self._size = 0
+        self._pending: dict[str, asyncio.Future[None]] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._fetched = registry.counter("sekaiju_prefetch_bytes_total", "预取下载的字节数")
+        self._used = registry.counter("sekaiju_prefetch_used_bytes_total", "预取后被使用的字节数")
+        self._unused = registry.counter("sekaiju_prefetch_unused_bytes_total", "预取后未被使用即丢弃的字节数")
+        self._hits = registry.counter("sekaiju_prefetch_hits_total", "导出时命中预取内容的次数")
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    def schedule(self, urls: list[tuple[str, Optional[float]]]):
+        '''在后台依次预取一条消息中的媒体，参数为 (url, 超时时间) 列表'''
+        urls = [(url, timeout) for url, timeout in urls if url not in self._data and url not in self._pending]
+        if not urls:
+            return
+        loop = asyncio.get_running_loop()
+        self._pending.update((url, loop.create_future()) for url, _ in urls)
+        task = asyncio.create_task(self._fetch_message(urls))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch_message(self, urls: list[tuple[str, Optional[float]]]):
+        # 后台预取不计入发起预取的转换调用树
+        detach()
+        budget = self.message_budget
+        try:
+            for url, timeout in urls:
+                if budget <= 0:
+                    break
+                async with self.semaphore:
+                    try:
+                        data = await fetch_media_async(url, timeout)
+                    except Exception as e:
+                        from .utils import logger
+                        logger("DEBUG", f"预取媒体 {url} 失败：{e}")
+                        self._done(url)
+                        continue
+                self._fetched.inc(amount=len(data))
+                budget -= len(data)
+                if budget < 0:
+                    self._unused.inc(amount=len(data))
+                    break
+                self._put(url, data)
+                self._done(url)
+        finally:
+            for url, _ in urls:
+                self._done(url)
+
+    def _done(self, url: str):
+        '''结束 url 的预取，唤醒等待其完成的导出'''
+        if (future := self._pending.pop(url, None)) is not None and not future.done():
+            future.set_result(None)
+
+    def _put(self, url: str, data: bytes):
+        if (old := self._data.pop(url, None)) is not None:
+            self._size -= len(old[0])
+        self._data[url] = (data, monotonic() + self.ttl)
+        self._size += len(data)
+        self._evict()
+
+    def _evict(self):
+        now = monotonic()
+        while self._data:
+            url, (data, expire) = next(iter(self._data.items()))
+            if self._size <= self.max_bytes and expire > now:
+                break
+            del self._data[url]
+            self._size -= len(data)
+            self._unused.inc(amount=len(data))
+
+    def take(self, url: str) -> Optional[bytes]:
+        '''取出已预取的内容，不存在或已过期时返回 None'''
+        if (item := self._data.pop(url, None)) is None:
+            return None
+        data, expire = item
+        self._size -= len(data)
+        if expire <= monotonic():
+            self._unused.inc(amount=len(data))
+            return None
+        self._used.inc(amount=len(data))
+        self._hits.inc()
+        return data
+
+    async def join(self, url: str) -> Optional[bytes]:
+        '''url 正在预取时等待其完成，再取出已预取的内容'''
+        if (future := self._pending.get(url)) is not None:
+            # 等待方被取消时不影响预取本身
+            await asyncio.shield(future)
+        return self.take(url)
+
+    def stats(self) -> dict[str, float]:
+        '''预取统计，未使用字节数不含仍在保存中的内容'''
+        return {
+            "fetched_bytes": self._fetched.values.get((), 0),
+            "used_bytes": self._used.values.get((), 0),
+            "unused_bytes": self._unused.values.get((), 0),
+            "held_bytes": self._size,
+            "hits": self._hits.values.get((), 0)
+        }
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        for url in list(self._pending):
+            self._done(url)
+        self._unused.inc(amount=self._size)
+        self._data.clear()
+        self._size = 0
+
+
+prefetcher = MediaPrefetcher(
+    config.sekaiju_prefetch_concurrency,
+    config.sekaiju_prefetch_message_budget,
+    config.sekaiju_prefetch_cache_bytes,
+    config.sekaiju_prefetch_ttl
+)
+'''世界树媒体预取器'''
+
+
+__all__ = [
+    "MediaPrefetcher",
+    "prefetcher"
+]
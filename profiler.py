@@ -0,0 +1,144 @@
+'''
+世界树启动耗时分析工具。
+
+启用 sekaiju_startup_profile 后，记录插件启动各阶段（及各适配器）的耗时与内存分配，
+记录结束（调用 stop）时通过日志输出按耗时排序的报告，并写入 JSON 文件以便比较不同版本。
+启用延迟激活时，记录持续至首个 Bot 连接并激活代理适配器后，其间仅记录耗时。
+
+本模块仅依赖配置模块，以便在其他模块导入前开始记录。
+'''
+
+from typing import Optional, Iterator
+from dataclasses import dataclass, field, asdict
+from contextlib import contextmanager
+from pathlib import Path
+import tracemalloc
+import json
+import time
+
+from .config import config
+
+
+@dataclass
+class PhaseRecord:
+    '''单个启动阶段的记录'''
+
+    name: str
+    adapter: Optional[str] = None
+    parent: Optional[str] = None
+    '''外层阶段名称'''
+    wall_time: float = 0
+    '''总耗时，单位秒'''
+    self_time: float = 0
+    '''扣除内层阶段后的耗时，单位秒'''
+    allocated: int = 0
+    '''阶段结束时相较开始时新增的内存，单位字节，未追踪内存时为 0'''
+    _start: float = field(default=0, repr=False)
+    _start_memory: int = field(default=0, repr=False)
+    _children_time: float = field(default=0, repr=False)
+
+    @property
+    def label(self) -> str:
+        return self.name if self.adapter is None else f"{self.name}[{self.adapter}]"
+
+
+class StartupProfiler:
+    '''启动耗时记录器，未启用时各方法不做任何事'''
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.records: list[PhaseRecord] = []
+        self._stack: list[PhaseRecord] = []
+        self._started_tracemalloc = False
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def begin(self, name: str, adapter: Optional[str] = None):
+        '''开始记录阶段，需与 end 成对调用'''
+        if not self.enabled:
+            return
+        record = PhaseRecord(
+            name,
+            adapter,
+            self._stack[-1].label if self._stack else None
+        )
+        record._start_memory = tracemalloc.get_traced_memory()[0]
+        record._start = time.perf_counter()
+        self._stack.append(record)
+
+    def end(self):
+        '''结束最近开始的阶段'''
+        if not self.enabled or not self._stack:
+            return
+        record = self._stack.pop()
+        record.wall_time = time.perf_counter() - record._start
+        record.self_time = record.wall_time - record._children_time
+        record.allocated = tracemalloc.get_traced_memory()[0] - record._start_memory
+        if self._stack:
+            self._stack[-1]._children_time += record.wall_time
+        self.records.append(record)
+
+    @contextmanager
+    def phase(self, name: str, adapter: Optional[str] = None) -> Iterator[None]:
+        '''以上下文管理器形式记录阶段'''
+        self.begin(name, adapter)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def report(self, path: Optional[Path] = None):
+        '''输出按自身耗时排序的报告，并写入 JSON 文件'''
+        if not self.enabled:
+            return
+        from .utils import logger, data_path
+        ranked = sorted(self.records, key=lambda r: r.self_time, reverse=True)
+        total = sum(r.self_time for r in self.records)
+        lines = [
+            f"{i:>2}. {r.label:<48} {r.self_time*1000:>8.1f} ms "
+            f"(总 {r.wall_time*1000:.1f} ms) 分配 {r.allocated/1024:.0f} KiB"
+            for i, r in enumerate(ranked, 1)
+        ]
+        logger("INFO", f"世界树启动耗时共 {total*1000:.1f} ms，各阶段如下：\n" + "\n".join(lines))
+        path = path or data_path / "startup_profile.json"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(
+                {
+                    "total": total,
+                    "phases": [
+                        {k: v for k, v in asdict(r).items() if not k.startswith("_")}
+                        for r in ranked
+                    ]
+                },
+                ensure_ascii=False,
+                indent=2
+            ), "utf-8")
+        except OSError as e:
+            logger("WARNING", f"写入启动耗时报告失败：{e}")
+
+    def stop_tracing(self):
+        '''停止内存追踪，此后的阶段仅记录耗时'''
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def stop(self):
+        '''结束记录，输出报告并停止内存追踪，仅首次调用生效'''
+        if not self.enabled:
+            return
+        self.report()
+        self.stop_tracing()
+        self.enabled = False
+
+
+startup_profiler = StartupProfiler(config.sekaiju_startup_profile)
+'''世界树启动耗时记录器'''
+
+
+__all__ = [
+    "PhaseRecord",
+    "StartupProfiler",
+    "startup_profiler"
+]
@@ -0,0 +1,31 @@
+'''
+测试公用设置。
+
+借助 benchmarks/harness 初始化 NoneBot2 并加载世界树插件，工作目录将切换到临时目录。
+插件以所在目录名作为包名加载，测试中通过 sekaiju fixture 按插件内的模块路径导入模块。
+'''
+
+from pathlib import Path
+import importlib
+import sys
+
+import pytest
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+
+import harness
+
+PLUGIN = harness.setup()
+
+
+@pytest.fixture(scope="session")
+def sekaiju():
+    '''按插件内的模块路径导入世界树模块，如 sekaiju("universal.uni_event")'''
+    return lambda name: importlib.import_module(f"{PLUGIN.__name__}.{name}")
+
+
+@pytest.fixture(scope="session")
+def fixtures():
+    '''基准测试所用的合成数据'''
+    return importlib.import_module("fixtures")
@@ -0,0 +1,34 @@
+'''媒体工作进程池的测试'''
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import asyncio
+import os
+
+
+_PARENT = os.getpid()
+
+def _exit_in_worker(data: bytes) -> str:
+    # 在工作进程内直接退出以损坏进程池，回退到线程后正常返回
+    if os.getpid() != _PARENT:
+        os._exit(1)
+    return threading.current_thread().name
+
+
+def test_broken_pool_falls_back_to_recreated_thread_pool(sekaiju):
+    MediaWorkerPool = sekaiju("media_worker").MediaWorkerPool
+    pool = MediaWorkerPool(1, 1)
+    pool.start()
+
+    async def run():
+        return await asyncio.gather(
+            pool.run(_exit_in_worker, b"data"),
+            pool.run_offloaded(_exit_in_worker, b"data")
+        )
+
+    try:
+        names = asyncio.run(run())
+        assert all(name != threading.main_thread().name for name in names)
+        assert isinstance(pool._executor, ThreadPoolExecutor)
+    finally:
+        pool.shutdown()
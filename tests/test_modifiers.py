@@ -0,0 +1,24 @@
+'''依赖注入修改的测试'''
+
+from nonebot.adapters.onebot.v11 import Bot as OneBotv11Bot, GroupMessageEvent
+from nonebot.adapters.villa import Bot as VillaBot
+from nonebot.adapters.villa.event import SendMessageEvent
+
+
+def test_get_event_bot_cls_resolves_through_mro(sekaiju):
+    get_event_bot_cls = sekaiju("universal.uni_bot").get_event_bot_cls
+    assert get_event_bot_cls(SendMessageEvent) is VillaBot
+    assert get_event_bot_cls(GroupMessageEvent) is OneBotv11Bot
+
+
+def test_export_bot_builds_fake_bot_for_other_platform(sekaiju, fixtures):
+    export_bot = sekaiju("modifiers")._export_bot
+    FakeBot = sekaiju("universal.uni_bot").FakeBot
+    onebot_bot = fixtures.onebot_bot()
+    villa_bot = fixtures.villa_bot()
+
+    assert export_bot(SendMessageEvent, villa_bot) is villa_bot
+    assert export_bot(SendMessageEvent, None) is None
+    fake = export_bot(SendMessageEvent, onebot_bot)
+    assert isinstance(fake, VillaBot) and isinstance(fake, FakeBot)
+    assert fake.uni_bot.origin_bot is onebot_bot
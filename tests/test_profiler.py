@@ -0,0 +1,22 @@
+'''启动耗时记录器的测试'''
+
+
+def test_stop_reports_once_and_ends_recording(sekaiju, monkeypatch):
+    StartupProfiler = sekaiju("profiler").StartupProfiler
+    profiler = StartupProfiler(True)
+    reports = []
+    monkeypatch.setattr(profiler, "report", lambda path=None: reports.append(len(profiler.records)))
+
+    with profiler.phase("import"):
+        pass
+    profiler.stop_tracing()
+    # 延迟激活的阶段在停止内存追踪后仍记录耗时
+    with profiler.phase("activate"):
+        pass
+    profiler.stop()
+    profiler.stop()
+    with profiler.phase("after_stop"):
+        pass
+
+    assert reports == [2]
+    assert [record.name for record in profiler.records] == ["import", "activate"]
@@ -0,0 +1,116 @@
+'''UniMessage 与 UniEvent 序列化的测试'''
+
+import asyncio
+import random
+from pathlib import Path
+
+import pytest
+
+
+def _typed(value):
+    '''连同类型比较，区分 True 与 1、"1" 与 1'''
+    if isinstance(value, dict):
+        return {_typed(k): _typed(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_typed(item) for item in value]
+    return type(value).__name__, value
+
+
+def _round_trip_texts(sekaiju, texts):
+    uni_message = sekaiju("universal.uni_message")
+    serialize = sekaiju("universal.serialize")
+    uni_msg = uni_message.UniMessage(None)
+    for text in texts:
+        uni_msg.append(uni_message.UniText("text", None, text))
+    return [uni_ms.text for uni_ms in serialize.loads(serialize.dumps(uni_msg))]
+
+
+@pytest.mark.parametrize("text", ["0", "0123", "00", "", "7", "12345", "9" * 19, "1" + "0" * 19, "１２３"])
+def test_digit_strings_round_trip(sekaiju, text):
+    assert _round_trip_texts(sekaiju, [text]) == [text]
+
+
+def test_long_digit_strings_are_written_as_strings(sekaiju):
+    # 超过 int 位数上限的数字字符串不得转换为整数
+    texts = ["1" * 5000, "9" * 20, "1" * 4301]
+    assert _round_trip_texts(sekaiju, texts) == texts
+
+
+def test_event_extra_round_trip_keeps_types(sekaiju):
+    uni_event = sekaiju("universal.uni_event")
+    uni_message = sekaiju("universal.uni_message")
+    serialize = sekaiju("universal.serialize")
+    nested_message = uni_message.UniMessage(None)
+    nested_message.append(uni_message.UniText("text", None, "嵌套"))
+    extra = {
+        "flags": [True, False, 1, 0, None],
+        "ids": {"0123": "0123", "42": 42, "1" * 30: "1" * 30},
+        "nested": {"list": [{"float": 0.5, "bytes": b"\x00\xff", "negative": -2**70}], "empty": {}},
+        "message": nested_message
+    }
+    event = uni_event.UniGroupMessageEvent.construct(
+        origin_event=None,
+        post_type="message",
+        event_id="1234",
+        time=1700000000,
+        self_id="0001",
+        platform="Villa",
+        extra=extra,
+        message_type="group",
+        message_id="42",
+        user_id="4200",
+        message=uni_message.UniMessage(None),
+        to_me=True,
+        raw_message=None,
+        sub_type="normal",
+        group_id="1" * 25
+    )
+    restored = serialize.loads(serialize.dumps(event))
+    assert type(restored) is uni_event.UniGroupMessageEvent
+    restored_extra = dict(restored.extra)
+    restored_message = restored_extra.pop("message")
+    expected_extra = dict(extra)
+    expected_extra.pop("message")
+    assert _typed(restored_extra) == _typed(expected_extra)
+    assert [uni_ms.text for uni_ms in restored_message] == ["嵌套"]
+    for name in ("event_id", "time", "self_id", "to_me", "group_id", "message_id", "user_id"):
+        assert _typed(getattr(restored, name)) == _typed(getattr(event, name))
+
+
+def test_media_bytes_round_trip_through_temp_file(sekaiju, fixtures):
+    uni_message = sekaiju("universal.uni_message")
+    serialize = sekaiju("universal.serialize")
+    data = fixtures.png(8, 8, random.Random("dumps"))
+    uni_msg = uni_message.UniMessage(None)
+    uni_msg.append(uni_message.UniImage("image", None, _bytes=data))
+    uni_msg.append(uni_message.UniImage("image", None, _url="https://example.com/a.png"))
+    uni_msg.append(uni_message.UniImage("image", None, _path="/tmp/sekaiju_missing.png"))
+    restored = serialize.loads(serialize.dumps(uni_msg))
+    from_bytes, from_url, from_path = restored
+    assert from_bytes._bytes is None and Path(from_bytes._path).read_bytes() == data
+    assert from_url._url == "https://example.com/a.png" and from_url._path is None
+    assert from_path._path == "/tmp/sekaiju_missing.png"
+
+
+def test_dumps_async_writes_media_off_the_loop(sekaiju, fixtures):
+    uni_message = sekaiju("universal.uni_message")
+    serialize = sekaiju("universal.serialize")
+    data = fixtures.png(8, 8, random.Random("dumps_async"))
+    uni_msg = uni_message.UniMessage(None)
+    uni_msg.append(uni_message.UniImage("image", None, _bytes=data))
+    raw = asyncio.run(serialize.dumps_async(uni_msg))
+    (restored,) = serialize.loads(raw)
+    assert Path(restored._path).read_bytes() == data
+
+
+def test_media_hash_does_not_write(sekaiju):
+    serialize = sekaiju("universal.serialize")
+    digest = serialize.media_hash(b"sekaiju media_hash")
+    with pytest.raises(ValueError):
+        serialize.media_hash_path(digest)
+
+
+@pytest.mark.parametrize("raw", [b"", b"SK", b"{}", b"SK\x01\x01\x01\x05\x7f"])
+def test_corrupted_input_raises_value_error(sekaiju, raw):
+    with pytest.raises(ValueError):
+        sekaiju("universal.serialize").loads(raw)
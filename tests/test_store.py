@@ -0,0 +1,86 @@
+'''本地信息存储的测试'''
+
+import asyncio
+import json
+import threading
+
+from nonebot.adapters.villa.event import SendMessageEvent
+
+
+def _room(sekaiju, id: str, name: str):
+    return sekaiju("universal.models").Room(id=id, name=name, platform="villa", is_available=True)
+
+
+def test_store_reads_and_writes_off_the_event_loop(sekaiju, tmp_path):
+    store_module = sekaiju("universal.store")
+    Room = sekaiju("universal.models").Room
+    loop_thread = threading.get_ident()
+    store_threads = set()
+
+    class RecordingStore(store_module.EntityStore):
+        def _write(self, rows, absent_rows):
+            store_threads.add(threading.get_ident())
+            super()._write(rows, absent_rows)
+
+    async def main():
+        store = RecordingStore(tmp_path / "entities.db", batch_size=2)
+        store.put("villa", _room(sekaiju, "1", "大厅"))
+        store.put("villa", _room(sekaiju, "2", "闲聊"))
+        assert not store._pending
+        store.put("villa", _room(sekaiju, "1", ""), replace=False)
+        await store.close()
+
+        store = store_module.EntityStore(tmp_path / "entities.db")
+        assert store.peek(Room, "villa", "1") is None
+        assert (await store.get(Room, "villa", "1")).name == "大厅"
+        store.put("villa", _room(sekaiju, "3", ""), replace=False)
+        # 仅知道 id 的信息不进入内存缓存，但可以读到
+        assert store.peek(Room, "villa", "3") is None
+        assert (await store.get(Room, "villa", "3")).name == ""
+        store.delete(Room, "villa", "2")
+        assert sorted([room.id async for room in store.iter(Room, "villa")]) == ["1", "3"]
+        await store.close()
+
+    asyncio.run(main())
+    assert store_threads and loop_thread not in store_threads
+
+
+def test_villa_room_links_are_collected(sekaiju, monkeypatch, tmp_path):
+    store_module = sekaiju("universal.store")
+    Room = sekaiju("universal.models").Room
+    villa_utils = sekaiju("adapters.villa.utils")
+    store = store_module.EntityStore(tmp_path / "entities.db")
+    monkeypatch.setattr(store_module, "entity_store", store)
+    monkeypatch.setattr(store_module.config, "sekaiju_entity_store", True)
+    event = SendMessageEvent.parse_obj({
+        "robot": {"villa_id": 1001, "template": {"id": "bot_test", "name": "世界树", "icon": ""}},
+        "type": 2,
+        "id": "event",
+        "created_at": 1,
+        "send_at": 1,
+        "extend_data": {"EventData": {"SendMessage": {
+            "content": json.dumps({
+                "content": {"text": "#大厅 ", "entities": [{
+                    "offset": 0,
+                    "length": 4,
+                    "entity": {"type": "villa_room_link", "villa_id": "1001", "room_id": "7"}
+                }]},
+                "user": {"portraitUri": "", "extra": {}, "name": "用户", "alias": "", "id": "5", "portrait": ""}
+            }),
+            "from_user_id": 5,
+            "send_at": 1,
+            "object_name": 1,
+            "room_id": 2002,
+            "nickname": "用户",
+            "msg_uid": "message",
+            "villa_id": 1001
+        }}}
+    })
+
+    store_module.collect_entities(event)
+
+    linked = store.peek(Room, villa_utils.adapter_name, villa_utils.villa_room_id_convert("encode", 1001, 7))
+    assert linked is not None and linked.name == "大厅" and linked.channel_id == "1001"
+    current = villa_utils.villa_room_id_convert("encode", 1001, 2002)
+    assert store.peek(Room, villa_utils.adapter_name, current) is None
+    assert current in {key[2] for key in store._pending_absent}
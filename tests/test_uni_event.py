@@ -0,0 +1,122 @@
+'''UniEvent 逐字段导出的测试'''
+
+import asyncio
+import random
+
+import pytest
+from pydantic import BaseModel, ValidationError, root_validator
+from nonebot.adapters.villa import Bot as VillaBot
+from nonebot.adapters.villa.event import JoinVillaEvent, SendMessageEvent
+
+
+def _join_villa_params() -> dict:
+    return {
+        "robot": {"villa_id": 1001, "template": {"id": "bot_test", "name": "世界树", "icon": ""}},
+        "type": 1,
+        "id": "event",
+        "created_at": 1700000000,
+        "send_at": 1700000000,
+        "join_uid": "123",
+        "join_user_nickname": "用户",
+        "join_at": 0,
+        "villa_id": 1001
+    }
+
+
+def test_export_by_fields_events_have_no_post_root_validators(sekaiju):
+    uni_event = sekaiju("universal.uni_event")
+    event_classes = [
+        cls
+        for classes in uni_event.uni_event_support.values()
+        for cls in classes
+        if getattr(cls, "export_by_fields", False)
+    ]
+    assert SendMessageEvent in event_classes
+    for cls in event_classes:
+        assert not cls.__post_root_validators__
+
+
+def test_add_uni_event_items_rejects_post_root_validators(sekaiju):
+    uni_event = sekaiju("universal.uni_event")
+
+    class PostValidatedEvent(BaseModel):
+        value: int
+
+        @root_validator
+        def check(cls, values):
+            return values
+
+    with pytest.raises(ValueError):
+        uni_event.add_uni_event_items(PostValidatedEvent, uni_event.UniEvent, {}, {}, export_by_fields=True)
+
+
+def test_construct_by_fields_validates_each_field(sekaiju):
+    construct = sekaiju("universal.uni_event")._construct_by_fields
+    event = construct(JoinVillaEvent, _join_villa_params())
+    assert event.join_uid == 123
+    assert event.robot.template.name == "世界树"
+
+
+def test_construct_by_fields_rejects_invalid_and_missing_fields(sekaiju):
+    construct = sekaiju("universal.uni_event")._construct_by_fields
+    params = _join_villa_params()
+    params["join_uid"] = "not a number"
+    with pytest.raises(ValidationError) as info:
+        construct(JoinVillaEvent, params)
+    assert info.value.errors()[0]["loc"] == ("join_uid",)
+
+    params = _join_villa_params()
+    del params["villa_id"]
+    with pytest.raises(ValidationError) as info:
+        construct(JoinVillaEvent, params)
+    assert info.value.errors()[0]["loc"] == ("villa_id",)
+
+
+@pytest.mark.parametrize("kind", ["text", "long_reply", "image_heavy"])
+def test_villa_message_event_round_trip(sekaiju, fixtures, kind):
+    ascii_decode = sekaiju("utils").ascii_decode
+    bot = fixtures.villa_bot()
+    event = fixtures.villa_event(kind, random.Random(kind))
+
+    async def round_trip():
+        return await SendMessageEvent.parse_fake_event(await event.get_uni_event(), bot) # type: ignore
+
+    fake = asyncio.run(round_trip())
+    assert isinstance(fake, SendMessageEvent)
+    assert (fake.villa_id, fake.room_id) == (event.villa_id, event.room_id)
+    # 虚假事件中的 id 均为编码后的 id
+    assert ascii_decode(fake.from_user_id) == str(event.from_user_id)
+    assert fake.get_plaintext() == event.get_plaintext()
+    assert fake.content.content.text == event.get_plaintext()
+    assert fake.content.user.name == event.content.user.name
+
+
+def test_export_robot_from_context_and_export_bot(sekaiju, fixtures):
+    get_context = sekaiju("adapters.villa.context").get_context
+    villa_bot = fixtures.villa_bot()
+    onebot_bot = fixtures.onebot_bot()
+    villa_event = fixtures.villa_event("text", random.Random(0))
+    onebot_event = fixtures.onebot_event("text", random.Random(0), fixtures.ImagePool(random.Random(0), 1))
+    get_context(villa_bot).observe(villa_event)
+
+    async def export(event, bot):
+        return await SendMessageEvent.parse_fake_event(await event.get_uni_event(), bot) # type: ignore
+
+    # 大别野 Bot 导出时使用其上下文中的机器人模板
+    fake = asyncio.run(export(onebot_event, villa_bot))
+    assert fake.robot.template == villa_event.robot.template
+
+    # 虚假 Bot 导出时为来源平台的 Bot，未知名称时以其 id 命名
+    fake = asyncio.run(export(onebot_event, VillaBot.parse_fake_bot(onebot_bot.get_uni_bot()))) # type: ignore
+    assert fake.robot.template.name == fixtures.ONEBOT_SELF_ID
+
+
+def test_find_villa_returns_latest_villa(sekaiju):
+    VillaContext = sekaiju("adapters.villa.context").VillaContext
+    context = VillaContext(16, None)
+    assert context.find_villa(1) is None
+    context.set_nickname(100, 1, "甲")
+    context.set_nickname(200, 2, "乙")
+    context.set_nickname(300, 1, "甲")
+    assert context.find_villa(1) == 300
+    assert context.find_villa(2) == 200
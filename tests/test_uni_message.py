@@ -0,0 +1,109 @@
+'''UniMessage 导出缓存、广播与媒体读取的测试'''
+
+import asyncio
+
+import pytest
+import nonebot
+from nonebot.adapters.onebot.v11 import MessageSegment
+from nonebot.adapters.villa import Adapter as VillaAdapter
+from nonebot.adapters.villa.config import BotInfo
+
+
+def _message(sekaiju, *segments):
+    UniMessage = sekaiju("universal.uni_message").UniMessage
+    uni_msg = UniMessage(None)
+    uni_msg.extend(segments)
+    return uni_msg
+
+
+def test_export_memo_detects_replaced_segment(sekaiju, fixtures, monkeypatch):
+    uni_message = sekaiju("universal.uni_message")
+    monkeypatch.setattr(sekaiju("config").config, "sekaiju_export_cache", True)
+    UniMessageSegment = uni_message.UniMessageSegment
+    bot = fixtures.onebot_bot()
+    uni_msg = _message(sekaiju, UniMessageSegment.text(MessageSegment.text("a"), "a"))
+
+    first = asyncio.run(uni_msg.export(bot.adapter.get_name(), bot))
+    # 替换后的消息段可能复用被回收消息段的 id，缓存须以对象本身判断
+    uni_msg[0] = UniMessageSegment.text(MessageSegment.text("b"), "b")
+    second = asyncio.run(uni_msg.export(bot.adapter.get_name(), bot))
+    assert str(first) == "a" and str(second) == "b"
+
+    uni_msg.clear_export_cache()
+    assert uni_msg._export_memo is None
+
+
+def test_broadcast_exports_bot_dependent_segments_per_bot(sekaiju, fixtures, monkeypatch):
+    uni_message = sekaiju("universal.uni_message")
+    monkeypatch.setattr(sekaiju("config").config, "sekaiju_export_cache", True)
+    UniMessageSegment = uni_message.UniMessageSegment
+    other = fixtures.BenchVillaBot(
+        nonebot.get_adapter(VillaAdapter),
+        "bot_other",
+        BotInfo(bot_id="bot_other", bot_secret="", pub_key=fixtures.VILLA_PUB_KEY)
+    )
+    bots = [fixtures.villa_bot(), other]
+    adapter_name = VillaAdapter.get_name()
+    export_func = uni_message.EXPORT_MAPPING[adapter_name]
+    exported_by = []
+    async def counting(uni_msg, bot=None, *args, **kwargs):
+        exported_by.append(bot.self_id)
+        return await export_func(uni_msg, bot, *args, **kwargs)
+    monkeypatch.setitem(uni_message.EXPORT_MAPPING, adapter_name, counting)
+
+    async def broadcast(uni_msg):
+        exported_by.clear()
+        sent = {}
+        async def send(bot, message, target):
+            sent[bot.self_id] = message
+        await uni_msg.broadcast([(bot, 0) for bot in bots], send)
+        return sent
+
+    at_me = _message(sekaiju, UniMessageSegment.at_me(MessageSegment.text("")))
+    sent = asyncio.run(broadcast(at_me))
+    assert {bot_id: message[0].data["mention_robot"].bot_id for bot_id, message in sent.items()} == {
+        bot.self_id: bot.self_id for bot in bots
+    }
+    assert len(exported_by) == 2
+
+    text = _message(sekaiju, UniMessageSegment.text(MessageSegment.text("a"), "a"))
+    sent = asyncio.run(broadcast(text))
+    assert len(sent) == 2 and exported_by == [bots[0].self_id]
+
+
+def test_sync_media_accessors_do_not_download_on_loop(sekaiju):
+    UniMessageSegment = sekaiju("universal.uni_message").UniMessageSegment
+    image = UniMessageSegment.image(MessageSegment.text(""), url="http://127.0.0.1:9/missing.png")
+
+    async def read():
+        with pytest.raises(ValueError):
+            image.bytes
+        with pytest.raises(ValueError):
+            image.path
+        with pytest.raises(ValueError):
+            image.size
+
+    asyncio.run(read())
+
+
+def test_content_key_is_computed_once_per_segment_and_file(sekaiju, monkeypatch, tmp_path):
+    uni_message = sekaiju("universal.uni_message")
+    UniMessageSegment = uni_message.UniMessageSegment
+    digests = []
+    md5_hex = uni_message.md5_hex
+    async def counting(data):
+        digests.append(len(data))
+        return await md5_hex(data)
+    monkeypatch.setattr(uni_message, "md5_hex", counting)
+    path = tmp_path / "image.png"
+    path.write_bytes(b"image")
+
+    async def keys():
+        image = UniMessageSegment.image(MessageSegment.text(""), bytes=b"image")
+        by_bytes = [await image.get_content_key() for _ in range(2)]
+        by_path = [await UniMessageSegment.image(MessageSegment.text(""), path=path).get_content_key() for _ in range(2)]
+        return by_bytes, by_path
+
+    by_bytes, by_path = asyncio.run(keys())
+    assert by_bytes[0] == by_bytes[1] == by_path[0] == by_path[1]
+    assert len(digests) == 2
@@ -0,0 +1,45 @@
+'''大别野图片上传缓存的测试'''
+
+import asyncio
+import json
+import time
+
+from nonebot.adapters.onebot.v11 import MessageSegment
+
+
+def test_upload_cache_loads_asynchronously_before_upload(sekaiju, monkeypatch, tmp_path):
+    upload = sekaiju("adapters.villa.upload")
+    UniMessageSegment = sekaiju("universal.uni_message").UniMessageSegment
+    image = UniMessageSegment.image(MessageSegment.text(""), bytes=b"image")
+    path = tmp_path / "villa_upload.json"
+    reads = []
+    read = upload.file_io_pool.read
+    async def counting_read(path):
+        reads.append(path)
+        return await read(path)
+    monkeypatch.setattr(upload.file_io_pool, "read", counting_read)
+
+    async def run():
+        key = await image.get_content_key()
+        path.write_text(json.dumps({
+            key: {"url": "https://example.com/image.png", "width": 1, "height": 1, "expire": time.time() + 60}
+        }))
+        cache = upload.UploadCache(path, 16, 60)
+        # 构造时不读取文件
+        assert reads == []
+        async def uploader(data):
+            raise AssertionError("已缓存的图片不应再上传")
+        results = await asyncio.gather(*(cache.upload(image, uploader) for _ in range(3)))
+        await cache.load()
+        return results
+
+    results = asyncio.run(run())
+    assert [uploaded.url for uploaded in results] == ["https://example.com/image.png"] * 3
+    assert reads == [path]
+
+
+def test_upload_cache_without_file_starts_empty(sekaiju, tmp_path):
+    upload = sekaiju("adapters.villa.upload")
+    cache = upload.UploadCache(tmp_path / "missing.json", 16, 60)
+    asyncio.run(cache.load())
+    assert cache.get(b"image") is None
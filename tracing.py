@@ -0,0 +1,229 @@
+'''
+世界树慢转换追踪。
+
+启用 sekaiju_trace 后，经 metrics.instrument 标记的热点路径将记录为调用树（span），
+如 事件 → 映射字段（Item.call）→ 消息转换 → 消息段 → 媒体读取、上传。
+消息段编解码表逐段转换时，每个消息段另记录为一个 span，附带消息段类型。
+后台任务（如媒体预取）应调用 detach，不计入发起者的调用树。
+最外层调用耗时超过 sekaiju_trace_threshold 时，整棵调用树将存入有限长度的环形缓冲区，
+可通过 tracer.dump_json 或 tracer.dump_chrome 导出，后者可在 chrome://tracing 或 Perfetto 中查看。
+
+未启用时 trace 装饰器原样返回被装饰函数，不产生任何额外开销。
+'''
+
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Optional,
+    TypeVar
+)
+from dataclasses import dataclass, field
+from contextlib import nullcontext
+from contextvars import ContextVar
+from inspect import iscoroutinefunction
+from collections import deque
+from functools import wraps
+from pathlib import Path
+from time import perf_counter
+import json
+
+from .config import config
+
+
+@dataclass
+class Span:
+    '''单次调用的追踪记录'''
+
+    name: str
+    attrs: dict[str, Any] = field(default_factory=dict)
+    start: float = 0
+    '''开始时间，为 time.perf_counter 的值'''
+    end: float = 0
+    '''结束时间，为 time.perf_counter 的值'''
+    children: list["Span"] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        '''耗时，单位秒'''
+        return self.end - self.start
+
+    def to_dict(self, origin: Optional[float] = None) -> dict[str, Any]:
+        '''转为字典，时间以相对最外层开始时间的毫秒数表示'''
+        origin = self.start if origin is None else origin
+        return {
+            "name": self.name,
+            "attrs": self.attrs,
+            "start_ms": (self.start - origin) * 1000,
+            "duration_ms": self.duration * 1000,
+            "children": [child.to_dict(origin) for child in self.children]
+        }
+
+
+current_span: ContextVar[Optional[Span]] = ContextVar("sekaiju_current_span", default=None)
+'''当前上下文中正在进行的调用'''
+
+
+class Tracer:
+    """
+    慢转换记录器。
+
+    :param threshold: 最外层调用耗时达到该值时记录，单位秒。
+    :param maxsize: 环形缓冲区保存的调用树数量上限。
+    """
+
+    def __init__(self, threshold: float, maxsize: int):
+        self.threshold = threshold
+        self.traces: deque[Span] = deque(maxlen=maxsize)
+
+    def begin(self, name: str, attrs: dict[str, Any]) -> tuple[Span, Any]:
+        span = Span(name, attrs)
+        if (parent := current_span.get()) is not None:
+            parent.children.append(span)
+        token = current_span.set(span)
+        span.start = perf_counter()
+        return span, token
+
+    def end(self, span: Span, token: Any):
+        span.end = perf_counter()
+        current_span.reset(token)
+        if current_span.get() is None and span.duration >= self.threshold:
+            self.traces.append(span)
+            from .utils import logger
+            logger("INFO", f"{span.name} 耗时 {span.duration*1000:.1f} ms，已记录调用树。")
+
+    def clear(self):
+        self.traces.clear()
+
+    def dump_json(self, path: Optional[Path] = None) -> str:
+        '''以调用树形式导出已记录的慢转换，给定 path 时同时写入文件'''
+        data = json.dumps(
+            [span.to_dict() for span in self.traces],
+            ensure_ascii=False,
+            indent=2,
+            default=str
+        )
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(data, "utf-8")
+        return data
+
+    def dump_chrome(self, path: Optional[Path] = None) -> str:
+        '''以 Chrome Trace Event 格式导出已记录的慢转换，每棵调用树占用一个 tid'''
+        events: list[dict[str, Any]] = []
+        def walk(span: Span, tid: int):
+            events.append({
+                "name": span.name,
+                "cat": "sekaiju",
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": 1,
+                "tid": tid,
+                "args": span.attrs
+            })
+            for child in span.children:
+                walk(child, tid)
+        for tid, span in enumerate(self.traces, 1):
+            walk(span, tid)
+        data = json.dumps({"traceEvents": events}, ensure_ascii=False, default=str)
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(data, "utf-8")
+        return data
+
+
+tracer = Tracer(config.sekaiju_trace_threshold, config.sekaiju_trace_buffer_size)
+'''世界树慢转换记录器'''
+
+
+class _SpanContext:
+    def __init__(self, name: str, attrs: dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self) -> Span:
+        self._span, self._token = tracer.begin(self.name, self.attrs)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._span.attrs["error"] = exc_type.__name__
+        tracer.end(self._span, self._token)
+
+_NULL_SPAN = nullcontext()
+
+def span(name: str, attrs: Optional[dict[str, Any]] = None) -> ContextManager[Optional[Span]]:
+    """
+    将 with 语句块记录为 span。未启用追踪时返回空的上下文管理器。
+
+    :param name: span 名称。
+    :param attrs: span 附加信息。
+    """
+    if not config.sekaiju_trace:
+        return _NULL_SPAN
+    return _SpanContext(name, attrs or {})
+
+def detach():
+    '''使当前上下文不再记录于外层 span 之下，用于后台任务开始时，任务结束后其调用树单独记录'''
+    current_span.set(None)
+
+
+F = TypeVar("F", bound=Callable)
+
+def _get_attrs(attrs: Optional[Callable[..., dict[str, Any]]], args, kwargs) -> dict[str, Any]:
+    if attrs is None:
+        return {}
+    try:
+        return attrs(*args, **kwargs)
+    except Exception:
+        return {}
+
+def trace(
+    name: str,
+    attrs: Optional[Callable[..., dict[str, Any]]] = None
+) -> Callable[[F], F]:
+    """
+    将函数调用记录为 span。未启用追踪时原样返回被装饰函数。
+
+    :param name: span 名称。
+    :param attrs: 以被装饰函数参数为参数，返回 span 附加信息的函数。
+    """
+    def decorator(func: F) -> F:
+        if not config.sekaiju_trace:
+            return func
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                span, token = tracer.begin(name, _get_attrs(attrs, args, kwargs))
+                try:
+                    return await func(*args, **kwargs)
+                except BaseException as e:
+                    span.attrs["error"] = type(e).__name__
+                    raise
+                finally:
+                    tracer.end(span, token)
+            return async_wrapper # type: ignore
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            span, token = tracer.begin(name, _get_attrs(attrs, args, kwargs))
+            try:
+                return func(*args, **kwargs)
+            except BaseException as e:
+                span.attrs["error"] = type(e).__name__
+                raise
+            finally:
+                tracer.end(span, token)
+        return wrapper # type: ignore
+    return decorator
+
+
+__all__ = [
+    "Span",
+    "Tracer",
+    "tracer",
+    "trace",
+    "span",
+    "detach",
+    "current_span"
+]
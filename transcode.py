@@ -0,0 +1,231 @@
+'''
+世界树媒体转码。
+
+各适配器可通过 set_media_profile 声明目标平台的媒体限制（最大尺寸、最大字节数、可接受格式），
+导出图片时经 transcode_media 检查，仅在超出限制时缩放或重新编码，其余情况原样发送。
+
+检查仅解析文件头。转码启用媒体工作进程时交由工作进程完成，未启用时在线程中进行，均不阻塞事件循环。
+转码结果以 (内容标识, 媒体限制) 为键缓存并存放于临时目录，同一图片对同一平台仅转码一次。
+内容标识由消息段计算一次后保留，命中缓存时无需再读取或摘要图片内容。
+
+目前仅转码图片，音频与视频原样发送。
+'''
+
+from typing import Optional, Union, Type, Any
+from dataclasses import dataclass, astuple
+from hashlib import md5
+from pathlib import Path
+from io import BytesIO
+
+from nonebot.internal.adapter import Adapter
+
+from .cache import TTLCache, SingleFlight
+from .config import config
+from .file_io import file_io_pool
+from .media import get_media_backend, open_buffer, probe_image_header, probe_image_format
+from .media_worker import media_pool
+from .metrics import instrument
+from .universal.uni_message import UniMedia, UniImage
+from .utils import temp_data_path
+
+
+@dataclass(frozen=True)
+class MediaProfile:
+    '''目标平台的图片限制，各项留空则不限制'''
+
+    max_width: Optional[int] = None
+    max_height: Optional[int] = None
+    max_bytes: Optional[int] = None
+    formats: tuple[str, ...] = ()
+    '''可接受的图片格式，为小写格式名，按偏好排列。需转换格式时使用首个格式'''
+
+    @property
+    def key(self) -> str:
+        '''用于区分转码结果的短键'''
+        return md5(repr(astuple(self)).encode()).hexdigest()[:8]
+
+    def accepts(self, data: bytes) -> bool:
+        '''图片是否满足限制'''
+        if self.max_bytes is not None and len(data) > self.max_bytes:
+            return False
+        if self.formats and probe_image_format(data) not in self.formats:
+            return False
+        if self.max_width is None and self.max_height is None:
+            return True
+        width, height = probe_image_header(data) or get_media_backend().probe_size(data)
+        if self.max_width is not None and width > self.max_width:
+            return False
+        if self.max_height is not None and height > self.max_height:
+            return False
+        return True
+
+
+def _accepts(data: bytes, profile: MediaProfile) -> bool:
+    return profile.accepts(data)
+
+
+_QUALITY_STEPS = (85, 70, 55)
+_MAX_ATTEMPTS = 8
+
+def _encode(frames: list, fmt: str, scale: float, quality: int, info: dict[str, Any]) -> bytes:
+    from PIL import Image
+    if scale < 1:
+        # 调色板图片以最近邻缩放，保留调色板，避免保存 GIF 时重新量化
+        frames = [
+            frame.resize(
+                (max(1, int(frame.width * scale)), max(1, int(frame.height * scale))),
+                Image.NEAREST if frame.mode == "P" else Image.LANCZOS
+            )
+            for frame in frames
+        ]
+    if fmt == "jpeg":
+        frames = [frame.convert("RGB") for frame in frames]
+    out = BytesIO()
+    kwargs: dict[str, Any] = {}
+    if fmt in ("jpeg", "webp"):
+        kwargs["quality"] = quality
+    if len(frames) > 1:
+        kwargs.update(
+            save_all=True,
+            append_images=frames[1:],
+            duration=info.get("duration", 100),
+            loop=info.get("loop", 0)
+        )
+    frames[0].save(out, format=fmt.upper(), **kwargs)
+    return out.getvalue()
+
+def _transcode(data: bytes, profile: MediaProfile) -> tuple[bytes, str]:
+    '''按限制缩放并重新编码图片，返回 (内容, 格式)'''
+    from PIL import Image, ImageSequence
+    image = Image.open(open_buffer(data))
+    fmt = (image.format or "").lower()
+    if profile.formats and fmt not in profile.formats:
+        fmt = profile.formats[0]
+    # 仅在目标格式支持动图时保留全部帧，否则取首帧
+    if getattr(image, "is_animated", False) and fmt in ("gif", "webp"):
+        frames = [frame.copy() for frame in ImageSequence.Iterator(image)]
+    else:
+        frames = [image.copy()]
+    scale = 1.0
+    if profile.max_width is not None:
+        scale = min(scale, profile.max_width / image.width)
+    if profile.max_height is not None:
+        scale = min(scale, profile.max_height / image.height)
+    quality_index = 0
+    for _ in range(_MAX_ATTEMPTS):
+        out = _encode(frames, fmt, scale, _QUALITY_STEPS[quality_index], image.info)
+        if profile.max_bytes is None or len(out) <= profile.max_bytes:
+            break
+        # 依次尝试降低质量、改用 JPEG、缩小尺寸
+        if fmt in ("jpeg", "webp") and quality_index + 1 < len(_QUALITY_STEPS):
+            quality_index += 1
+        elif fmt not in ("jpeg", "webp") and len(frames) == 1 and (not profile.formats or "jpeg" in profile.formats):
+            fmt = "jpeg"
+        else:
+            # 体积约与像素数成正比，按超出比例估算缩放
+            scale *= min(0.9, (profile.max_bytes / len(out)) ** 0.5)
+    return out, fmt
+
+
+_UNCHANGED = Path()
+
+class VariantStore:
+    """
+    图片转码结果缓存，以 (内容标识, 媒体限制) 为键，内容标识见 UniMedia.get_content_key.
+
+    转码结果存放于 path 目录，文件名由键决定，重启后仍可复用。
+    内存中另记录无需转码的图片，避免重复检查。
+
+    :param path: 转码结果存放目录。
+    :param maxsize: 内存缓存条目上限。
+    """
+
+    def __init__(self, path: Path, maxsize: int):
+        self.path = path
+        self._cache: TTLCache[tuple[str, str], Path] = TTLCache(maxsize)
+        self._flight: SingleFlight[tuple[str, str], Path] = SingleFlight()
+
+    async def get(self, image: UniMedia, profile: MediaProfile) -> Optional[Path]:
+        '''获取满足限制的图片文件路径，无需转码时返回 None'''
+        key = (await image.get_content_key(), profile.key)
+        if (path := self._cache.get(key)) is None:
+            path = await self._flight.do(key, lambda: self._make(key, image, profile))
+        return None if path is _UNCHANGED else path
+
+    def _find(self, name: str) -> Optional[Path]:
+        return next(self.path.glob(f"{name}.*"), None) if self.path.exists() else None
+
+    async def _make(self, key: tuple[str, str], image: UniMedia, profile: MediaProfile) -> Path:
+        name = f"{key[0]}_{key[1]}"
+        existing = await file_io_pool.run(self._find, name)
+        if existing is not None:
+            path = existing.absolute()
+        # 文件头无法解析时需解码图片读取尺寸，较大图片交由媒体工作进程池
+        elif await media_pool.run(_accepts, data := await image.get_view(), profile):
+            path = _UNCHANGED
+        else:
+            out, fmt = await media_pool.run_offloaded(_transcode, data, profile)
+            path = await file_io_pool.write(self.path / f"{name}.{fmt}", out)
+        self._cache.set(key, path)
+        return path
+
+
+variant_store = VariantStore(temp_data_path / "variants", config.sekaiju_media_variant_cache_size)
+'''世界树图片转码结果缓存'''
+
+
+MEDIA_PROFILES: dict[str, MediaProfile] = {}
+'''各适配器的媒体限制，以适配器名称为键'''
+
+def set_media_profile(adapter: Union[str, Adapter, Type[Adapter]], profile: MediaProfile):
+    '''设定适配器的媒体限制，重复设定时覆盖'''
+    adapter_name = adapter if isinstance(adapter, str) else adapter.get_name()
+    MEDIA_PROFILES[adapter_name] = profile
+
+def get_media_profile(adapter: Union[str, Adapter, Type[Adapter]]) -> Optional[MediaProfile]:
+    '''获取适配器的媒体限制，未设定时返回 None'''
+    adapter_name = adapter if isinstance(adapter, str) else adapter.get_name()
+    return MEDIA_PROFILES.get(adapter_name)
+
+
+@instrument("media_transcode", lambda uni_ms, adapter: {"type": uni_ms.type})
+async def transcode_media(
+    uni_ms: UniMedia,
+    adapter: Union[str, Adapter, Type[Adapter]]
+) -> UniMedia:
+    """
+    按目标适配器的媒体限制处理媒体，返回可直接发送的消息段，无需处理时返回原消息段。
+
+    将读取媒体内容，仅有 url 时会下载，调用方可按需在媒体已在本地时才调用。
+
+    :param uni_ms: 需要导出的媒体消息段。
+    :param adapter: 目标适配器类、实例或名称。
+    """
+    if not config.sekaiju_media_transcode or not isinstance(uni_ms, UniImage):
+        return uni_ms
+    if (profile := get_media_profile(adapter)) is None:
+        return uni_ms
+    if (path := await variant_store.get(uni_ms, profile)) is None:
+        return uni_ms
+    variant = UniImage(
+        "image",
+        uni_ms.origin_ms,
+        path,
+        cache=uni_ms.cache,
+        proxy=uni_ms.proxy,
+        timeout=uni_ms.timeout
+    )
+    # 转码结果由原图与媒体限制决定，以二者的组合作为其内容标识，无需再摘要转码结果
+    variant._content_key = path.stem
+    return variant
+
+
+__all__ = [
+    "MediaProfile",
+    "VariantStore",
+    "variant_store",
+    "MEDIA_PROFILES",
+    "set_media_profile",
+    "get_media_profile",
+    "transcode_media"
+]
@@ -0,0 +1,251 @@
+'''
+消息段编解码表。
+
+各适配器通过 SegmentCodec 按消息段类型注册转换函数，代替逐个比较类型的 if/elif 判断：
+
+- 生成函数以原消息段的 type 字符串为键，将原消息段转为 UniMessageSegment.
+- 导出函数以 UniMessageSegment 类为键，将其转为目标消息段。
+  查找时按 MRO 匹配最近的已注册父类，结果按类缓存。
+
+转换函数可为同步或异步函数，返回 None 时跳过该消息段。
+媒体消息段的导出函数可声明目标可接受的表示，再通过 UniMedia.resolve 获取开销最低的已有表示。
+导出结果与具体 Bot 相关的导出函数（如 @ 机器人）需声明 bot_dependent，广播时将按 Bot 分别导出。
+第三方插件可通过 get_codec 取得适配器的编解码表，为新的消息段类型注册转换函数：
+
+    @get_codec("OneBot V11").generator("face")
+    def _(ms, bot, encode, **kwargs):
+        ...
+'''
+
+from typing import (
+    Any,
+    Callable,
+    Optional,
+    Sequence,
+    Type,
+    Union
+)
+from contextlib import nullcontext
+from inspect import iscoroutinefunction
+
+from nonebot.internal.adapter import Adapter, Message, Bot
+
+from .uni_message import (
+    UniMessage,
+    UniMessageSegment,
+    UniText,
+    UniMedia,
+    UniImage,
+    UniVoice,
+    UniVideo,
+    MediaRepr
+)
+from ..config import config
+from ..media import MediaFetchError
+from ..tracing import span
+
+
+_NULL_SPAN = nullcontext()
+
+
+SegmentGenerator = Callable[..., Any]
+'''
+消息段生成函数，参数为 (ms, bot, encode, **kwargs)，
+返回 UniMessageSegment 或 None，可为异步函数
+'''
+
+SegmentExporter = Callable[..., Any]
+'''
+消息段导出函数，参数为 (uni_ms, bot, decode, **kwargs)，
+返回目标 MessageSegment 或 None，可为异步函数
+'''
+
+_Handler = tuple[Callable[..., Any], bool]
+
+
+class SegmentCodec:
+    """
+    单个适配器的消息段编解码表。
+
+    :param adapter: 对应的 adapter 类或实例，或对应名称字符串。
+    :param message_cls: 对应适配器的 Message 类。
+    :param default_generator: 原消息段类型未注册时使用的生成函数，留空则跳过该消息段。
+    """
+
+    def __init__(
+        self,
+        adapter: Union[str, Adapter, Type[Adapter]],
+        message_cls: Type[Message],
+        default_generator: Optional[SegmentGenerator] = None
+    ):
+        self.adapter_name = adapter if isinstance(adapter, str) else adapter.get_name()
+        self.message_cls = message_cls
+        self.generators: dict[str, _Handler] = {}
+        self.exporters: dict[Type[UniMessageSegment], _Handler] = {}
+        self.media_accepts: dict[Type[UniMessageSegment], tuple[MediaRepr, ...]] = {}
+        self.bot_dependent: set[Type[UniMessageSegment]] = set()
+        self._resolved: dict[type, Optional[_Handler]] = {}
+        self._resolved_bot_dependent: dict[type, bool] = {}
+        self._default_generator: Optional[_Handler] = None
+        if default_generator is not None:
+            self.set_default_generator(default_generator)
+        SEGMENT_CODECS[self.adapter_name] = self
+
+    def generator(self, *types: str) -> Callable[[SegmentGenerator], SegmentGenerator]:
+        '''注册原消息段 type 对应的生成函数，重复注册时覆盖'''
+        def decorator(func: SegmentGenerator) -> SegmentGenerator:
+            for ms_type in types:
+                self.generators[ms_type] = (func, iscoroutinefunction(func))
+            return func
+        return decorator
+
+    def exporter(
+        self,
+        *classes: Type[UniMessageSegment],
+        accepts: Sequence[MediaRepr] = (),
+        bot_dependent: bool = False
+    ) -> Callable[[SegmentExporter], SegmentExporter]:
+        """
+        注册 UniMessageSegment 类对应的导出函数，重复注册时覆盖。
+
+        :param classes: 导出函数对应的 UniMessageSegment 类。
+        :param accepts: 媒体消息段导出时目标可接受的表示，按目标侧开销由低到高排列。
+        :param bot_dependent: 导出结果是否与具体 Bot 相关，如 @ 机器人时使用该 Bot 的 id 与名称。
+        """
+        def decorator(func: SegmentExporter) -> SegmentExporter:
+            for cls in classes:
+                self.exporters[cls] = (func, iscoroutinefunction(func))
+                if accepts:
+                    self.media_accepts[cls] = tuple(accepts)
+                if bot_dependent:
+                    self.bot_dependent.add(cls)
+                else:
+                    self.bot_dependent.discard(cls)
+            self._resolved.clear()
+            self._resolved_bot_dependent.clear()
+            return func
+        return decorator
+
+    def set_default_generator(self, func: SegmentGenerator):
+        self._default_generator = (func, iscoroutinefunction(func))
+
+    def accepts(self, cls: type) -> tuple[MediaRepr, ...]:
+        '''获取 UniMessageSegment 类导出时目标可接受的表示，按 MRO 查找，未声明时为空'''
+        for base in cls.__mro__:
+            if (accepts := self.media_accepts.get(base)) is not None:
+                return accepts
+        return ()
+
+    def depends_on_bot(self, uni_msg: UniMessage) -> bool:
+        '''UniMessage 的导出结果是否与具体 Bot 相关，按 MRO 查找各消息段的导出函数'''
+        resolved = self._resolved_bot_dependent
+        for uni_ms in uni_msg:
+            if (dependent := resolved.get(cls := type(uni_ms))) is None:
+                base = next((base for base in cls.__mro__ if base in self.exporters), None)
+                dependent = resolved[cls] = base in self.bot_dependent
+            if dependent:
+                return True
+        return False
+
+    def _resolve_exporter(self, cls: type) -> Optional[_Handler]:
+        handler = None
+        for base in cls.__mro__:
+            if (handler := self.exporters.get(base)) is not None:
+                break
+        self._resolved[cls] = handler
+        return handler
+
+    async def generate(
+        self,
+        ori_msg: Message,
+        bot: Optional[Bot] = None,
+        encode: bool = True,
+        **kwargs
+    ) -> UniMessage:
+        '''将原 Message 逐段转为 UniMessage'''
+        res = UniMessage(ori_msg)
+        generators = self.generators
+        default = self._default_generator
+        tracing = config.sekaiju_trace
+        for ms in ori_msg:
+            if (handler := generators.get(ms.type, default)) is None:
+                continue
+            func, is_async = handler
+            with span("segment_generate", {"segment": ms.type}) if tracing else _NULL_SPAN:
+                uni_ms = await func(ms, bot, encode, **kwargs) if is_async else func(ms, bot, encode, **kwargs)
+            if uni_ms is not None:
+                res.append(uni_ms)
+        return res
+
+    async def export(
+        self,
+        uni_msg: UniMessage,
+        bot: Optional[Bot] = None,
+        decode: bool = True,
+        **kwargs
+    ) -> Message:
+        '''将 UniMessage 逐段导出为目标 Message'''
+        res = self.message_cls()
+        resolved = self._resolved
+        tracing = config.sekaiju_trace
+        for uni_ms in uni_msg:
+            if (handler := resolved.get(type(uni_ms), False)) is False:
+                handler = self._resolve_exporter(type(uni_ms))
+            if handler is None:
+                continue
+            func, is_async = handler
+            with span("segment_export", {"segment": uni_ms.type}) if tracing else _NULL_SPAN:
+                try:
+                    ms = await func(uni_ms, bot, decode, **kwargs) if is_async else func(uni_ms, bot, decode, **kwargs)
+                except MediaFetchError as e:
+                    if not isinstance(uni_ms, UniMedia) or not config.sekaiju_media_placeholder:
+                        raise
+                    from ..utils import logger
+                    logger("WARNING", f"媒体获取失败，以文本占位代替：{e}")
+                    ms = await self._export_placeholder(uni_ms, bot, decode, **kwargs)
+            if ms is not None:
+                res.append(ms)
+        return res
+
+    async def _export_placeholder(self, uni_ms: UniMedia, bot: Optional[Bot], decode: bool, **kwargs) -> Any:
+        '''以文本占位代替无法获取的媒体，目标适配器无法导出文本时返回 None'''
+        placeholder = next(
+            (text for cls, text in MEDIA_PLACEHOLDERS if isinstance(uni_ms, cls)),
+            "[媒体]"
+        )
+        if (handler := self._resolved.get(UniText, False)) is False:
+            handler = self._resolve_exporter(UniText)
+        if handler is None:
+            return None
+        func, is_async = handler
+        uni_text = UniText("text", uni_ms.origin_ms, placeholder)
+        return await func(uni_text, bot, decode, **kwargs) if is_async else func(uni_text, bot, decode, **kwargs)
+
+
+MEDIA_PLACEHOLDERS: tuple[tuple[Type[UniMedia], str], ...] = (
+    (UniImage, "[图片]"),
+    (UniVoice, "[语音]"),
+    (UniVideo, "[视频]")
+)
+'''媒体获取失败时代替其导出的文本'''
+
+
+SEGMENT_CODECS: dict[str, SegmentCodec] = {}
+'''各适配器的消息段编解码表，以适配器名称为键'''
+
+def get_codec(adapter: Union[str, Adapter, Type[Adapter]]) -> SegmentCodec:
+    '''获取适配器的消息段编解码表'''
+    adapter_name = adapter if isinstance(adapter, str) else adapter.get_name()
+    if (codec := SEGMENT_CODECS.get(adapter_name)) is None:
+        raise ValueError(f"适配器 {adapter_name} 未设定消息段编解码表。")
+    return codec
+
+
+__all__ = [
+    "SegmentGenerator",
+    "SegmentExporter",
+    "SegmentCodec",
+    "MEDIA_PLACEHOLDERS",
+    "SEGMENT_CODECS",
+    "get_codec"
+]
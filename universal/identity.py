@@ -0,0 +1,122 @@
+'''
+提供跨平台用户身份索引。
+
+以 (平台名, 编码后的平台用户 id) 为键，在 O(1) 时间内查找对应的内置 User.
+User 与各平台账号的绑定关系记录在 User.platform_data 中，并通过本地信息存储持久化。
+已存储的 User 在启动时由 load 异步载入，查找时不访问数据库。
+'''
+
+from typing import Any, Optional, Iterable
+
+from .models import User, PlatformUserData
+from .store import entity_store
+from ..utils import ascii_encode, Encoded
+
+
+IDENTITY_PLATFORM = "sekaiju"
+'''内置 User 在本地信息存储中所使用的平台名'''
+
+
+class IdentityIndex:
+    '''跨平台用户身份索引'''
+
+    def __init__(self):
+        self._users: dict[str, User] = {}
+        self._bindings: dict[tuple[str, Encoded], str] = {}
+        self._loaded = False
+
+    async def load(self):
+        '''从本地信息存储载入已存储的 User，载入前已添加的 User 不被覆盖'''
+        if self._loaded:
+            return
+        self._loaded = True
+        async for user in entity_store.iter(User, IDENTITY_PLATFORM):
+            if user.id not in self._users:
+                self._add(user)
+
+    def _add(self, user: User):
+        self._users[user.id] = user
+        for platform, data in user.platform_data.items():
+            self._bindings[(platform, ascii_encode(data.id))] = user.id
+
+    def _save(self, user: User):
+        entity_store.put(IDENTITY_PLATFORM, user.copy(deep=True))
+
+    def resolve(self, platform: str, user_id: Encoded) -> Optional[User]:
+        '''以平台名与编码后的平台用户 id 查找对应 User，未绑定时返回 None'''
+        if (uid := self._bindings.get((platform, user_id))) is None:
+            return None
+        return self._users.get(uid)
+
+    def get_user(self, id: str) -> Optional[User]:
+        '''以内置用户 id 获取 User'''
+        return self._users.get(id)
+
+    def add_user(self, user: User):
+        '''添加或更新 User，并按其 platform_data 建立绑定'''
+        if (old := self._users.get(user.id)) is not None:
+            for platform, data in old.platform_data.items():
+                self._bindings.pop((platform, ascii_encode(data.id)), None)
+        for platform, data in user.platform_data.items():
+            self._unbind(platform, ascii_encode(data.id), keep=user.id)
+        self._add(user)
+        self._save(user)
+
+    def remove_user(self, id: str):
+        '''移除 User 及其全部绑定'''
+        if (user := self._users.pop(id, None)) is None:
+            return
+        for platform, data in user.platform_data.items():
+            self._bindings.pop((platform, ascii_encode(data.id)), None)
+        entity_store.delete(User, IDENTITY_PLATFORM, id)
+
+    def bind(self, user_id: str, platform: str, data: PlatformUserData):
+        """
+        将平台账号绑定到 User.
+
+        若该平台账号已绑定其他 User，或该 User 已绑定同平台其他账号，原绑定将被解除。
+
+        :param user_id: 内置用户 id.
+        :param platform: 平台名。
+        :param data: 平台用户信息，其中 id 为平台原 id.
+        """
+        if (user := self._users.get(user_id)) is None:
+            raise ValueError(f"内置用户 {user_id} 不存在。")
+        key = (platform, ascii_encode(data.id))
+        self._unbind(*key, keep=user_id)
+        if (old := user.platform_data.get(platform)) is not None:
+            self._bindings.pop((platform, ascii_encode(old.id)), None)
+        user.platform_data[platform] = data
+        self._bindings[key] = user_id
+        self._save(user)
+
+    def unbind(self, platform: str, user_id: Encoded):
+        '''解除平台账号的绑定'''
+        self._unbind(platform, user_id)
+
+    def _unbind(self, platform: str, user_id: Encoded, keep: Optional[str] = None):
+        if (uid := self._bindings.get((platform, user_id))) is None or uid == keep:
+            return
+        del self._bindings[(platform, user_id)]
+        if (user := self._users.get(uid)) is not None:
+            user.platform_data.pop(platform, None)
+            self._save(user)
+
+    def export_bindings(self) -> list[dict[str, Any]]:
+        '''导出全部 User 及其绑定，可直接序列化为 JSON'''
+        return [user.dict() for user in self._users.values()]
+
+    def import_bindings(self, users: Iterable[Any]):
+        '''批量导入 User 及其绑定，冲突的绑定以后导入者为准'''
+        for user in users:
+            self.add_user(user if isinstance(user, User) else User.parse_obj(user))
+
+
+identity_index = IdentityIndex()
+'''世界树用户身份索引实例'''
+
+
+__all__ = [
+    "IdentityIndex",
+    "identity_index"
+]
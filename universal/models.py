@@ -11,6 +11,8 @@ class PlatformUserData(BaseModel):
     '''平台用户 id'''
     name: str
     '''平台用户昵称'''
+    avatar: Optional[str] = None
+    '''平台用户头像链接'''
 
 class User(BaseModel):
     '''用户信息模型'''
@@ -26,7 +28,7 @@ class User(BaseModel):
     platform_data: dict[str, PlatformUserData] = {}
     '''用户各平台信息'''
 
-# TODO 后续可通过本地存储群聊、频道、房间信息满足其他需求
+# 群聊、频道、房间信息可通过 store.entity_store 本地存储
 class Group(BaseModel):
     '''群聊信息模型'''
 
@@ -52,4 +54,6 @@ class Room(BaseModel):
     id: str
     name: str
     platform: str
-    is_available: bool
\ No newline at end of file
+    is_available: bool
+    channel_id: Optional[str] = None
+    '''所属频道 id'''
\ No newline at end of file
@@ -0,0 +1,374 @@
+'''
+UniMessage 与 UniEvent 的紧凑二进制序列化。
+
+用于在进程间传递或持久化转换结果（如转发队列），格式如下：
+
+- 头部为 MAGIC、格式版本号与内容类别各一字节。
+- 值以一字节标记开头，整数为 zigzag 变长整数，字符串与 bytes 以变长整数长度开头。
+  不以 0 开头且不超过 19 位的纯数字字符串（如各平台 id 与编码后的 id）写为变长整数。
+- 消息段以一字节类型编号为标识，不在编号表中的类型写入类型名，
+  字段按 dataclass 声明顺序依次写入，不含字段名。
+- UniEvent 以类名为标识，字段按 pydantic 声明顺序依次写入，不含字段名。
+- 媒体的 bytes 内容不写入，而是存入临时目录并以其 md5 引用，反序列化时还原为该文件路径。
+  path 与 url 照原样写入，由 url 下载所得的内容不写入。
+  dumps 同步写入媒体文件，事件循环内应使用 dumps_async，交由文件读写线程池写入。
+
+原消息、原消息段与原事件无法序列化，反序列化后均为 None.
+UniEvent 反序列化时通过 construct 构造，不再进行校验。
+'''
+
+from typing import (
+    Any,
+    Type,
+    Union
+)
+from dataclasses import fields
+from hashlib import md5
+from io import BytesIO
+from pathlib import Path
+import asyncio
+import struct
+
+from .uni_message import UniMessage, UniMessageSegment, UniMedia, uni_ms_mapping
+from .uni_event import UniEvent
+from ..utils import temp_data_path
+from ..file_io import file_io_pool, write_atomic
+
+
+MAGIC = b"SK"
+FORMAT_VERSION = 1
+'''当前序列化格式版本'''
+
+_KIND_MESSAGE = 1
+_KIND_EVENT = 2
+
+_NONE = 0
+_FALSE = 1
+_TRUE = 2
+_INT = 3
+_FLOAT = 4
+_STR = 5
+_BYTES = 6
+_LIST = 7
+_DICT = 8
+_MESSAGE = 9
+_MEDIA_HASH = 10
+_DIGITS = 11
+
+SEGMENT_TYPES = ("text", "reply", "at_all", "at_user", "at_me", "image", "voice", "video", "other")
+'''消息段类型编号表，仅可在末尾追加，调整顺序需提升格式版本'''
+_SEGMENT_CODES = {ms_type: i for i, ms_type in enumerate(SEGMENT_TYPES)}
+_SEGMENT_NAMED = 0xff
+
+_MAX_DIGITS = 19
+'''写为变长整数的纯数字字符串的最大位数，更长的字符串转换为整数受 int 位数上限限制'''
+
+_double = struct.Struct("<d")
+
+
+def _write_varint(buf: bytearray, n: int):
+    while n > 0x7f:
+        buf.append((n & 0x7f) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+def _read_varint(data: memoryview, pos: int) -> tuple[int, int]:
+    n = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7f) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+def _write_str(buf: bytearray, s: str):
+    raw = s.encode()
+    _write_varint(buf, len(raw))
+    buf += raw
+
+def _read_bytes(data: memoryview, pos: int, length: int) -> tuple[memoryview, int]:
+    if pos + length > len(data):
+        raise IndexError("数据长度不足")
+    return data[pos:pos+length], pos + length
+
+def _read_str(data: memoryview, pos: int) -> tuple[str, int]:
+    length, pos = _read_varint(data, pos)
+    raw, pos = _read_bytes(data, pos, length)
+    return str(raw, "utf-8"), pos
+
+
+_segment_fields: dict[Type[UniMessageSegment], tuple[str, ...]] = {}
+
+def _get_segment_fields(cls: Type[UniMessageSegment]) -> tuple[str, ...]:
+    '''除 type、origin_ms 与下载所得内容、内容标识以外的字段名'''
+    if (names := _segment_fields.get(cls)) is None:
+        names = _segment_fields[cls] = tuple(
+            f.name for f in fields(cls) if f.name not in ("type", "origin_ms", "_fetched", "_content_key")
+        )
+    return names
+
+_event_fields: dict[Type[UniEvent], tuple[str, ...]] = {}
+
+def _get_event_fields(cls: Type[UniEvent]) -> tuple[str, ...]:
+    '''除 origin_event 以外的字段名'''
+    if (names := _event_fields.get(cls)) is None:
+        names = _event_fields[cls] = tuple(
+            name for name in cls.__fields__ if name != "origin_event"
+        )
+    return names
+
+_event_classes: dict[str, Type[UniEvent]] = {}
+
+def _get_event_cls(name: str) -> Type[UniEvent]:
+    if (cls := _event_classes.get(name)) is None:
+        stack = [UniEvent]
+        while stack:
+            _cls = stack.pop()
+            _event_classes[_cls.__name__] = _cls
+            stack.extend(_cls.__subclasses__())
+        if (cls := _event_classes.get(name)) is None:
+            raise ValueError(f"未知的 UniEvent 类 {name}。")
+    return cls
+
+
+def media_hash(data: Union[bytes, BytesIO]) -> bytes:
+    '''媒体内容的 md5 摘要，不写入文件'''
+    if isinstance(data, BytesIO):
+        data = data.getvalue()
+    return md5(data).digest()
+
+def media_hash_path(digest: bytes) -> Path:
+    '''md5 摘要对应的临时文件路径'''
+    path = (temp_data_path/digest.hex()).absolute()
+    if not path.exists():
+        raise ValueError(f"媒体缓存 {digest.hex()} 不存在，无法还原。")
+    return path
+
+
+def _write_value(buf: bytearray, value: Any, media: dict[bytes, bytes]):
+    if value is None:
+        buf.append(_NONE)
+    elif value is True:
+        buf.append(_TRUE)
+    elif value is False:
+        buf.append(_FALSE)
+    elif isinstance(value, int):
+        buf.append(_INT)
+        _write_varint(buf, value << 1 if value >= 0 else (-value << 1) - 1)
+    elif isinstance(value, float):
+        buf.append(_FLOAT)
+        buf += _double.pack(value)
+    elif isinstance(value, str):
+        if len(value) <= _MAX_DIGITS and value.isdigit() and value.isascii() and value[0] != "0":
+            buf.append(_DIGITS)
+            _write_varint(buf, int(value))
+        else:
+            buf.append(_STR)
+            _write_str(buf, value)
+    elif isinstance(value, Path):
+        buf.append(_STR)
+        _write_str(buf, str(value))
+    elif isinstance(value, (bytes, bytearray)):
+        buf.append(_BYTES)
+        _write_varint(buf, len(value))
+        buf += value
+    elif isinstance(value, UniMessage):
+        buf.append(_MESSAGE)
+        _write_message(buf, value, media)
+    elif isinstance(value, (list, tuple)):
+        buf.append(_LIST)
+        _write_varint(buf, len(value))
+        for item in value:
+            _write_value(buf, item, media)
+    elif isinstance(value, dict):
+        buf.append(_DICT)
+        _write_varint(buf, len(value))
+        for k, v in value.items():
+            _write_value(buf, k, media)
+            _write_value(buf, v, media)
+    else:
+        raise ValueError(f"无法序列化 {type(value).__name__} 类型的值。")
+
+def _read_value(data: memoryview, pos: int) -> tuple[Any, int]:
+    tag = data[pos]
+    pos += 1
+    if tag == _NONE:
+        return None, pos
+    if tag == _TRUE:
+        return True, pos
+    if tag == _FALSE:
+        return False, pos
+    if tag == _INT:
+        n, pos = _read_varint(data, pos)
+        return (n >> 1) if not n & 1 else -((n + 1) >> 1), pos
+    if tag == _FLOAT:
+        return _double.unpack_from(data, pos)[0], pos + 8
+    if tag == _STR:
+        return _read_str(data, pos)
+    if tag == _DIGITS:
+        n, pos = _read_varint(data, pos)
+        return str(n), pos
+    if tag == _BYTES:
+        length, pos = _read_varint(data, pos)
+        raw, pos = _read_bytes(data, pos, length)
+        return bytes(raw), pos
+    if tag == _MESSAGE:
+        return _read_message(data, pos)
+    if tag == _LIST:
+        length, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(length):
+            item, pos = _read_value(data, pos)
+            items.append(item)
+        return items, pos
+    if tag == _DICT:
+        length, pos = _read_varint(data, pos)
+        res = {}
+        for _ in range(length):
+            k, pos = _read_value(data, pos)
+            res[k], pos = _read_value(data, pos)
+        return res, pos
+    if tag == _MEDIA_HASH:
+        digest, pos = _read_bytes(data, pos, 16)
+        return media_hash_path(bytes(digest)), pos
+    raise ValueError(f"未知的值标记 {tag}，数据可能已损坏。")
+
+
+def _write_segment(buf: bytearray, uni_ms: UniMessageSegment, media: dict[bytes, bytes]):
+    if (code := _SEGMENT_CODES.get(uni_ms.type)) is not None:
+        buf.append(code)
+    else:
+        buf.append(_SEGMENT_NAMED)
+        _write_str(buf, uni_ms.type)
+    for name in _get_segment_fields(type(uni_ms)):
+        value = getattr(uni_ms, name)
+        if name == "_path" and value is None and isinstance(uni_ms, UniMedia) and uni_ms._bytes is not None:
+            # bytes 内容以 md5 引用，写入 path 位置，内容待序列化完成后写入临时目录
+            data = uni_ms._bytes.getvalue() if isinstance(uni_ms._bytes, BytesIO) else uni_ms._bytes
+            digest = media_hash(data)
+            media[digest] = data
+            buf.append(_MEDIA_HASH)
+            buf += digest
+            continue
+        if name == "_bytes":
+            value = None
+        _write_value(buf, value, media)
+
+def _read_segment(data: memoryview, pos: int) -> tuple[UniMessageSegment, int]:
+    code = data[pos]
+    pos += 1
+    if code == _SEGMENT_NAMED:
+        ms_type, pos = _read_str(data, pos)
+    elif code < len(SEGMENT_TYPES):
+        ms_type = SEGMENT_TYPES[code]
+    else:
+        raise ValueError(f"未知的消息段类型编号 {code}。")
+    if (cls := uni_ms_mapping.get(ms_type)) is None:
+        raise ValueError(f"未知的消息段类型 {ms_type}。")
+    values = []
+    for _ in _get_segment_fields(cls):
+        value, pos = _read_value(data, pos)
+        values.append(value)
+    return cls(ms_type, None, *values), pos
+
+def _write_message(buf: bytearray, uni_msg: UniMessage, media: dict[bytes, bytes]):
+    _write_varint(buf, len(uni_msg))
+    for uni_ms in uni_msg:
+        _write_segment(buf, uni_ms, media)
+
+def _read_message(data: memoryview, pos: int) -> tuple[UniMessage, int]:
+    length, pos = _read_varint(data, pos)
+    uni_msg = UniMessage(None)
+    for _ in range(length):
+        uni_ms, pos = _read_segment(data, pos)
+        uni_msg.append(uni_ms)
+    return uni_msg, pos
+
+
+def _write_event(buf: bytearray, uni_event: UniEvent, media: dict[bytes, bytes]):
+    cls = type(uni_event)
+    _write_str(buf, cls.__name__)
+    names = _get_event_fields(cls)
+    _write_varint(buf, len(names))
+    for name in names:
+        _write_value(buf, getattr(uni_event, name), media)
+
+def _read_event(data: memoryview, pos: int) -> tuple[UniEvent, int]:
+    name, pos = _read_str(data, pos)
+    cls = _get_event_cls(name)
+    names = _get_event_fields(cls)
+    count, pos = _read_varint(data, pos)
+    if count != len(names):
+        raise ValueError(f"{name} 字段数量不符，数据可能来自不同版本。")
+    values: dict[str, Any] = {"origin_event": None}
+    for name in names:
+        values[name], pos = _read_value(data, pos)
+    return cls.construct(**values), pos
+
+
+def _dumps(obj: Union[UniMessage, UniEvent]) -> tuple[bytes, dict[bytes, bytes]]:
+    '''序列化为 bytes，同时返回需写入临时目录的媒体内容，以 md5 摘要为键'''
+    buf = bytearray(MAGIC)
+    buf.append(FORMAT_VERSION)
+    media: dict[bytes, bytes] = {}
+    if isinstance(obj, UniMessage):
+        buf.append(_KIND_MESSAGE)
+        _write_message(buf, obj, media)
+    elif isinstance(obj, UniEvent):
+        buf.append(_KIND_EVENT)
+        _write_event(buf, obj, media)
+    else:
+        raise ValueError("仅支持序列化 UniMessage 或 UniEvent。")
+    return bytes(buf), media
+
+def dumps(obj: Union[UniMessage, UniEvent]) -> bytes:
+    '''将 UniMessage 或 UniEvent 序列化为 bytes，媒体内容同步写入临时目录（已存在则跳过）'''
+    raw, media = _dumps(obj)
+    for digest, data in media.items():
+        write_atomic(temp_data_path/digest.hex(), data, overwrite=False)
+    return raw
+
+async def dumps_async(obj: Union[UniMessage, UniEvent]) -> bytes:
+    '''dumps 的异步版本，媒体内容交由文件读写线程池写入'''
+    raw, media = _dumps(obj)
+    await asyncio.gather(*(
+        file_io_pool.write(temp_data_path/digest.hex(), data, overwrite=False)
+        for digest, data in media.items()
+    ))
+    return raw
+
+def loads(raw: Union[bytes, bytearray, memoryview]) -> Union[UniMessage, UniEvent]:
+    '''由 dumps 所得 bytes 还原 UniMessage 或 UniEvent'''
+    data = memoryview(raw)
+    if bytes(data[:2]) != MAGIC:
+        raise ValueError("数据不是世界树序列化格式。")
+    if len(data) < 4:
+        raise ValueError("数据不完整或已损坏。")
+    if (version := data[2]) != FORMAT_VERSION:
+        raise ValueError(f"不支持的序列化格式版本 {version}。")
+    kind = data[3]
+    try:
+        if kind == _KIND_MESSAGE:
+            obj, pos = _read_message(data, 4)
+        elif kind == _KIND_EVENT:
+            obj, pos = _read_event(data, 4)
+        else:
+            raise ValueError(f"未知的内容类别 {kind}。")
+    except (IndexError, struct.error, UnicodeDecodeError, TypeError, RecursionError) as e:
+        # TypeError 来自损坏数据中不可哈希的字典键
+        raise ValueError("数据不完整或已损坏。") from e
+    if pos != len(data):
+        raise ValueError("数据末尾存在多余内容。")
+    return obj
+
+
+__all__ = [
+    "FORMAT_VERSION",
+    "SEGMENT_TYPES",
+    "media_hash",
+    "media_hash_path",
+    "dumps",
+    "dumps_async",
+    "loads"
+]
@@ -0,0 +1,329 @@
+'''
+提供用户、群聊、频道、房间信息的本地存储。
+
+信息以 (类型, 平台, 平台原 id) 为索引存放于 SQLite 数据库中，
+读取时优先经过内存 LRU 缓存，写入时先暂存，累计一定数量或超过一定时间后批量落盘。
+
+数据库操作均在独立的单线程中进行，不阻塞事件循环，读写按提交顺序执行。
+事件循环内的热点路径应使用 peek 系列方法，仅查询内存缓存与暂存写入。
+
+每个适配器可通过 add_entity_collector 函数，为 Event 类设定信息收集函数，
+事件经过 UniEvent 构建过程时将自动收集并存储其中的信息。
+'''
+
+from typing import (
+    Any,
+    Type,
+    Union,
+    Callable,
+    Iterable,
+    AsyncIterator,
+    Optional
+)
+from concurrent.futures import ThreadPoolExecutor, Future
+from pathlib import Path
+import asyncio
+import sqlite3
+import time
+
+from nonebot.internal.adapter import Event as BaseEvent
+
+from .models import User, PlatformUserData, Group, Channel, Room
+from ..cache import TTLCache
+from ..config import config
+from ..utils import logger, data_path
+
+
+Entity = Union[User, PlatformUserData, Group, Channel, Room]
+'''可存储的信息模型类型'''
+
+ENTITY_KINDS: dict[Type[Entity], str] = {
+    User: "identity",
+    PlatformUserData: "user",
+    Group: "group",
+    Channel: "channel",
+    Room: "room"
+}
+'''信息模型类型与存储类型名的对应关系'''
+
+
+class EntityStore:
+    """
+    基于 SQLite 的信息存储。
+
+    :param path: 数据库文件路径。
+    :param cache_size: 内存缓存条目上限。
+    :param batch_size: 暂存写入达到该数量时立即落盘。
+    :param flush_interval: 暂存写入的最长延迟，单位秒。
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        cache_size: int = 4096,
+        batch_size: int = 64,
+        flush_interval: float = 5
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._cache: TTLCache[tuple[str, str, str], Entity] = TTLCache(cache_size)
+        self._pending: dict[tuple[str, str, str], Entity] = {}
+        self._pending_absent: dict[tuple[str, str, str], Entity] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _submit(self, func: Callable[..., Any], *args: Any) -> "Future[Any]":
+        '''将数据库操作提交至存储线程，线程在首次提交时创建'''
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix="sekaiju_store")
+        return self._executor.submit(func, *args)
+
+    async def _call(self, func: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.wrap_future(self._submit(func, *args))
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        '''数据库连接，首次使用时在存储线程中建立，仅可在存储线程中使用'''
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entities ("
+                "kind TEXT NOT NULL, "
+                "platform TEXT NOT NULL, "
+                "id TEXT NOT NULL, "
+                "data TEXT NOT NULL, "
+                "updated_at REAL NOT NULL, "
+                "PRIMARY KEY (kind, platform, id))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    async def get(
+        self,
+        entity_cls: Type[Entity],
+        platform: str,
+        id: Union[int, str]
+    ) -> Optional[Entity]:
+        '''以平台名与平台原 id 获取对应信息，不存在时返回 None，需要时在存储线程中查询数据库'''
+        if (entity := self.peek(entity_cls, platform, id)) is not None:
+            return entity
+        key = (ENTITY_KINDS[entity_cls], platform, str(id))
+        data = await self._call(self._select, key)
+        # 查询期间可能已有新的写入
+        if (entity := self.peek(entity_cls, platform, id)) is not None:
+            return entity
+        if data is None:
+            return self._pending_absent.get(key)
+        entity = entity_cls.parse_raw(data)
+        self._cache.set(key, entity)
+        return entity
+
+    def _select(self, key: tuple[str, str, str]) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT data FROM entities WHERE kind = ? AND platform = ? AND id = ?",
+            key
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def peek(
+        self,
+        entity_cls: Type[Entity],
+        platform: str,
+        id: Union[int, str]
+    ) -> Optional[Entity]:
+        '''仅从内存缓存与暂存写入中获取对应信息，不读取数据库，适用于事件循环内的热点路径'''
+        key = (ENTITY_KINDS[entity_cls], platform, str(id))
+        if (entity := self._cache.get(key)) is not None:
+            return entity
+        return self._pending.get(key)
+
+    async def iter(self, entity_cls: Type[Entity], platform: Optional[str] = None) -> AsyncIterator[Entity]:
+        '''遍历某类型（及平台）的全部信息，暂存的写入先行落盘'''
+        self.flush()
+        for data in await self._call(self._select_all, ENTITY_KINDS[entity_cls], platform):
+            yield entity_cls.parse_raw(data)
+
+    def _select_all(self, kind: str, platform: Optional[str]) -> list[str]:
+        if platform is None:
+            cursor = self.conn.execute("SELECT data FROM entities WHERE kind = ?", (kind,))
+        else:
+            cursor = self.conn.execute(
+                "SELECT data FROM entities WHERE kind = ? AND platform = ?",
+                (kind, platform)
+            )
+        return [data for (data,) in cursor.fetchall()]
+
+    def delete(self, entity_cls: Type[Entity], platform: str, id: Union[int, str]):
+        '''删除对应信息，数据库中的删除在存储线程中进行'''
+        key = (ENTITY_KINDS[entity_cls], platform, str(id))
+        self._cache.pop(key)
+        self._pending.pop(key, None)
+        self._pending_absent.pop(key, None)
+        self._submit(self._delete, key)
+
+    def _delete(self, key: tuple[str, str, str]):
+        try:
+            with self.conn:
+                self.conn.execute(
+                    "DELETE FROM entities WHERE kind = ? AND platform = ? AND id = ?",
+                    key
+                )
+        except sqlite3.Error as e:
+            logger("ERROR", f"本地信息存储删除失败：{e}")
+
+    async def get_user(self, platform: str, id: Union[int, str]) -> Optional[PlatformUserData]:
+        return await self.get(PlatformUserData, platform, id) # type: ignore
+
+    def peek_user(self, platform: str, id: Union[int, str]) -> Optional[PlatformUserData]:
+        return self.peek(PlatformUserData, platform, id) # type: ignore
+
+    async def get_group(self, platform: str, id: Union[int, str]) -> Optional[Group]:
+        return await self.get(Group, platform, id) # type: ignore
+
+    async def get_channel(self, platform: str, id: Union[int, str]) -> Optional[Channel]:
+        return await self.get(Channel, platform, id) # type: ignore
+
+    async def get_room(self, platform: str, id: Union[int, str]) -> Optional[Room]:
+        return await self.get(Room, platform, id) # type: ignore
+
+    def put(self, platform: str, entity: Entity, replace: bool = True):
+        """
+        存储信息，与已存储内容相同时不产生写入。
+
+        :param platform: 平台名。
+        :param entity: 信息。
+        :param replace:
+            已存储同一 id 的信息时是否覆盖。
+            仅知道 id 而缺少名称等内容时应传入 False，以免覆盖 API 查询所得的完整信息。
+        """
+        key = (ENTITY_KINDS[type(entity)], platform, str(entity.id))
+        if replace:
+            if self._cache.get(key) == entity:
+                return
+            self._cache.set(key, entity)
+            self._pending[key] = entity
+            self._pending_absent.pop(key, None)
+        else:
+            # 不进入内存缓存，以免 peek 取得不完整的信息
+            if key in self._cache or key in self._pending:
+                return
+            self._pending_absent[key] = entity
+        if len(self._pending) + len(self._pending_absent) >= self.batch_size:
+            self.flush()
+        else:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._flush_handle = loop.call_later(self.flush_interval, self.flush)
+
+    def flush(self) -> "Optional[Future[None]]":
+        '''将暂存的写入交由存储线程批量落盘，不等待写入完成，返回对应 Future'''
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending and not self._pending_absent:
+            return None
+        now = time.time()
+        rows = [(*key, entity.json(), now) for key, entity in self._pending.items()]
+        absent_rows = [(*key, entity.json(), now) for key, entity in self._pending_absent.items()]
+        self._pending = {}
+        self._pending_absent = {}
+        return self._submit(self._write, rows, absent_rows)
+
+    def _write(self, rows: list[tuple], absent_rows: list[tuple]):
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO entities (kind, platform, id, data, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    absent_rows
+                )
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO entities (kind, platform, id, data, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+        except sqlite3.Error as e:
+            logger("ERROR", f"本地信息存储写入失败：{e}")
+
+    async def close(self):
+        '''落盘并关闭数据库连接与存储线程'''
+        self.flush()
+        if self._executor is None:
+            return
+        await self._call(self._close_conn)
+        self._executor.shutdown()
+        self._executor = None
+
+    def _close_conn(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+entity_store = EntityStore(
+    data_path / "entities.db",
+    cache_size=config.sekaiju_entity_cache_size,
+    batch_size=config.sekaiju_entity_batch_size,
+    flush_interval=config.sekaiju_entity_flush_interval
+)
+'''世界树信息存储实例'''
+
+
+EntityCollector = Callable[[BaseEvent], Iterable[tuple[str, Entity]]]
+'''信息收集函数，以 Event 实例为唯一参数，返回 (平台名, 信息) 的可迭代对象'''
+
+entity_collectors: dict[Type[BaseEvent], list[tuple[EntityCollector, bool]]] = {}
+'''各 Event 类所设定的信息收集函数，及其所得信息是否覆盖已存储的信息'''
+
+_resolved_collectors: dict[Type[BaseEvent], list[tuple[EntityCollector, bool]]] = {}
+
+
+def add_entity_collector(event_cls: Type[BaseEvent], collector: EntityCollector, replace: bool = True):
+    """
+    为 Event 类设定信息收集函数，其子类同样生效。
+
+    :param event_cls: 原 Event 类。
+    :param collector: 以 Event 实例为唯一参数，返回 (平台名, 信息) 可迭代对象的函数。
+    :param replace: 所得信息是否覆盖已存储的信息，事件仅携带 id 而缺少名称等内容时应传入 False.
+    """
+    entity_collectors.setdefault(event_cls, []).append((collector, replace))
+    _resolved_collectors.clear()
+
+
+def collect_entities(event: BaseEvent):
+    '''收集并存储 Event 实例中的信息'''
+    if not config.sekaiju_entity_store:
+        return
+    event_cls = type(event)
+    if (collectors := _resolved_collectors.get(event_cls)) is None:
+        collectors = [
+            item
+            for cls in event_cls.__mro__
+            for item in entity_collectors.get(cls, [])
+        ]
+        _resolved_collectors[event_cls] = collectors
+    for collector, replace in collectors:
+        try:
+            for platform, entity in collector(event):
+                entity_store.put(platform, entity, replace)
+        except Exception as e:
+            logger("WARNING", f"从 {event_cls.__name__} 收集信息失败：{e}")
+
+
+__all__ = [
+    "Entity",
+    "EntityStore",
+    "entity_store",
+    "add_entity_collector",
+    "collect_entities"
+]
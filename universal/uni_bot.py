@@ -6,13 +6,27 @@ FakeBot 负责重写对应 Bot 的接口，用 UniBot 实现具体功能。
 
 每个适配器需要实现以下内容：
 
-1. 继承 UniBot 类，并重写 send 与 call_api 抽象方法。
-其中， call_api 方法需要根据 UniBot 所给不同参数表进行处理。
+1. 继承 UniBot 类，并重写 send 抽象方法。
+另需设定 api_mapping 字段，将下述统一 API 转换为原 Bot API，具体请参见 ApiItem 文档。
 
 2. 继承 FakeBot 类与该适配器原有 Bot 类，并重写相关方法为通过 UniBot 实现原有功能。
 该类 __init__ 方法应仅有 UniBot 一个参数。
+另需设定 api_mapping 字段，将原 Bot API 转换为下述统一 API.
 
 3. 通过 add_uni_bot_method 函数，为适配器原有 Bot 类添加相应方法。
+同时传入该适配器的 Event 基类，以便以其他平台事件构造该平台虚假事件时构建对应 FakeBot.
+
+目前的统一 API 如下（id 均为编码后的 id）：
+
+- get_user_info(user_id, group_id=None) -> {user_id, nickname, avatar}
+- get_group_info(group_id) -> {group_id, group_name, member_count}
+- get_group_member_info(group_id, user_id) -> {group_id, user_id, nickname, card, role}
+- delete_msg(message_id, group_id=None, time=None) -> None
+- ban(group_id, user_id, duration) -> None
+
+其中 role 取值为 owner、admin、member 之一。
+get_user_info 的 group_id 可省略，但大别野等只能在群聊内查询用户的平台会改用最近见到该用户的群聊，
+若近期未见到该用户则抛出 ValueError.
 '''
 
 from abc import abstractmethod, ABC
@@ -22,11 +36,18 @@ from typing import (
     cast,
     Type,
     Union,
+    Callable,
+    ClassVar,
     Optional
 )
 from typing_extensions import override
+from dataclasses import dataclass, field
+
+from nonebot.adapters import Bot as BaseBot, Event as BaseEvent
 
-from nonebot.adapters import Bot as BaseBot
+from .uni_event import Item
+from ..cache import TTLCache, SingleFlight, make_key
+from ..config import config
 
 
 if TYPE_CHECKING:
@@ -34,6 +55,52 @@ if TYPE_CHECKING:
     from .uni_message import UniMessage
 
 
+@dataclass
+class ApiItem:
+    """
+    API 转换项，用于在统一 API 与原 Bot API 之间转换。
+
+    :param api: 转换后调用的 API 名称。
+    :param params:
+        转换后 API 的参数映射。
+        键为转换后 API 的参数名，值为 Item 类（从转换前参数中取对应字段，参数含义请参见对应类文档），
+        或以转换前参数字典为唯一参数的 Callable 对象，或为非 Callable 的其他对象。
+        结果为 None 的参数将被忽略。
+    :param result:
+        以转换后 API 返回结果与转换前参数字典为参数的 Callable 对象，其返回值作为最终结果。
+        留空则原样返回。
+    :param cache_ttl: 结果缓存时长，单位秒。留空则不缓存，一般仅用于只读 API。
+    """
+
+    api: str
+    params: dict[str, Union[Item, Callable, Any]] = field(default_factory=dict)
+    result: Optional[Callable[[Any, dict[str, Any]], Any]] = None
+    cache_ttl: Optional[float] = None
+
+    async def call(
+        self,
+        caller: Callable,
+        data: dict[str, Any]
+    ) -> Any:
+        '''转换参数并通过 caller 调用 API，返回转换后的结果'''
+        params: dict[str, Any] = {}
+        for k, v in self.params.items():
+            if isinstance(v, Item):
+                value = data.get(v.name, v.default)
+                if v.call is not None and value is not None:
+                    value = await v.call(value)
+            elif isinstance(v, Callable):
+                value = v(data)
+            else:
+                value = v
+            if value is not None:
+                params[k] = value
+        result = await caller(self.api, **params)
+        if self.result is not None:
+            return self.result(result, data)
+        return result
+
+
 class UniBot(BaseBot):
     '''UniBot 基类。
     
@@ -41,10 +108,15 @@ class UniBot(BaseBot):
 
     origin_bot: BaseBot
     '''构建该 UniBot 的原 Bot 实例'''
+
+    api_mapping: ClassVar[dict[str, ApiItem]] = {}
+    '''统一 API 名称到原 Bot API 的转换项'''
     
     @override
     def __init__(self, bot: BaseBot):
         self.origin_bot = bot
+        self._api_cache: TTLCache[Any, Any] = TTLCache(config.sekaiju_api_cache_size)
+        self._api_flight: SingleFlight[Any, Any] = SingleFlight()
 
     @abstractmethod
     async def send(
@@ -62,7 +134,7 @@ class UniBot(BaseBot):
             kwargs: 任意额外参数
         """
 
-    @abstractmethod
+    @override
     async def call_api(
         self,
         api: str,
@@ -71,12 +143,29 @@ class UniBot(BaseBot):
         """
         调用机器人 API 接口。
 
-        一般需要根据所支持的不同平台 API 的映射表进行转换。
+        根据 api_mapping 将统一 API 转换为原 Bot API，不在映射表中的 API 将直接交由原 Bot 调用。
+        设定了 cache_ttl 的 API 结果将按 (api, data) 缓存，相同的并发调用会被合并。
 
         参数:
             api: API 名称
             data: API 数据
         """
+        if (api_item := self.api_mapping.get(api)) is None:
+            return await self.origin_bot.call_api(api, **data)
+        if api_item.cache_ttl is None:
+            return await api_item.call(self.origin_bot.call_api, data)
+        key = (api, make_key(**data))
+        if key in self._api_cache:
+            return self._api_cache.get(key)
+        async def fetch():
+            result = await api_item.call(self.origin_bot.call_api, data)
+            self._api_cache.set(key, result, api_item.cache_ttl)
+            return result
+        return await self._api_flight.do(key, fetch)
+
+    def clear_api_cache(self):
+        '''清空 API 结果缓存'''
+        self._api_cache.clear()
 
 
 class FakeBot(ABC):
@@ -84,16 +173,34 @@ class FakeBot(ABC):
 
     uni_bot: UniBot
 
+    api_mapping: ClassVar[dict[str, ApiItem]] = {}
+    '''原 Bot API 名称到统一 API 的转换项'''
+
     def __init__(self, uni_bot: UniBot):
         '''__init__ 方法应仅有 UniBot 一个参数'''
         self.uni_bot = uni_bot
         self.id = uni_bot.origin_bot.self_id
 
+    async def call_api(
+        self,
+        api: str,
+        **data: Any
+    ) -> Any:
+        '''根据 api_mapping 将原 Bot API 转换为统一 API，通过 UniBot 调用'''
+        if (api_item := self.api_mapping.get(api)) is None:
+            raise ValueError(f"{type(self).__name__} 不支持调用 API {api}。")
+        return await api_item.call(self.uni_bot.call_api, data)
+
+
+_event_bot_cls: dict[Type[BaseEvent], Type[BaseBot]] = {}
+'''平台 Event 基类到对应 Bot 类的映射'''
+
 
 def add_bot_method(
         origin_bot_cls: Type[BaseBot],
         uni_bot_cls: Optional[Type[UniBot]] = None,
-        fake_bot_cls: Optional[Type[FakeBot]] = None
+        fake_bot_cls: Optional[Type[FakeBot]] = None,
+        event_cls: Optional[Type[BaseEvent]] = None
     ):
     """
     为 Bot 类添加获取对应 UniBot 与构建对应 FakeBot 的方法。
@@ -107,11 +214,20 @@ def add_bot_method(
         所给 Bot 类对应的 FakeBot 类。
         将为 Bot 类添加 fake_bot_cls 字段与 parse_fake_bot 方法。
         留空则代表 Bot 不支持从 UniBot 构建 FakeBot.
+    :param event_cls:
+        所给 Bot 类所属平台的 Event 基类，子类同样适用。
+        以其他平台事件构造该平台虚假事件时，将据此构建 FakeBot 供消息导出使用。
     """
+    if event_cls is not None:
+        _event_bot_cls[event_cls] = origin_bot_cls
     if uni_bot_cls is not None:
         setattr(origin_bot_cls, "uni_bot_cls", uni_bot_cls)
         def get_uni_bot(self):
-            return cast(Type[UniBot], self.uni_bot_cls)(self)
+            # UniBot 实例随原 Bot 保存，使 API 缓存在多次事件间复用
+            if (uni_bot := vars(self).get("_uni_bot")) is None:
+                uni_bot = cast(Type[UniBot], self.uni_bot_cls)(self)
+                setattr(self, "_uni_bot", uni_bot)
+            return uni_bot
         setattr(origin_bot_cls, "get_uni_bot", get_uni_bot)
 
     if fake_bot_cls is not None:
@@ -122,6 +238,13 @@ def add_bot_method(
         setattr(origin_bot_cls, "parse_fake_bot", parse_fake_bot)
 
 
+def get_event_bot_cls(event_cls: Type[BaseEvent]) -> Optional[Type[BaseBot]]:
+    '''获取 Event 类所属平台的 Bot 类，未指定时返回 None'''
+    for base in event_cls.__mro__:
+        if (bot_cls := _event_bot_cls.get(base)) is not None:
+            return bot_cls
+    return None
+
 def check_uni_bot_support(bot_or_cls: Union[BaseBot, Type[BaseBot]]) -> bool:
     '''检查 Bot 类或实例是否支持转化为 UniBot'''
     return hasattr(bot_or_cls, "uni_bot_cls")
@@ -132,8 +255,10 @@ def check_fake_bot_support(bot_or_cls: Union[BaseBot, Type[BaseBot]]) -> bool:
 
 
 __all__ = [
+    "ApiItem",
     "UniBot",
     "FakeBot",
+    "get_event_bot_cls",
     "check_uni_bot_support",
     "check_fake_bot_support"
 ]
\ No newline at end of file
@@ -7,6 +7,9 @@
 具体请参见 Item 与 add_uni_event_items 函数文档。
 
 如不对 Event 做出更改，则保持原有行为。
+
+另外，可通过 store.add_entity_collector 为 Event 类设定信息收集函数，
+构建 UniEvent 时将自动收集并本地存储事件中的用户、群聊等信息。
 '''
 
 from typing import (
@@ -18,7 +21,9 @@ from typing import (
     Callable,
     Any
 )
-from pydantic import parse_obj_as, BaseModel
+from pydantic import parse_obj_as, BaseModel, ValidationError
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.errors import MissingError
 from dataclasses import dataclass, field
 from collections import defaultdict
 from inspect import iscoroutinefunction
@@ -27,8 +32,14 @@ from nonebot.internal.adapter import Event as BaseEvent
 from nonebot.internal.adapter import Adapter, Bot
 
 from .uni_message import UniMessage, convert_message
+from .store import collect_entities
 from ..utils import ascii_encode, ascii_decode, Encoded
+from ..profiler import startup_profiler
+from ..metrics import instrument
+from ..config import config
+
 
+startup_profiler.begin("uni_event classes")
 
 
 @dataclass
@@ -76,11 +87,12 @@ class Item:
         if self.is_msg:
             if self.origin_adapter is None and self.target_adapter is None:
                 raise ValueError("Item.origin_adapter 与 Item.target_adapter 需要至少有一个不为空。")
-            async def inner_1(msg):
+            async def inner_1(msg, bot=None):
                 return await convert_message(
                     message=msg,
                     origin_adapter=self.origin_adapter,
                     target_adapter=self.target_adapter,
+                    target_bot=bot,
                     from_origin_kwargs=self.from_origin_kwargs,
                     to_target_kwargs=self.to_target_kwargs
                 )
@@ -100,6 +112,19 @@ class Item:
                     return func(*args, **kwargs)
                 return inner_3
             self.call = inner_2(self.call)
+        if self.call is not None:
+            self.call = instrument("item_call", lambda *args, **kwargs: {"field": self.name})(self.call)
+
+
+@dataclass
+class BotItem:
+    """
+    用于导出映射中需要目标 Bot 的字段。
+
+    :param call: 以 UniEvent 实例与导出所用的 Bot（未提供时为 None）为参数的 Callable 对象。
+    """
+
+    call: Callable[[Any, Optional[Bot]], Any]
 
 
 class UniEvent(BaseModel):
@@ -120,6 +145,9 @@ class UniEvent(BaseModel):
     self_id: Optional[Union[str, int]] = None
     '''收到事件的机器人 ID'''
 
+    platform: Optional[str] = None
+    '''事件来源适配器名称'''
+
     extra: dict[str, Any] = {}
 
     @classmethod
@@ -147,48 +175,98 @@ class UniEvent(BaseModel):
         return params
 
     @classmethod
+    @instrument("uni_event_parse", lambda cls, origin_event, mapping: {"event": type(origin_event).__name__})
     async def parse(
         cls,
         origin_event: BaseEvent,
         mapping: dict[str, Union[Item, Callable, Any]]
     ):
         '''用 Event 构建 UniEvent'''
+        collect_entities(origin_event)
         uni_event = parse_obj_as(
             cls,
             await cls._parse_params(origin_event, mapping)
         )
+        if config.sekaiju_drop_origin:
+            # 事件构建完成后，其中的 UniMessage 不再需要原消息段
+            for value in vars(uni_event).values():
+                if isinstance(value, UniMessage):
+                    value.drop_origin()
         return uni_event
 
     async def _export_params(
             self,
-            mapping: dict[str, Union[Item, Callable, Any]]
+            mapping: dict[str, Union[Item, Callable, Any]],
+            bot: Optional[Bot] = None
         ) -> dict[str, Any]:
         params: dict[str, Any] = {}
         for k, v in mapping.items():
             if isinstance(v, Item):
                 params[k] = getattr(self, v.name, v.default)
-                if v.call is not None:
+                if v.is_msg:
+                    params[k] = await cast(Callable, v.call)(params[k], bot=bot)
+                elif v.call is not None:
                     params[k] = await v.call(params[k])
+            elif isinstance(v, BotItem):
+                params[k] = v.call(self, bot)
             elif isinstance(v, Callable):
                 params[k] = v(self)
             else:
                 params[k] = v
         return params
     
+    @instrument("uni_event_export", lambda self, event_cls, mapping, bot=None: {"event": event_cls.__name__})
     async def export(
             self,
             event_cls: Type[BaseEvent],
-            mapping: dict[str, Union[Item, Callable, Any]]
+            mapping: dict[str, Union[Item, Callable, Any]],
+            bot: Optional[Bot] = None
         ) -> BaseEvent:
-        '''将 UniEvent 导出为目标 Event'''
-        event = parse_obj_as(
-            event_cls,
-            await self._export_params(mapping)
-        )
+        """
+        将 UniEvent 导出为目标 Event。
+
+        :param event_cls: 目标 Event 类。
+        :param mapping: 导出映射。
+        :param bot: 目标适配器的 Bot 实例，导出消息时传入对应转换函数，部分转换函数要求该参数。
+        """
+        params = await self._export_params(mapping, bot)
+        if getattr(event_cls, "export_by_fields", False):
+            event = _construct_by_fields(event_cls, params)
+        else:
+            event = parse_obj_as(event_cls, params)
         setattr(event, "uni_event", self)
         return event
 
 
+def _construct_by_fields(event_cls: Type[BaseEvent], params: dict[str, Any]) -> BaseEvent:
+    """
+    逐字段校验参数后构造 Event.
+
+    部分适配器的 Event 类以 pre root_validator 将平台原始回调数据整理为字段，
+    如大别野 Event 弹出 extend_data、解析 JSON 字符串形式的 content 并据此重建 message.
+    导出映射给出的已是整理后的字段，经过这些 root_validator 将直接出错，
+    若先还原为原始数据再解析，message 又会按 content 的文本重建，丢失导出得到的消息段。
+
+    因此此处仅跳过 root_validator：每个字段仍经其 ModelField 校验与类型转换（含字段 validator），
+    缺少必填字段或校验失败时与 parse_obj_as 一样抛出 ValidationError.
+    含 post root_validator 的 Event 类不应使用该方式导出，add_uni_event_items 将拒绝注册。
+    """
+    values: dict[str, Any] = {}
+    errors: list[ErrorWrapper] = []
+    for name, model_field in event_cls.__fields__.items():
+        if name not in params:
+            if model_field.required:
+                errors.append(ErrorWrapper(MissingError(), loc=name))
+            continue
+        value, error = model_field.validate(params[name], values, loc=name, cls=event_cls) # type: ignore
+        if error:
+            errors.append(error) # type: ignore
+        values[name] = value
+    if errors:
+        raise ValidationError(errors, event_cls)
+    return event_cls.construct(**values)
+
+
 # Message Events
 class UniMessageEvent(UniEvent):
     '''消息事件标记'''
@@ -443,7 +521,8 @@ def add_uni_event_items(
         event_cls: Type[BaseEvent],
         uni_event_cls: Type[UniEvent],
         parse_mapping: Optional[dict[str, Union[Item, Callable, Any]]] = None,
-        export_mapping: Optional[dict[str, Union[Item, Callable, Any]]] = None
+        export_mapping: Optional[dict[str, Union[Item, Callable, Any]]] = None,
+        export_by_fields: bool = False
 ) -> None:
     """
     为原 Event 类指定 UniEvent 类，并设定参数映射（parse_mapping 与 export_mapping）。
@@ -457,13 +536,18 @@ def add_uni_event_items(
     :param export_mapping:
         通过 UniEvent 实例构造该 Event 实例的参数映射。
         键为该 Event 的字段名，值为 Item类（参数含义请参见对应函数文档），
-        或以指定 UniEvent 类实例为唯一参数的 Callable 对象，或为非 Callable 的其他对象。
+        或以指定 UniEvent 类实例为唯一参数的 Callable 对象，或为需要目标 Bot 的 BotItem 类，或为非 Callable 的其他对象。
+    :param export_by_fields:
+        导出时是否逐字段校验 export_mapping 的结果后直接构造 Event，不经过 Event 类的 pre root_validator.
+        用于 pre root_validator 仅接受平台原始回调数据的 Event 类，含 post root_validator 的 Event 类不可使用。
 
     当 parse_mapping 与 export_mapping 均留空时，将会为原 Event 类设定空字典参数映射。
 
     当仅有 export_mapping 留空时，将试图从 parse_mapping 中取出 (str, str) 键值对构建 export_mapping.
     可为 export_mapping 传入空字典避免上述构建过程。
     """
+    if export_by_fields and getattr(event_cls, "__post_root_validators__", None):
+        raise ValueError(f"{event_cls.__name__} 含有 post root_validator，不能逐字段导出。")
     # TODO 暂不支持"仅提供 UniEvent 与 Event 之间的单向转换"，需要改写构造过程
     if parse_mapping is not None and export_mapping is None:
         temp_export_mapping = {}
@@ -477,16 +561,20 @@ def add_uni_event_items(
     setattr(event_cls, "uni_event", uni_event_cls)
     setattr(event_cls, "parse_mapping", parse_mapping)
     setattr(event_cls, "export_mapping", export_mapping)
+    setattr(event_cls, "export_by_fields", export_by_fields)
     async def get_uni_event(self):
         return await cast(Type[UniEvent], self.uni_event).parse(self, cast(dict, self.parse_mapping))
     @classmethod
-    async def parse_fake_event(cls, uni_event: UniEvent):
-        return await uni_event.export(cls, cast(dict, cls.export_mapping))
+    async def parse_fake_event(cls, uni_event: UniEvent, bot: Optional[Bot] = None):
+        return await uni_event.export(cls, cast(dict, cls.export_mapping), bot)
     setattr(event_cls, "get_uni_event", get_uni_event)
     setattr(event_cls, "parse_fake_event", parse_fake_event)
     uni_event_support[uni_event_cls].append(event_cls)
     
 
+startup_profiler.end()
+
+
 def check_uni_event_support(event_or_cls: Union[BaseEvent, Type[BaseEvent]]) -> bool:
     '''检查 Event 类或实例是否支持转化为 UniEvent'''
     return hasattr(event_or_cls, "uni_event")
@@ -494,6 +582,7 @@ def check_uni_event_support(event_or_cls: Union[BaseEvent, Type[BaseEvent]]) ->
 
 __all__ = [
     "Item",
+    "BotItem",
     "UniEvent",
     "UniMessageEvent",
     "UniPrivateMessageEvent",
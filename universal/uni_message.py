@@ -18,34 +18,60 @@ from typing import (
     TypeVar,
     Literal,
     Protocol,
+    Sequence,
+    Iterable,
+    Callable,
+    Awaitable,
     Any
 )
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from io import BytesIO
-from PIL import Image
+from base64 import b64encode
+import asyncio
+import sys
+import os
 
 from nonebot.internal.adapter import Adapter, Message, MessageSegment, Bot
 
 from ..utils import (
     path_to_url,
     path_to_bytes,
+    path_to_bytes_async,
+    path_to_view_async,
     bytes_to_path,
+    bytes_to_path_async,
     bytes_to_url,
     url_to_bytes,
+    url_to_bytes_async,
     url_to_path,
     Encoded
 )
+from ..media import get_media_backend
+from ..media_worker import probe_size, md5_hex
+from ..file_io import file_io_pool
+from ..cache import TTLCache, SingleFlight, make_key
+from ..metrics import instrument
+from ..config import config
 
 
-@dataclass
+# Python 3.10 起消息段使用 __slots__，不再为每个实例创建 __dict__
+# 因此消息段不可动态添加属性，需缓存的内容应声明为字段
+segment_dataclass = dataclass(slots=True) if sys.version_info >= (3, 10) else dataclass
+
+
+MediaRepr = Literal["url", "path", "base64", "bytes"]
+'''媒体的表示形式，base64 为不含前缀的字符串'''
+
+
+@segment_dataclass
 class UniMessageSegment:
     '''UniMessageSegment 基类。'''
 
     type: str
     
-    origin_ms: MessageSegment
-    '''原消息段'''
+    origin_ms: Optional[MessageSegment]
+    '''原消息段，启用 sekaiju_drop_origin 时导出或事件构建完成后为 None'''
 
     @staticmethod
     def text(origin_ms: MessageSegment, text: str) -> "UniText":
@@ -134,7 +160,7 @@ class UniMessageSegment:
     def other(origin_ms: MessageSegment) -> "UniOther":
         return UniOther("other", origin_ms)
 
-@dataclass
+@segment_dataclass
 class UniText(UniMessageSegment):
     '''文本信息'''
 
@@ -143,7 +169,7 @@ class UniText(UniMessageSegment):
     type: Literal["text"]
 
 
-@dataclass
+@segment_dataclass
 class UniReply(UniMessageSegment):
     '''回复信息'''
 
@@ -153,12 +179,12 @@ class UniReply(UniMessageSegment):
     type: Literal["reply"]
 
 
-@dataclass
+@segment_dataclass
 class UniAt(UniMessageSegment):
     '''at 信息'''
 
 
-@dataclass
+@segment_dataclass
 class UniAtAll(UniAt):
     '''at 全体成员信息'''
 
@@ -167,7 +193,7 @@ class UniAtAll(UniAt):
     type: Literal["at_all"]
 
 
-@dataclass
+@segment_dataclass
 class UniAtUser(UniAt):
     '''at 用户信息'''
 
@@ -179,7 +205,7 @@ class UniAtUser(UniAt):
     type: Literal["at_user"]
 
 
-@dataclass
+@segment_dataclass
 class UniAtMe(UniAt):
     '''at 机器人信息'''
 
@@ -188,7 +214,7 @@ class UniAtMe(UniAt):
     type: Literal["at_me"]
 
 
-@dataclass
+@segment_dataclass
 class UniMedia(UniMessageSegment):
     '''
     媒体信息
@@ -196,6 +222,8 @@ class UniMedia(UniMessageSegment):
     path、bytes、url 至少需要提供其一，且前述优先度递减。
 
     如获取 url 时，若 url 为空，则先后检查 path、bytes，并尝试构造 url。
+
+    仅有 url 且尚未下载时，在事件循环中读取 path、bytes 将抛出 ValueError，需改用 get_path、get_bytes.
     '''
 
     _path: Optional[Union[str, Path]] = None
@@ -207,8 +235,13 @@ class UniMedia(UniMessageSegment):
     cache: bool = True
     proxy: bool = True
     timeout: Optional[int] = None
+    _fetched: Optional[bytes] = field(default=None, repr=False, compare=False)
+    '''仅有 url 时首次下载所得内容，同一次导出中多次读取时不再重复下载，导出完成后释放'''
+    _content_key: Optional[str] = field(default=None, repr=False, compare=False)
+    '''内容标识，见 get_content_key'''
 
     @property
+    @instrument("media_resolve", lambda self: {"type": self.type, "target": "path"})
     def path(self) -> str:
         if self._path is not None:
             if isinstance(self._path, Path):
@@ -226,6 +259,7 @@ class UniMedia(UniMessageSegment):
         raise ValueError("UniMedia 参数不足，无法获取 path。")
 
     @property
+    @instrument("media_resolve", lambda self: {"type": self.type, "target": "bytes"})
     def bytes(self) -> bytes:
         if self._bytes is not None:
             if isinstance(self._bytes, BytesIO):
@@ -234,15 +268,18 @@ class UniMedia(UniMessageSegment):
         if self._path is not None:
             return path_to_bytes(self._path)
         if self._url is not None:
-            return url_to_bytes(
-                self._url,
-                cache=self.cache,
-                proxy=self.proxy,
-                timeout=self.timeout
-            )
+            if self._fetched is None:
+                self._fetched = url_to_bytes(
+                    self._url,
+                    cache=self.cache,
+                    proxy=self.proxy,
+                    timeout=self.timeout
+                )
+            return self._fetched
         raise ValueError("UniMedia 参数不足，无法获取 bytes。")
 
     @property
+    @instrument("media_resolve", lambda self: {"type": self.type, "target": "url"})
     def url(self) -> str:
         if self._url is not None:
             return self._url
@@ -252,6 +289,88 @@ class UniMedia(UniMessageSegment):
             return bytes_to_url(self._bytes)
         raise ValueError("UniMedia 参数不足，无法获取 url。")
     
+    @instrument("media_resolve", lambda self: {"type": self.type, "target": "bytes"})
+    async def get_bytes(self) -> bytes:
+        '''bytes 的异步版本，读取文件与下载均在线程中进行，不阻塞事件循环'''
+        if self._bytes is not None:
+            return self.bytes
+        if self._path is not None:
+            return await path_to_bytes_async(self._path)
+        if self._url is not None:
+            if self._fetched is None:
+                self._fetched = await url_to_bytes_async(
+                    self._url,
+                    cache=self.cache,
+                    proxy=self.proxy,
+                    timeout=self.timeout
+                )
+            return self._fetched
+        return self.bytes
+
+    @instrument("media_resolve", lambda self: {"type": self.type, "target": "view"})
+    async def get_view(self) -> memoryview:
+        '''
+        以 memoryview 获取媒体内容，由文件构造时以内存映射访问文件，不将其读入内存。
+
+        适用于计算摘要、读取文件头等只需读取内容的场合，需要 bytes 时再行转换。
+        '''
+        if self._bytes is None and self._path is not None:
+            return await path_to_view_async(self._path)
+        return memoryview(await self.get_bytes())
+
+    @instrument("media_resolve", lambda self: {"type": self.type, "target": "path"})
+    async def get_path(self) -> str:
+        '''path 的异步版本，由 bytes 构造文件时 md5 计算交由媒体工作进程池'''
+        if self._path is None:
+            return str(await bytes_to_path_async(await self.get_bytes()))
+        return self.path
+
+    async def get_content_key(self) -> str:
+        """
+        媒体内容的标识，用作转码、上传等缓存的键，每个消息段仅计算一次。
+
+        一般为内容的 md5 十六进制摘要，由文件构造时按 (路径, 大小, 修改时间) 缓存摘要，同一文件不重复计算。
+        """
+        if self._content_key is None:
+            if self._bytes is None and self._path is not None:
+                self._content_key = await _path_digest(self._path)
+            else:
+                self._content_key = await md5_hex(await self.get_view())
+        return self._content_key
+
+    @instrument("media_resolve", lambda self, accepts: {"type": self.type, "target": "resolve"})
+    async def resolve(self, accepts: Sequence[MediaRepr]) -> tuple[MediaRepr, Union[str, bytes]]:
+        """
+        按目标可接受的表示获取媒体，优先交出已有的表示，以免不必要的下载与写入。
+
+        先按 accepts 顺序查找已有的表示，均没有时再按顺序构造首个可构造的表示。
+
+        :param accepts: 目标可接受的表示，按目标侧开销由低到高排列。
+        :return: (表示形式, 值)，bytes 为 bytes，其余为 str.
+        """
+        for kind in accepts:
+            if kind == "url" and self._url is not None:
+                return kind, self._url
+            if kind == "path" and self._path is not None:
+                return kind, self.path
+            if kind == "bytes" and self._bytes is not None:
+                return kind, self.bytes
+            if kind == "base64" and self._bytes is not None:
+                return kind, b64encode(self.bytes).decode()
+        for kind in accepts:
+            try:
+                if kind == "url":
+                    return kind, self.url
+                if kind == "path":
+                    return kind, await self.get_path()
+                if kind == "bytes":
+                    return kind, await self.get_bytes()
+                if kind == "base64":
+                    return kind, b64encode(await self.get_bytes()).decode()
+            except NotImplementedError:
+                continue
+        raise ValueError(f"UniMedia 无法构造 {', '.join(accepts)} 中的任一表示。")
+
     def __post_init__(self):
         self.check_content()
 
@@ -260,16 +379,34 @@ class UniMedia(UniMessageSegment):
             raise ValueError("构造 UniMedia 时参数不足。")
 
 
-@dataclass
+_path_digests: TTLCache[tuple[str, int, int], str] = TTLCache(4096)
+'''文件内容的 md5 摘要，以 (路径, 大小, 修改时间) 为键'''
+
+async def _path_digest(path: Union[str, Path]) -> str:
+    stat = await file_io_pool.run(os.stat, path)
+    key = (str(Path(path).absolute()), stat.st_size, stat.st_mtime_ns)
+    if (digest := _path_digests.get(key)) is None:
+        digest = await md5_hex(await path_to_view_async(path))
+        _path_digests.set(key, digest)
+    return digest
+
+
+@segment_dataclass
 class UniImage(UniMedia):
     '''图像信息'''
 
     type: Literal["image"]
 
     @property
+    @instrument("media_probe", lambda self: {"type": self.type})
     def size(self) -> tuple[int, int]:
-        pic = Image.open(BytesIO(self.bytes))
-        return pic.size
+        '''图片尺寸，仅有 url 时在事件循环中需改用 get_size'''
+        return get_media_backend().probe_size(self.bytes)
+
+    @instrument("media_probe", lambda self: {"type": self.type})
+    async def get_size(self) -> tuple[int, int]:
+        '''size 的异步版本，较大图片的尺寸读取交由媒体工作进程池'''
+        return await probe_size(await self.get_view())
 
     @property
     def width(self) -> int:
@@ -280,21 +417,21 @@ class UniImage(UniMedia):
         return self.size[1]
 
 
-@dataclass
+@segment_dataclass
 class UniVoice(UniMedia):
     '''音频信息'''
 
     type: Literal["voice"]
 
 
-@dataclass
+@segment_dataclass
 class UniVideo(UniMedia):
     '''视频信息'''
 
     type: Literal["video"]
 
 
-@dataclass
+@segment_dataclass
 class UniOther(UniMessageSegment):
     '''其他信息类型'''
 
@@ -314,15 +451,53 @@ uni_ms_mapping: dict[str, Type[UniMessageSegment]] = {
 }
 
 
+def _adapter_name(adapter: Union[str, Adapter, Type[Adapter]]) -> str:
+    return adapter if isinstance(adapter, str) else adapter.get_name()
+
+
+TT = TypeVar("TT")
+
 class UniMessage(List[UniMessageSegment]):
 
-    origin_message: Message
-    '''原 Message'''
+    origin_message: Optional[Message]
+    '''原 Message，启用 sekaiju_drop_origin 时导出或事件构建完成后为 None'''
 
-    def __init__(self, origin_message: Message):
+    def __init__(self, origin_message: Optional[Message]):
         self.origin_message = origin_message
+        self._exporting = 0
+        '''进行中的导出数'''
+        self._export_memo: Optional[tuple[dict[Any, tuple[tuple[UniMessageSegment, ...], Message]], SingleFlight[Any, Message]]] = None
+        '''导出结果缓存与合并并发导出的 SingleFlight，首次缓存时创建'''
+
+    def drop_origin(self) -> "UniMessage":
+        '''丢弃原 Message 与各消息段的原消息段，以减少长期保存时的内存占用'''
+        self.origin_message = None
+        for uni_ms in self:
+            uni_ms.origin_ms = None
+        return self
+
+    def release_fetched(self) -> "UniMessage":
+        '''释放各媒体消息段由 url 下载所得的内容'''
+        for uni_ms in self:
+            if isinstance(uni_ms, UniMedia):
+                uni_ms._fetched = None
+        return self
+
+    def prefetch(self):
+        '''在后台预取其中仅有 url 的媒体，详见 prefetch 模块'''
+        from ..prefetch import prefetcher
+        prefetcher.schedule([
+            (uni_ms._url, uni_ms.timeout)
+            for uni_ms in self
+            if isinstance(uni_ms, UniMedia)
+            and uni_ms._url is not None
+            and uni_ms._path is None
+            and uni_ms._bytes is None
+            and uni_ms._fetched is None
+        ])
 
     @staticmethod
+    @instrument("message_generate", lambda adapter, *args, **kwargs: {"adapter": _adapter_name(adapter)})
     async def generate(
         adapter: Union[str, Adapter, Type[Adapter]],
         origin_message: Union[Message, MessageSegment],
@@ -347,8 +522,12 @@ class UniMessage(List[UniMessageSegment]):
             raise ValueError(f"适配器 {adapter_name} 未设定 UniMessage 生成方法。")
         if isinstance(origin_message, MessageSegment):
             origin_message = cast(Type[Message], origin_message.get_message_class())(origin_message)
-        return await generate_func(ori_msg=origin_message, bot=bot, encode=encode, **kwargs)
+        uni_msg = await generate_func(ori_msg=origin_message, bot=bot, encode=encode, **kwargs)
+        if config.sekaiju_prefetch:
+            uni_msg.prefetch()
+        return uni_msg
 
+    @instrument("message_export", lambda self, adapter, *args, **kwargs: {"adapter": _adapter_name(adapter)})
     async def export(
             self,
             adapter: Union[str, Adapter, Type[Adapter]],
@@ -359,6 +538,11 @@ class UniMessage(List[UniMessageSegment]):
         """
         通过目标 Bot 实例构造 UniMessage 对象。
 
+        启用 sekaiju_export_cache 时，导出结果按 (目标适配器, Bot, 参数) 缓存至 UniMessage 不再被引用，
+        增删消息段后重新导出，原地修改消息段的字段后需调用 clear_export_cache.
+        该 UniMessage 进行中的导出全部完成后，释放媒体由 url 下载所得的内容，
+        启用 sekaiju_drop_origin 时同时丢弃原消息与原消息段。
+
         :param adapter: 目标 Message 所对应的 adapter 类或实例，或对应名称字符串。
         :param bot: 目标 Message 所对应 Bot 实例，部分转换函数可能要求该参数。
         :param decode: 是否要对 UniMessage 中的 id 进行解码。
@@ -370,7 +554,110 @@ class UniMessage(List[UniMessageSegment]):
             adapter_name = adapter.get_name()
         if not (export_func := EXPORT_MAPPING.get(adapter_name)):
             raise ValueError(f"适配器 {adapter_name} 未设定 UniMessage 导出方法。")
-        return await export_func(uni_msg=self, bot=bot, decode=decode, **kwargs)
+        # 导出过程中的占位文本与媒体转码仍会读取原消息段与已下载的媒体内容，待所有进行中的导出完成后再释放
+        self._exporting += 1
+        try:
+            return await self._export(adapter_name, export_func, bot, decode, **kwargs)
+        finally:
+            self._exporting -= 1
+            if not self._exporting:
+                self.release_fetched()
+                if config.sekaiju_drop_origin:
+                    self.drop_origin()
+
+    async def _export(
+            self,
+            adapter_name: str,
+            export_func: "Exporter",
+            bot: Optional[Bot],
+            decode: bool,
+            **kwargs
+        ) -> Message:
+        if not config.sekaiju_export_cache:
+            return await export_func(uni_msg=self, bot=bot, decode=decode, **kwargs)
+        # 持有导出时的各消息段并逐一以 is 比较，判断 UniMessage 在导出后是否被增删改，
+        # 持有引用使已移除的消息段不被回收，其 id 不会被新消息段复用
+        fingerprint = tuple(self)
+        key = (
+            adapter_name,
+            None if bot is None else (type(bot).__name__, bot.self_id),
+            decode,
+            make_key(**kwargs) if kwargs else None
+        )
+        if self._export_memo is None:
+            self._export_memo = ({}, SingleFlight())
+        memo, flight = self._export_memo
+        if (item := memo.get(key)) is not None and _same_segments(item[0], fingerprint):
+            return item[1].copy()
+        exported = False
+        async def do_export() -> Message:
+            nonlocal exported
+            exported = True
+            message = await export_func(uni_msg=self, bot=bot, decode=decode, **kwargs)
+            # 缓存浅拷贝，导出的调用方直接取得结果，其增删消息段不影响缓存
+            memo[key] = (fingerprint, type(message)(message))
+            return message
+        message = await flight.do(key, do_export)
+        # 命中缓存或合并至其他调用方的导出时交出副本，调用方修改导出结果时不影响缓存
+        return message if exported else message.copy()
+
+    def clear_export_cache(self):
+        '''清空导出结果缓存，原地修改了消息段的字段后需调用'''
+        self._export_memo = None
+
+    async def broadcast(
+            self,
+            targets: Iterable[tuple[Bot, TT]],
+            send: Callable[[Bot, Message, TT], Awaitable[Any]],
+            decode: bool = True,
+            concurrency: int = 16,
+            **kwargs
+        ) -> list[Any]:
+        """
+        将 UniMessage 发送至多个目标，每个适配器仅导出一次。
+
+        导出时使用该适配器的首个 Bot，如大别野上传图片所得链接可供其他 Bot 使用。
+        消息中含有导出结果与具体 Bot 相关的消息段（如 @ 机器人）时，该适配器改为每个 Bot 导出一次。
+        单个目标导出或发送失败不影响其他目标。
+
+        :param targets: (Bot, 发送目标) 列表，发送目标由 send 解释，如群号。
+        :param send: 以 Bot、导出后的 Message 与发送目标为参数的发送函数。
+        :param decode: 是否要对 UniMessage 中的 id 进行解码。
+        :param concurrency: 同时进行的发送数上限。
+        :return: 与 targets 顺序一致的 send 返回值，失败的目标为对应异常。
+        """
+        from .codec import SEGMENT_CODECS
+        targets = list(targets)
+        depends_on_bot: dict[str, bool] = {}
+        def export_key(bot: Bot) -> tuple[str, Optional[Bot]]:
+            adapter_name = bot.adapter.get_name()
+            if (dependent := depends_on_bot.get(adapter_name)) is None:
+                # 未使用编解码表的适配器无从判断，按 Bot 分别导出
+                codec = SEGMENT_CODECS.get(adapter_name)
+                dependent = depends_on_bot[adapter_name] = codec is None or codec.depends_on_bot(self)
+            return adapter_name, bot if dependent else None
+        bots: dict[tuple[str, Optional[Bot]], Bot] = {}
+        for bot, _ in targets:
+            bots.setdefault(export_key(bot), bot)
+        exported = dict(zip(bots, await asyncio.gather(
+            *(self.export(key[0], bot, decode, **kwargs) for key, bot in bots.items()),
+            return_exceptions=True
+        )))
+        semaphore = asyncio.Semaphore(concurrency)
+        async def send_one(bot: Bot, target: TT) -> Any:
+            message = exported[export_key(bot)]
+            if isinstance(message, BaseException):
+                raise message
+            async with semaphore:
+                return await send(bot, message.copy(), target)
+        return await asyncio.gather(
+            *(send_one(bot, target) for bot, target in targets),
+            return_exceptions=True
+        )
+
+
+def _same_segments(a: tuple[UniMessageSegment, ...], b: tuple[UniMessageSegment, ...]) -> bool:
+    return len(a) == len(b) and all(x is y for x, y in zip(a, b))
 
 
 TM1 = TypeVar("TM1", bound=Message, contravariant=True)
@@ -424,6 +711,13 @@ def add_message_change(
     GENERATE_MAPPING[adapter_name] = generate_func
     EXPORT_MAPPING[adapter_name] = export_func
 
+@instrument(
+    "convert_message",
+    lambda *args, origin_adapter=None, target_adapter=None, **kwargs: {
+        "origin": origin_adapter and _adapter_name(origin_adapter),
+        "target": target_adapter and _adapter_name(target_adapter)
+    }
+)
 async def convert_message(
         message: Union[Message, MessageSegment, UniMessage],
         origin_adapter: Optional[Union[str, Adapter, Type[Adapter]]] = None,
@@ -520,6 +814,7 @@ __all__ = [
     "UniAtAll",
     "UniAtUser",
     "UniAtMe",
+    "MediaRepr",
     "UniMedia",
     "UniImage",
     "UniVoice",
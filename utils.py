@@ -4,12 +4,16 @@ from dataclasses import dataclass
 from pathlib import Path
 from hashlib import md5
 from io import BytesIO
-import httpx
+import asyncio
 
 import nonebot
 from nonebot.utils import logger_wrapper
 from nonebot.adapters import Adapter
 
+from .file_io import file_io_pool, write_atomic, read_file, map_file
+from .media import fetch_media, fetch_media_async
+from .media_worker import md5_hex
+
 
 
 logger = logger_wrapper("世界树")
@@ -17,8 +21,10 @@ logger = logger_wrapper("世界树")
 
 
 temp_data_path = Path("./data/temp/sekaiju")
-'''插件临时文件存放目录'''
-temp_data_path.mkdir(parents=True, exist_ok=True)
+'''插件临时文件存放目录，首次写入临时文件时创建'''
+
+data_path = Path("./data/sekaiju")
+'''插件持久数据存放目录'''
 
 
 @dataclass
@@ -98,18 +104,41 @@ def bytes_to_path(bytes_data: Union[bytes, BytesIO]) -> Path:
     '''将 bytes 存储在临时目录，返回文件的绝对路径'''
     if isinstance(bytes_data, BytesIO):
         bytes_data = bytes_data.getvalue()
-    file_path = temp_data_path/md5(bytes_data).hexdigest()
-    with open(file_path, "wb") as f:
-        f.write(bytes_data)
-    return file_path.absolute()
+    # 文件以内容 md5 命名，已存在时无需重复写入
+    return write_atomic(temp_data_path/md5(bytes_data).hexdigest(), bytes_data, overwrite=False)
+
+async def bytes_to_path_async(bytes_data: Union[bytes, BytesIO]) -> Path:
+    '''bytes_to_path 的异步版本，md5 计算交由媒体工作进程池，写入交由文件读写线程池'''
+    if isinstance(bytes_data, BytesIO):
+        bytes_data = bytes_data.getvalue()
+    return await file_io_pool.write(temp_data_path/await md5_hex(bytes_data), bytes_data, overwrite=False)
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
 
 def url_to_bytes(url: str, **kwargs) -> bytes:
-    '''从 url 地址获取数据'''
-    resp = httpx.get(
-        url,
-        timeout=kwargs.get("timeout", 20)
-    )
-    return resp.content
+    """
+    从 url 地址获取数据，已预取时直接返回预取内容。
+
+    下载会阻塞所在线程，在事件循环中调用且未预取完成时抛出 ValueError，需改用 url_to_bytes_async.
+    """
+    from .prefetch import prefetcher
+    if (data := prefetcher.take(url)) is not None:
+        return data
+    if _on_event_loop():
+        raise ValueError(f"不能在事件循环中同步下载 {url}，请使用对应的异步接口。")
+    return fetch_media(url, timeout=kwargs.get("timeout"))
+
+async def url_to_bytes_async(url: str, **kwargs) -> bytes:
+    '''url_to_bytes 的异步版本，在线程中请求，不阻塞事件循环，该 url 正在预取时等待预取完成'''
+    from .prefetch import prefetcher
+    if (data := await prefetcher.join(url)) is not None:
+        return data
+    return await fetch_media_async(url, timeout=kwargs.get("timeout"))
 
 def path_to_url(path: Union[str, Path]) -> str:
     if isinstance(path, str):
@@ -123,9 +152,19 @@ def url_to_path(url: str, **kwargs) -> Path:
     return bytes_to_path(url_to_bytes(url, **kwargs))
 
 def path_to_bytes(path: Union[str, Path]) -> bytes:
-    with open(path, "rb") as f:
-        data = f.read()
-    return data
+    return read_file(path)
+
+async def path_to_bytes_async(path: Union[str, Path]) -> bytes:
+    '''path_to_bytes 的异步版本，读取交由文件读写线程池'''
+    return await file_io_pool.read(path)
+
+def path_to_view(path: Union[str, Path]) -> memoryview:
+    '''以内存映射获取文件内容，不将文件读入内存'''
+    return map_file(path)
+
+async def path_to_view_async(path: Union[str, Path]) -> memoryview:
+    '''path_to_view 的异步版本，打开文件交由文件读写线程池'''
+    return await file_io_pool.map(path)
 
 
 ascii_map = {ch:str(i+10) for i,ch in enumerate("0123456789"+"ABCDEFGHIJKLMNOPQRSTUVWXYZ"+"abcdefghijklmnopqrstuvwxyz"+"~!@#$%^&*()_+`-=|:<>?[];,./")}
@@ -162,14 +201,20 @@ def ascii_decode(s: Union[Encoded, str, int]) -> str:
 __all__ = [
     "logger",
     "temp_data_path",
+    "data_path",
     "support_adapters_info",
     "SUPPORTED_ADAPTERS",
     "bytes_to_path",
+    "bytes_to_path_async",
     "url_to_bytes",
+    "url_to_bytes_async",
     "path_to_url",
     "bytes_to_url",
     "url_to_path",
     "path_to_bytes",
+    "path_to_bytes_async",
+    "path_to_view",
+    "path_to_view_async",
     "ascii_encode",
     "ascii_decode"
 ]
\ No newline at end of file